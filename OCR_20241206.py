@@ -1,21 +1,16 @@
 # coding:utf-8
 import sys
 import os
-import json
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Callable, List
-
-import cv2
-import numpy as np
-import shortuuid
-import shutil
-from PySide6.QtCore import Qt, QObject, QUrl, Signal, QTimer, QFileSystemWatcher, QRectF
-from PySide6.QtGui import QIcon, QDesktopServices, QPixmap, QStandardItemModel, QStandardItem, QColor, QBrush, QFont, QPainter, QFontMetrics, QPen
-from PySide6.QtWidgets import (QApplication, QFrame, QHBoxLayout, QVBoxLayout, QGridLayout, QPushButton, QWidget, QTableWidget, QTableWidgetItem, QTreeWidget, QTreeWidgetItem, QLabel, QScrollArea,
-                            QFileDialog, QColorDialog, QFontDialog)
-from qfluentwidgets import (NavigationItemPosition, MessageBox, setTheme, Theme, MSFluentWindow, NavigationAvatarWidget, qrouter, PlainTextEdit, SubtitleLabel, setFont, CheckBox, TreeView,
-                            ElevatedCardWidget, StrongBodyLabel, PillPushButton, SmoothScrollArea, TeachingTip, TeachingTipTailPosition, InfoBarIcon, InfoBar, InfoBarPosition, FlowLayout)
+from typing import Callable
+
+from PySide6.QtCore import Qt, QUrl, Signal, QTimer, QRectF, QRect, QPointF, QEvent
+from PySide6.QtGui import QIcon, QDesktopServices, QPixmap, QColor, QFont, QPainter, QPen, QTextCursor, QStaticText
+from PySide6.QtWidgets import (QApplication, QFrame, QHBoxLayout, QVBoxLayout, QWidget, QTreeWidgetItem, QFileDialog,
+                               QColorDialog, QFontDialog, QListView)
+from qfluentwidgets import (NavigationItemPosition, MessageBox, MSFluentWindow, PlainTextEdit, SubtitleLabel, setFont,
+                            CheckBox, InfoBar, InfoBarPosition, ProgressBar, ToolButton)
 from qfluentwidgets import FluentIcon as FIF
 
 from SubApplication import Ui_Form as AppUi
@@ -25,6 +20,23 @@ from SubSetting import Ui_Form as SetUi
 
 import pyqtgraph as pg
 from signal_bus import signalBus
+from ocr_backends import ocrBackends, backend_names
+from ocr_quant import CALIBRATION_DIR, PRECISIONS, calibration_images, precision_names, precision_key
+from ocr_batch import list_images, write_binding
+from ocr_pipeline import page_text, bind_image, bind_text
+from ocr_worker import OcrJob, OcrBatchJob
+from image_utils import ndarray_to_qimage
+from ocr_crop import PageCrops
+from result_model import OcrResultModel
+from library_index import libraryIndex
+from vertical_layout import VerticalLayout
+from book_pager import BookPager
+from page_view import PyramidView
+from book_search import bookSearch
+from fs_watcher import fsWatcher
+from settings_store import settingsStore
+from lazy_interface import LazyInterface, build_when_idle, startupReport
+from book_shelf import BookShelfModel, BookCardDelegate, BookSearchProxyModel, SearchIndexJob, BorrowJob
 
 
 @dataclass
@@ -59,13 +71,32 @@ class Window(MSFluentWindow):
         signalBus.showInfoBar.connect(self.showInfoBar)
         # create sub interface
         self.homeInterface = Widget('Home Interface', self)
-        self.appInterface = SubApplication('Sub Application', self)
-        self.bookshelfInterface = SubBookShelf('Sub BookShelf', self)
-        self.readInterface = SubRead('Sub Read', self)
+        # 2025-02-16 除主页外的页面先注册占位页，首次切换到该页或窗口显示后空闲时才创建（见lazy_interface.py）
+        self.appInterface = LazyInterface(lambda parent: SubApplication('Sub Application', parent), 'Sub Application', self)
+        self.bookshelfInterface = LazyInterface(lambda parent: SubBookShelf('Sub BookShelf', parent), 'Sub BookShelf', self)
+        self.readInterface = LazyInterface(lambda parent: SubRead('Sub Read', parent), 'Sub Read', self)
 
-        self.settingInterface = SubSetting('Sub Setting', self)
+        self.settingInterface = LazyInterface(lambda parent: SubSetting('Sub Setting', parent), 'Sub Setting', self)
         self.initNavigation()
         self.initWindow()
+        self.stackedWidget.currentChanged.connect(self.on_interface_changed)
+        self.shown = False
+
+    def on_interface_changed(self, index):
+        # 切换到尚未创建的页面时立即创建
+        widget = self.stackedWidget.widget(index)
+        if isinstance(widget, LazyInterface):
+            widget.ensure()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.shown:
+            return
+        self.shown = True
+        startupReport.mark('窗口显示')
+        # 窗口显示后在空闲时依次创建其余页面
+        build_when_idle([self.appInterface, self.readInterface, self.bookshelfInterface, self.settingInterface],
+                        lambda: (startupReport.mark('全部页面创建完成'), startupReport.report()))
 
     def initNavigation(self):
         # HOME_FILL表示点击后变成另一个图标
@@ -120,28 +151,6 @@ class Window(MSFluentWindow):
                    duration=infoBarMsgModel.duration, position=infoBarMsgModel.position, parent=self)
 
 
-# 2024-12-06 新写个类，用于加载settings的json文件，并将设置发射出去。
-class SettingsManager(QObject):
-    # 定义一个信号，发射json键值对
-    settingVar = Signal(dict)
-
-    def __init__(self, settings_file, parent=None):
-        super().__init__(parent)
-        self.settings_file = settings_file
-
-    def loadSettings(self):
-        # 从 JSON 文件中读取设置，并发射出去
-        try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as json_file:
-                    settings = json.load(json_file)
-                    # 发射信号，将设置作为字典传递
-                    self.settingVar.emit(settings)
-            else:
-                print(f"Settings file '{self.settings_file}' does not exist.")
-        except Exception as e:
-            print(f"Error loading settings: {e}")
-
 # 定义ui类，目的是为了在Window类中实例化并部署到“应用”页面
 class SubApplication(AppUi, QWidget):
     # 定义信号
@@ -153,6 +162,12 @@ class SubApplication(AppUi, QWidget):
         self.PTBtnOCR.setIcon(FIF.SYNC)
         self.PixBinding.setIcon(FIF.BOOK_SHELF)
         self.pBtnimport.clicked.connect(self.open_img)
+        # 2025-01-10 批量识别整个文件夹（每页一张图片）
+        self.pBtnimport.setGeometry(QRect(10, 10, 277, 32))
+        self.TBtnFolder = ToolButton(FIF.FOLDER, self.CardWidget)
+        self.TBtnFolder.setGeometry(QRect(294, 10, 32, 32))
+        self.TBtnFolder.setToolTip('识别文件夹')
+        self.TBtnFolder.clicked.connect(self.show_folder_result)
         self.PTBtnOCR.clicked.connect(self.show_result)
         self.pBtnSave.clicked.connect(self.save)
         self.pBtnCancle.clicked.connect(self.cancle)
@@ -161,8 +176,24 @@ class SubApplication(AppUi, QWidget):
         self.setObjectName(text.replace(' ', '-'))
         self.file_name = None
         self.combo_dict = []
+        # 2025-01-08 当前正在进行的识别任务，识别在线程池中进行
+        self.ocr_job = None
+        self.ProgressBar = ProgressBar(self.CardWidget)
+        self.ProgressBar.setGeometry(QRect(10, 479, 360, 4))
+        self.ProgressBar.hide()
+        signalBus.ocrStarted.connect(self.on_ocr_started)
+        signalBus.ocrProgress.connect(self.on_ocr_progress)
+        signalBus.ocrPartialResult.connect(self.on_ocr_partial)
+        signalBus.ocrFinished.connect(self.on_ocr_finished)
+        signalBus.ocrFailed.connect(self.on_ocr_failed)
+        signalBus.ocrCancelled.connect(self.on_ocr_cancelled)
 
         self.update.connect(self.update_checkbox)
+        # 2025-01-22 表格支持点击表头排序，以及只显示低置信度的行
+        self.TableView.setSortingEnabled(True)
+        self.CheckBoxLow = CheckBox('仅看低置信度', self.CardWidget_3)
+        self.CheckBoxLow.setGeometry(QRect(1010, 0, 150, 26))
+        self.CheckBoxLow.toggled.connect(self.filter_low_confidence)
 
         if self.ComboBox.currentIndex() < len(self.combo_dict):
             self.ComboBox.currentIndexChanged.connect(self.choose_combobox)
@@ -173,14 +204,12 @@ class SubApplication(AppUi, QWidget):
         self.crop_dir = '../OCR/history_img'
         self.binding_dir = '../OCR/binding'
 
-        # 2024-12-06 在SubApplication中实例化SettingsManager
-        self.settings_manager = SettingsManager('settings')
-        # 连接信号
-        self.settings_manager.settingVar.connect(self.receivedAppSettings)
-        # 从文件加载设置并发射信号
-        self.settings_manager.loadSettings()
+        # 2025-02-15 设置从全局设置读取（settings_store.py），设置页修改后立即生效
+        self.receivedAppSettings(settingsStore.all())
+        settingsStore.changed.connect(self.on_setting_changed)
+
     # 接收设置并实例化变量
-    def receivedAppSettings(self, settings):
+    def receivedAppSettings(self, settings, apply_ocr=True):
         # 信号接收到settings并逐个实例化成变量，供SubApplication调用
         for key, value in settings.items():
             setattr(self, key, value)
@@ -192,10 +221,28 @@ class SubApplication(AppUi, QWidget):
         self.appli_status_C = self.status_C
         self.appli_status_M = self.status_M
         self.appli_path = self.path
+        # 2025-01-06 OCR引擎参数跟随settings，ocr_preload为真时启动即在后台加载模型
+        # 2025-02-17 settings中的ocrs选择识别后端（ocr_backends.py）
+        if apply_ocr:
+            ocrBackends.apply_settings(settings)
+
+    def on_setting_changed(self, key, value):
+        # 字体、颜色等与识别无关的设置不必重新选择后端（自动选择时会重新读取测速结果）
+        self.receivedAppSettings(settingsStore.all(), key in ocrBackends.settings_keys())
+        # 已显示的识别结果立即使用新的字体、颜色和置信度
+        if key in ('font_family', 'font_size'):
+            self.PlainTextRevision.setFont(QFont(self.appli_font_family, self.appli_font_size))
+        model = self.TableView.model()
+        if key in ('confidence', 'color') and isinstance(model, OcrResultModel):
+            model.setHighlight(self.appli_confidence, self.color)
+            if self.CheckBoxLow.isChecked():
+                model.setConfidenceFilter(self.appli_confidence)
 
     def open_img(self):
         # 初始化，确保打开图片时都是空白状态
-        self.combo_dict.clear()
+        self.combo_dict = []
+        if self.ocr_job is not None:
+            self.ocr_job.cancel()
         options = QFileDialog.Options()
         file_name, _ = QFileDialog.getOpenFileName(self, "选择需要导入的图片", "", "Images (*.png *.jpg *.jpeg *.bmp *.gif);;All Files (*)", options=options)
 
@@ -210,98 +257,186 @@ class SubApplication(AppUi, QWidget):
             return None
 
     def show_result(self):
-        # 识别单张图片，将识别结果输出到PlainTextRevision
-        from paddleocr import PaddleOCR, draw_ocr
-        # import os
-        os.environ["KMP_DUPLICATE_LIB_OK"] = "True"
-        img_path = self.file_name
-        # 初始化 PaddleOCR 模型，只需运行一次以下载并加载模型到内存中
-        ocr_txt = PaddleOCR(use_angle_cls=True, lang="ch",device='cpu')
-        # 使用 PaddleOCR 模型进行文字识别，识别结果result_t为list+turple的2维数组
-        result_t = ocr_txt.ocr(img_path, cls=True)
-        # 把result_t转换成3列数组
-        new = [((item[0]), (item[1][0]), (item[1][1])) for item in result_t[0]]
-        row = len(new)
-        column = len(new[0]) if new[0] else 0
-        # 将识别结果拼接成一个字符串
-        text_result = ""
-        for i in range(len(result_t)):
-            res = result_t[i]
-            for line in res:
-                text_result += line[1][0] + "\n"
-        self.PlainTextRevision.setPlainText(text_result)
+        # 2025-01-08 识别放到线程池中进行，界面在结果返回后再填充；识别过程中再次点击则取消
+        if self.ocr_job is not None:
+            self.ocr_job.cancel()
+            return
+        if not self.file_name:
+            InfoBar.error(
+                title='无效操作',
+                content='请先导入图片',
+                orient=Qt.Horizontal,
+                isClosable=False,
+                position=InfoBarPosition.BOTTOM,
+                duration=3000,  # -1不会自动消失
+                parent=self
+            )
+            return
+        self.combo_dict = []
+        self.ocr_job = OcrJob(self.file_name, export=getattr(self, 'crop_export', True)).start()
+
+    def show_folder_result(self):
+        # 识别过程中再次点击则取消
+        if self.ocr_job is not None:
+            self.ocr_job.cancel()
+            return
+        folder = QFileDialog.getExistingDirectory(self, "选择需要识别的文件夹", "")
+        if not folder:
+            return
+        img_paths = list_images(folder)
+        if not img_paths:
+            InfoBar.warning(
+                title='无效操作',
+                content='文件夹中没有图片',
+                orient=Qt.Horizontal,
+                isClosable=False,
+                position=InfoBarPosition.BOTTOM,
+                duration=3000,  # -1不会自动消失
+                parent=self
+            )
+            return
+        self.combo_dict = []
+        self.ocr_job = OcrBatchJob(img_paths, getattr(self, 'ocr_workers', 0)).start()
+
+    def on_ocr_started(self, job_id):
+        if not self.is_current_job(job_id):
+            return
+        self.PTBtnOCR.setIcon(FIF.CLOSE)
+        self.ProgressBar.setValue(0)
+        self.ProgressBar.show()
+
+    def on_ocr_progress(self, job_id, done, total):
+        if not self.is_current_job(job_id):
+            return
+        self.ProgressBar.setMaximum(max(total, 1))
+        self.ProgressBar.setValue(done)
+
+    def on_ocr_partial(self, job_id, page):
+        # 识别结果先于切图导出返回，此时即可填充文本、表格和ComboBox；批量识别时逐页显示最新完成的页面
+        if not self.is_current_job(job_id):
+            return
+        if isinstance(self.ocr_job, OcrBatchJob):
+            self.fill_result(page.lines)
+            return
+        # 2025-01-24 单张识别逐批返回新增的行，追加到表格、文本和ComboBox，不必等整页识别完
+        if not isinstance(self.combo_dict, PageCrops) or self.combo_dict.image is not page.image:
+            # 2025-01-17 combo_dict保存每行的切图（透视校正，按需渲染），不再读写切图文件
+            self.combo_dict = PageCrops(page.image, [])
+            self.clear_result()
+        self.combo_dict.extend([line[0] for line in page.lines])
+        self.append_result(page.lines)
+
+    def on_ocr_finished(self, job_id, result):
+        if not self.is_current_job(job_id):
+            return
+        if isinstance(self.ocr_job, OcrBatchJob):
+            self.end_ocr_job()
+            self.binding_folder(result)
+            return
+        self.end_ocr_job()
+
+    def binding_folder(self, results):
+        # 批量识别结果一次性装订到 binding/<文件夹名>
+        folder_name = os.path.basename(os.path.dirname(results[0].img_path))
+        pages = [(page.img_path, page.text) for page in results]
+        low = sum(1 for page in results for line in page.lines if line[2] < self.appli_confidence)
+        try:
+            binding_path = write_binding(pages, os.path.join(self.binding_dir, folder_name))
+            signalBus.bookBound.emit(binding_path)
+        except Exception as e:
+            InfoBar.error(
+                title='保存发生错误',
+                content=str(e),
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.BOTTOM_RIGHT,
+                duration=-1,  # -1不会自动消失
+                parent=self
+            )
+            return
+        InfoBar.success(
+            title='装订成功',
+            content=f'共{len(pages)}页，{low}行置信度低于{self.appli_confidence}，文件已保存至{binding_path}',
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.BOTTOM,
+            duration=5000,
+            parent=self
+        )
+
+    def on_ocr_failed(self, job_id, message):
+        if not self.is_current_job(job_id):
+            return
+        self.end_ocr_job()
+        InfoBar.error(
+            title='识别失败',
+            content=message,
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.BOTTOM_RIGHT,
+            duration=-1,  # -1不会自动消失
+            parent=self
+        )
+
+    def on_ocr_cancelled(self, job_id):
+        if self.is_current_job(job_id):
+            self.end_ocr_job()
+
+    def is_current_job(self, job_id):
+        return self.ocr_job is not None and self.ocr_job.job_id == job_id
+
+    def end_ocr_job(self):
+        self.ocr_job = None
+        self.PTBtnOCR.setIcon(FIF.SYNC)
+        self.ProgressBar.hide()
+
+    def fill_result(self, new):
+        # new为3列数组 (坐标, 结果, 置信度)
+        self.clear_result()
+        self.append_result(new)
+
+    def clear_result(self):
+        self.PlainTextRevision.setPlainText('')
         font = QFont(self.appli_font_family, self.appli_font_size)
         self.PlainTextRevision.setFont(font)
         # self.graViewrevision.setFixedSize(390, 390)
 
-        # 将识别结果集显示到TableView中
-        model = QStandardItemModel()
-        model.setHorizontalHeaderLabels(['序号', '坐标', '结果', '置信度', '校验状态'])
+        # 2025-01-22 将识别结果集显示到TableView中，按列存储的模型只在显示时格式化单元格
+        model = OcrResultModel((), self.appli_confidence, self.color, self.TableView)
+        if self.CheckBoxLow.isChecked():
+            model.setConfidenceFilter(self.appli_confidence)
         self.TableView.setBorderRadius(8)
-        # 填充单元格数据
-        for i in range(row):
-            serial = QStandardItem(str(i + 1))  # 序号从 1 开始
-            model.setItem(i, 0, serial)
-            for j in range(column):
-                item = QStandardItem(str(new[i][j]))
-                model.setItem(i, j + 1, item)
-
-            confidence = new[i][2]
-            if confidence < self.appli_confidence:
-                # color = QColor(self.color)
-                # 将置信度小于0.95的单元格设置为红色
-                item.setForeground(QBrush(QColor(self.color)))
-
-                # 增加复选框
-            checkbox_item = QStandardItem()
-            checkbox_item.setCheckable(True)  # 复选框前缀图形框可见
-            checkbox_item.setText('未校验')
-            checkbox_item.setEnabled(False)
-            model.setItem(i, column + 1, checkbox_item)
         self.TableView.setModel(model)
-        # 调整列宽以适应内容
-        self.TableView.resizeColumnsToContents()
-        self.TableView.setColumnWidth(4, 120)  # 第五列非数组单元格，手动调整第5列宽度
         self.TableView.show()
-        # 将识别结果输出到ComboBox中
-        combolist = [((item[0])) for item in new]
         # 每次填充前先清空ComboBox
         self.ComboBox.items.clear()
-        for i in range(len(combolist)):
-            self.ComboBox.addItem('序号' + str(i + 1) + '    ' + str(combolist[i]))
-
-        # 将识别结果按det坐标切割并保存，用于与ComboBox匹配显示
-        # img = cv2.imread(self.file_name)
-        img = cv2.imdecode(np.fromfile(self.file_name, dtype=np.uint8), -1)
-        # combo_dict = []
-        for i, line in enumerate(new):
-            # line[0] 包含坐标信息
-            box = line[0]  # 获取坐标点
-            # box 是一个四个点的列表，按顺序为 [左上, 右上, 右下, 左下]
-            points = box[0]  # 提取左上角坐标 (x1, y1)
-            x1, y1 = int(points[0]), int(points[1])  # 转换为整数
-            points = box[2]  # 提取右下角坐标 (x2, y2)
-            x2, y2 = int(points[0]), int(points[1])  # 转换为整数
-            # 切割图像
-            crop_img = img[y1:y2, x1:x2]
-            # 构造保存路径
-            crop_img_dir = f'history_img/{os.path.splitext(os.path.basename(self.file_name))[0]}'  # history_img
-            crop_img_serial = f'{crop_img_dir}/cropped_serial_{i + 1}.jpg'
-            # 检查目录是否存在，如果不存在则创建
-            os.makedirs(crop_img_dir, exist_ok=True)
-            cv2.imwrite(crop_img_serial, crop_img)
-
-            self.combo_dict.append(crop_img_serial)
-
-        # self.combo_dict = combo_dict
+
+    def append_result(self, new):
+        # 2025-01-24 追加一批识别结果：文本在末尾插入，表格只插入新行，ComboBox一次添加整批
+        if not new:
+            return
+        # 将识别结果拼接成一个字符串，追加到文档末尾，不移动用户的光标
+        cursor = QTextCursor(self.PlainTextRevision.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(page_text(new))
+
+        model = self.TableView.model()
+        sized = model.rowCount() > 0
+        model.appendLines(new)
+        if not sized:
+            # 按第一批的若干行估算列宽，不逐格测量
+            model.sizeColumns(self.TableView)
+            self.TableView.setColumnWidth(4, 120)  # 第五列非数组单元格，手动调整第5列宽度
+        # 将识别结果输出到ComboBox中
+        first = len(self.ComboBox.items)
+        self.ComboBox.addItems(['序号' + str(first + i + 1) + '    ' + str(item[0]) for i, item in enumerate(new)])
 
     def choose_combobox(self):
         current_index = self.ComboBox.currentIndex()
 
         if 0 <= current_index < len(self.combo_dict):
-            # 根据选择的索引获取对应的图片路径
-            selected_image_path = self.combo_dict[current_index]
-            pixmap = QPixmap(selected_image_path)
+            # 根据选择的索引获取对应的切图，直接从内存中的整页图像渲染
+            pixmap = QPixmap.fromImage(ndarray_to_qimage(self.combo_dict[current_index]))
             pixw = pixmap.width()
             pixh = pixmap.height()
             if pixw > 390 or pixh > 390:
@@ -313,40 +448,21 @@ class SubApplication(AppUi, QWidget):
                 self.PixLocation.setPixmap(pixmap)
             # self.PixLocation.setScaledContents(True)
 
-            model, current_index = self.get_model()
-            if current_index >= 0:
-                value = model.data(model.index(current_index, 4))
-                self.CheckBox.setText(value)
-                if value == '已校验':
-                    self.CheckBox.setCheckable(True)
-                    self.CheckBox.setChecked(True)
-                else:
-                    self.CheckBox.setCheckable(True)
-                    self.CheckBox.setChecked(False)
+            self.CheckBox.setCheckable(True)
+            self.update_checkbox()
 
     def save(self):
         model, current_index = self.get_model()
-        if current_index >= 0:
-            row_index = model.index(current_index, 4)
-            model.setData(row_index, "已校验")
-            checkbox_item = model.item(current_index, 4)  # 获取复选框项
-            if checkbox_item is not None:
-                checkbox_item.setCheckState(Qt.Checked)
-                self.update.emit(True)
-        else:
-            pass
+        if model is not None and current_index >= 0:
+            # ComboBox下标即模型中的源行号，与表格排序/筛选无关
+            model.setVerified(current_index, True)
+            self.update.emit(True)
 
     def cancle(self):
         model, current_index = self.get_model()
-        if current_index >= 0:
-            row_index = model.index(current_index, 4)
-            model.setData(row_index, "未校验")
-            checkbox_item = model.item(current_index, 4)  # 获取复选框项
-            if checkbox_item is not None:
-                checkbox_item.setCheckState(Qt.Unchecked)
-                self.update.emit(True)
-        else:
-            pass
+        if model is not None and current_index >= 0:
+            model.setVerified(current_index, False)
+            self.update.emit(True)
 
     def get_model(self):
         model = self.TableView.model()
@@ -355,13 +471,16 @@ class SubApplication(AppUi, QWidget):
 
     def update_checkbox(self):
         model, current_index = self.get_model()
-        if current_index >= 0:
-            value = model.data(model.index(current_index, 4))
-            self.CheckBox.setText(value)
-        if value == '已校验':
-            self.CheckBox.setChecked(True)
-        else:
-            self.CheckBox.setChecked(False)
+        if model is not None and current_index >= 0:
+            verified = model.isVerified(current_index)
+            self.CheckBox.setText('已校验' if verified else '未校验')
+            self.CheckBox.setChecked(verified)
+
+    def filter_low_confidence(self, checked):
+        # 只看置信度低于阈值的行，便于复核
+        model = self.TableView.model()
+        if model is not None:
+            model.setConfidenceFilter(self.appli_confidence if checked else None)
 
     def binding(self):
         text_result = self.PlainTextRevision.toPlainText()
@@ -380,21 +499,20 @@ class SubApplication(AppUi, QWidget):
             )
         else:
             model = self.TableView.model()
-            for row in range(model.rowCount()):
-                # 获取第5列校验状态
-                check_status = model.item(row, 4).text()
-                if check_status.strip() == "未校验":
-                    warning_message = f"第{row + 1}行（{check_status}），请复核。"
-                    InfoBar.warning(
-                        title='校验未完成',
-                        content=warning_message,
-                        orient=Qt.Horizontal,
-                        isClosable=False,
-                        position=InfoBarPosition.BOTTOM,
-                        duration=3000,  # -1不会自动消失
-                        parent=self
-                    )
-                    return
+            # 获取第一条未校验的行
+            unverified = model.unverifiedRows()
+            if len(unverified):
+                warning_message = f"第{unverified[0] + 1}行（未校验），请复核。"
+                InfoBar.warning(
+                    title='校验未完成',
+                    content=warning_message,
+                    orient=Qt.Horizontal,
+                    isClosable=False,
+                    position=InfoBarPosition.BOTTOM,
+                    duration=3000,  # -1不会自动消失
+                    parent=self
+                )
+                return
 
             options = QFileDialog.Options()
             binding_path, _ = QFileDialog.getSaveFileName(self, "装订文件", self.binding_dir, "Images (*.png *.jpg *.jpeg *.bmp *.gif);;All Files (*)", options=options)
@@ -402,8 +520,7 @@ class SubApplication(AppUi, QWidget):
                 os.makedirs(os.path.dirname(binding_path))
             try:
                 if hasattr(self, 'file_name') and self.file_name:
-                    binding_img_path = binding_path.rsplit('.', 1)[0] + '.png'
-                    shutil.copy(self.file_name, binding_img_path)
+                    bind_image(self.file_name, binding_path)
             except Exception as e:
                 InfoBar.error(
                     title='文件已被装订过',
@@ -445,9 +562,8 @@ class SubApplication(AppUi, QWidget):
                 try:
                     if hasattr(self, 'PlainTextRevision') and isinstance(self.PlainTextRevision, PlainTextEdit):
                         text = self.PlainTextRevision.toPlainText()
-                        binding_txt_path = binding_path.rsplit('.', 1)[0] + '.txt'  # 给文本文件加上扩展名
-                        with open(binding_txt_path, 'w', encoding='utf-8') as txt:
-                            txt.write(text)
+                        bind_text(text, binding_path)  # 给文本文件加上扩展名
+                        signalBus.bookBound.emit(os.path.dirname(binding_path))
                         InfoBar.success(
                             title='装订成功',
                             content='文件已保存至' + str(os.path.dirname(binding_path)),
@@ -492,222 +608,121 @@ class SubApplication(AppUi, QWidget):
 
 
 # SubBookShelf 页面卡片的逻辑
-class FolderCard(ElevatedCardWidget):
-    # 定义信号，待写，当点击取书时候触发，将路径传给TreeWidget；当点击还书时候触发，将路径从TreeWidget剔除
-    book = Signal(str, bool)
-
-    def __init__(self, folder_name, parent=None):
-        super().__init__(parent=parent)
-        self._folderName = ""
-
-        self.initUI()
-        self.load()
-
-        self.folderName = folder_name
-
-    def load(self):
-        self.tgCtl.toggled.connect(self.ctlToggled)
-
-    @property
-    def folderName(self):
-        return self._folderName
-
-    @folderName.setter
-    def folderName(self, value: str):
-        self.lbFolderName.setText(value)
-        self._folderName = value
-
-    def ctlToggled(self, state: bool):
-        binding_folder = r"binding"
-        reading_folder = r"reading"
-        if state:
-            self.source_folder = os.path.join(binding_folder, self.folderName)
-            self.target_folder = os.path.join(reading_folder, self.folderName)
-            self.moveBookToReading()
-        else:
-            self.source_folder = os.path.join(reading_folder, self.folderName)
-            self.target_folder = os.path.join(binding_folder, self.folderName)
-            self.moveBookToBinding()
-
-    def moveBookToReading(self):
-        self.copyBook()
-        TeachingTip.create(
-            target=self.lbFolderName,
-            icon=InfoBarIcon.SUCCESS,
-            title='『' + str(self.folderName) + '』 ' + '  取书成功',
-            content="请前往阅读页面查看书籍",
-            isClosable=False,  # 右上角关闭按钮不显示
-            tailPosition=TeachingTipTailPosition.TOP,
-            duration=3000,
-            parent=self
-        )
-
-    def moveBookToBinding(self):
-        self.moveBook()
-        TeachingTip.create(
-            target=self.lbFolderName,
-            icon=InfoBarIcon.SUCCESS,
-            title='『' + str(self.folderName) + '』 ' + '  还书成功',
-            content="下次阅读前请先从书架上取书",
-            isClosable=False,  # 右上角关闭按钮不显示
-            tailPosition=TeachingTipTailPosition.TOP,
-            duration=6000,
-            parent=self
-        )
-
-    def copyBook(self):
-        if os.path.exists(self.source_folder):
-            try:
-                if os.path.exists(self.target_folder):
-                    shutil.rmtree(self.target_folder)
-                    shutil.copytree(self.source_folder, self.target_folder)
-                else:
-                    shutil.copytree(self.source_folder, self.target_folder)
-            except Exception as e:
-                signalBus.showInfoBar.emit(InfoBarMsgModel(
-                    title="取书失败",
-                    content=f"{str(self.folderName)}:{str(e)}",
-                    type="error",
-                    duration=-1,
-                    position=InfoBarPosition.BOTTOM
-                ))
-        else:
-            signalBus.showInfoBar.emit(InfoBarMsgModel(
-                title='路径不存在',
-                type="error",
-                content='请检查 ' + str(self.source_folder) + ' 是否正确',
-                isClosable=True,
-                position=InfoBarPosition.BOTTOM_RIGHT,
-                duration=-1,  # 不会自动消失
-            ))
-
-    def moveBook(self):
-        if os.path.exists(self.source_folder):
-            try:
-                if os.path.exists(self.target_folder):
-                    shutil.rmtree(self.target_folder)
-                    shutil.move(self.source_folder, self.target_folder)
-                else:
-                    shutil.move(self.source_folder, self.target_folder)
-            except Exception as e:
-                signalBus.showInfoBar.emit(InfoBarMsgModel(
-                    title="还书失败",
-                    content=f"{str(self.folderName)}:{str(e)}",
-                    type="error",
-                    duration=-1,
-                    position=InfoBarPosition.BOTTOM
-                ))
-        else:
-            signalBus.showInfoBar.emit(InfoBarMsgModel(
-                title='路径不存在',
-                type="error",
-                content='请检查 ' + str(self.source_folder) + ' 是否正确',
-                isClosable=True,
-                position=InfoBarPosition.BOTTOM_RIGHT,
-                duration=-1,  # 不会自动消失
-            ))
-
-
-    def initUI(self):
-        self.setStyleSheet("padding: 10px; margin: 5px;")
-        self.setFixedSize(220, 300)
-        layout = QHBoxLayout(self)
-        self.lbFolderName = StrongBodyLabel(self)
-        self.lbFolderName.setFixedWidth(220)
-        self.tgCtl = PillPushButton('取書')
-
-        layout.addWidget(self.lbFolderName)
-        layout.addWidget(self.tgCtl)
-        layout.setAlignment(self.tgCtl, Qt.AlignBottom)
-        layout.setAlignment(self.lbFolderName, Qt.AlignTop)
-
-
 class SubBookShelf(BookShelfUi, QWidget):
 
     def __init__(self, text: str, parent=None):
         super().__init__(parent=parent)
         self.setupUi(self)
-        # 创建滚动区域
-        self.scroll_area = QWidget()
-        self.SmoothScrollArea.setWidgetResizable(True)
-        self.SmoothScrollArea.setWidget(self.scroll_area)
-        self.SmoothScrollArea.setStyleSheet("QScrollArea { background-color: white; }")
-        # 创建主布局
-        self.card_layout = FlowLayout(self.scroll_area)
-        # self.CardWidget = QGridLayout(self)
         # 2024-11-05 程序优化，路径改为相对路径，便于后续文件夹的创建和移动
         self.base_path = Path('../OCR/binding')
 
-        self.initFolderCard()
-        # 将滚动区域添加到主布局
-        self.scroll_area.setLayout(self.card_layout)
+        # 2025-02-10 书架改为QListView + 委托绘制卡片，只绘制可见的卡片（见book_shelf.py）
+        self.SmoothScrollArea.hide()
+        self.shelf_model = BookShelfModel(self.base_path, parent=self)
+        self.shelf_model.bookToggled.connect(self.toggle_book)
+        # 2025-02-12 搜索书名和全文（见book_search.py），结果按相关度排序
+        self.proxy_model = BookSearchProxyModel(self)
+        self.proxy_model.setSourceModel(self.shelf_model)
+        self.ListViewBooks = QListView(self.CardWidget)
+        self.ListViewBooks.setViewMode(QListView.IconMode)
+        self.ListViewBooks.setResizeMode(QListView.Adjust)
+        self.ListViewBooks.setMovement(QListView.Static)
+        self.ListViewBooks.setUniformItemSizes(True)
+        self.ListViewBooks.setSelectionMode(QListView.NoSelection)
+        self.ListViewBooks.setMouseTracking(True)
+        self.ListViewBooks.setItemDelegate(BookCardDelegate(self.ListViewBooks))
+        self.ListViewBooks.setModel(self.proxy_model)
+        self.ListViewBooks.setStyleSheet("QListView { background-color: white; border: none; }")
+        self.verticalLayout_2.addWidget(self.ListViewBooks)
         self.setObjectName(text.replace(' ', '-'))
 
-        self.SearchLineEdit.textChanged.connect(self.filter_book)
-
-        # 创建文件系统监视器
-        self.file_watcher = QFileSystemWatcher()
-        self.file_watcher.addPath(str(self.base_path))  # 监视整个文件夹
-        # 连接文件夹变化的信号
-        self.file_watcher.directoryChanged.connect(self.directory_changed)
-
-    def initFolderCard(self):
-        """
-        初始化card到grid
-        :return:
-        """
-
-        for folderPath in self.base_path.iterdir():
-            if not folderPath.is_dir():
-                continue
-            card = FolderCard(folderPath.name, parent=self)
-            self.card_layout.addWidget(card)
-
-    def directory_changed(self):
-        # 目录变化时刷新 TreeWidget
-        self.onFolderChangeRefresh()
-
-    def onFolderChangeRefresh(self):
-        # 更新 SubBookShelf 页面中的卡片视图，显示 `base_path` 文件夹内的子文件夹。
-
-        # 获取当前grid里所有FolderCard元素
-        existCardWidgets: List[FolderCard] = [self.card_layout.itemAt(i).widget() for i in range(self.card_layout.count()) if isinstance(self.card_layout.itemAt(i).widget(), FolderCard)]
-        existFolderName = set([i.folderName for i in existCardWidgets])
-
-        # 获取最新文件夹名
-        latestFolderName = set([i.name for i in self.base_path.iterdir()])
-
-        # 新增文件名
-        newFolder = list(latestFolderName - existFolderName)
-        # 移除文件名
-        deletedFolder = list(existFolderName - latestFolderName)
-
-        for folderName in deletedFolder:
-            card = next(i for i in existCardWidgets if i.folderName == folderName)
-            card.deleteLater()
-
-        for folderName in newFolder:
-            card = FolderCard(folderName, parent=self)
-            self.card_layout.addWidget(card)
+        # 2025-02-12 停止输入200ms后再搜索
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.filter_book)
+        self.SearchLineEdit.textChanged.connect(self.search_timer.start)
+        signalBus.searchIndexUpdated.connect(self.on_search_index_updated)
+        signalBus.bookBound.connect(self.on_book_bound)
+        signalBus.bookBorrowed.connect(self.on_book_borrowed)
+        signalBus.bookBorrowFailed.connect(self.on_book_borrow_failed)
+
+        # 2025-02-14 书架目录由共用的目录监视服务监视（fs_watcher.py），一连串变化合并后只通知一次
+        fsWatcher.watch(self.shelf_model.root)
+        signalBus.dirChanged.connect(self.directory_changed)
+        # 启动时在后台补全索引中缺少或已过期的书
+        SearchIndexJob(self.shelf_model.root).start()
+
+    def directory_changed(self, changes):
+        # 目录变化时只增删变化的书，并只更新这些书的索引
+        if changes.path != self.shelf_model.root:
+            return
+        self.shelf_model.refresh(changes)
+        # 已取出的书从书架上删除时，同时还书
+        for book in changes.removed:
+            if libraryIndex.give_back(book):
+                signalBus.bookBorrowed.emit(book, False)
+        if changes.added or changes.removed:
+            SearchIndexJob(self.shelf_model.root, changes.added + changes.removed).start()
+
+    def on_book_bound(self, book_dir):
+        # 装订到书架上的书，重新索引其全文
+        root = self.shelf_model.root
+        if os.path.dirname(os.path.abspath(book_dir)) == os.path.abspath(root):
+            SearchIndexJob(root, [os.path.join(root, os.path.basename(book_dir))]).start()
+
+    def on_search_index_updated(self, root):
+        if root == self.shelf_model.root and self.SearchLineEdit.text().strip():
+            self.filter_book()
+
+    def toggle_book(self, folder_name, state):
+        # 2025-02-13 取书/还书只在书库索引中记录状态，书始终留在binding中，阅读页直接显示
+        BorrowJob(os.path.join(self.shelf_model.root, folder_name), state).start()
+
+    def on_book_borrowed(self, book, state):
+        if not os.path.isdir(book):
+            # 书已从书架上删除
+            return
+        folder_name = os.path.basename(book)
+        if state:
+            signalBus.showInfoBar.emit(InfoBarMsgModel(
+                title='『' + str(folder_name) + '』 ' + '  取书成功',
+                content="请前往阅读页面查看书籍",
+                duration=3000,
+                position=InfoBarPosition.BOTTOM
+            ))
+        else:
+            signalBus.showInfoBar.emit(InfoBarMsgModel(
+                title='『' + str(folder_name) + '』 ' + '  还书成功',
+                content="下次阅读前请先从书架上取书",
+                duration=6000,
+                position=InfoBarPosition.BOTTOM
+            ))
 
-    # 遍历 CardWidget，如果文件夹名包含搜索内容则显示，否则隐藏
+    def on_book_borrow_failed(self, book, state, message):
+        self.shelf_model.setBorrowed(book, not state)
+        signalBus.showInfoBar.emit(InfoBarMsgModel(
+            title="取书失败" if state else "还书失败",
+            content=f"{os.path.basename(book)}:{message}",
+            type="error",
+            duration=-1,
+            position=InfoBarPosition.BOTTOM
+        ))
+
+    # 书名或全文包含搜索内容则显示，按相关度排序；搜索为空时显示全部
     def filter_book(self):
-        # todo
-        name = self.SearchLineEdit.text()
-
-        for i in range(self.card_layout.count()):
-            widget = self.card_layout.itemAt(i).widget()
-            folder_name = widget.folderName
-            if name in folder_name:
-                widget.show()
-            else:
-                widget.hide()
-
-
+        query = self.SearchLineEdit.text().strip()
+        if not query:
+            self.proxy_model.setHits(None)
+            return
+        # 索引还没建好时先按书名过滤
+        self.proxy_model.setHits(bookSearch.matches(query, self.shelf_model.paths))
 
 
 # 2024-12-11重写古典阅读模式，增加竖条仿古
 class VerticalColumnTextEdit(PlainTextEdit):
+    pageChanged = Signal(int, int)  # 当前页（从0开始）, 总页数
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.column_width = 50  # 每列宽度
@@ -717,79 +732,198 @@ class VerticalColumnTextEdit(PlainTextEdit):
         self.cursor_blink_timer.setInterval(500)  # 光标闪烁间隔
         self.cursor_blink_timer.timeout.connect(self.toggle_cursor_visibility)
         self.cursor_visible = True
+        # 2025-01-29 排版结果缓存在VerticalLayout中，文本、字体或大小变化时才重新排版
+        self.vertical_layout = VerticalLayout()
+        self.text_dirty = True
+        # 每个字的QStaticText缓存，字体变化时清空
+        self.static_texts = {}
         self.document().contentsChanged.connect(self.update_cursor_position)
-        self.cursor_position = None  # 当前光标的位置 (x, y)
+        self.cursorPositionChanged.connect(self.update_cursor_rect)
+        self.cursor_rect = QRectF()  # 当前光标所在区域
+        # 2025-02-03 整本书分页显示（BookPager），文档中只放当前一页的文字
+        self.pager = None
+        self.page = 0
+        # 当前页第一个字在整本书中的序号，窗口大小或字体变化后重新分页时保持这个字仍在当前页
+        self.anchor_glyph = 0
+        self.wheel_delta = 0
         # 启动光标闪烁定时器
         self.cursor_blink_timer.start()
 
-    # 重写paint事件，实现竖向排版
+    def update_geometry(self):
+        # 计算可用绘制区域
+        rect = self.contentsRect().adjusted(self.margin, self.margin, -self.margin, -self.margin)
+        return self.vertical_layout.set_geometry(rect.left(), rect.top(), rect.right(), rect.height(),
+                                                 self.column_width, self.line_height)
+
+    def ensure_layout(self):
+        changed = self.update_geometry()
+        if self.text_dirty:
+            self.vertical_layout.set_text(self.toPlainText())
+            self.text_dirty = False
+            changed = True
+        if changed:
+            self.cursor_rect = self.compute_cursor_rect()
+
+    # ---- 分页 ----
+    def setBook(self, pager, anchor_glyph=0):
+        """显示整本书，从第anchor_glyph个字所在的页开始"""
+        self.pager = pager
+        self.anchor_glyph = anchor_glyph
+        self.show_page(self.pager.page_of(anchor_glyph, self.page_size()))
+
+    def setPlainText(self, text):
+        # 直接设置文本时退出分页模式
+        self.pager = None
+        super().setPlainText(text)
+
+    def page_size(self):
+        self.update_geometry()
+        return max(self.vertical_layout.rows * self.vertical_layout.columns, 1)
+
+    def page_count(self):
+        return self.pager.page_count(self.page_size()) if self.pager is not None else 1
+
+    def show_page(self, page):
+        size = self.page_size()
+        page = min(max(page, 0), self.pager.page_count(size) - 1)
+        self.page = page
+        super().setPlainText(self.pager.page(page, size))
+        self.setToolTip(f"第{page + 1}/{self.pager.page_count(size)}页")
+        self.pageChanged.emit(page, self.pager.page_count(size))
+        # 当前页绘制完成后再预读前后页
+        pager = self.pager
+        QTimer.singleShot(0, lambda: pager.prefetch(page, size))
+
+    def goToPage(self, page):
+        if self.pager is None:
+            return
+        self.anchor_glyph = self.pager.page_start(min(max(page, 0), self.page_count() - 1), self.page_size())
+        self.show_page(page)
+
+    def nextPage(self):
+        self.goToPage(self.page + 1)
+
+    def previousPage(self):
+        self.goToPage(self.page - 1)
+
+    def repaginate(self):
+        if self.pager is not None:
+            self.show_page(self.pager.page_of(self.anchor_glyph, self.page_size()))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.repaginate()
+
+    def wheelEvent(self, event):
+        if self.pager is None:
+            super().wheelEvent(event)
+            return
+        # 触控板会发出很多小幅度的滚动，累计满一格再翻页
+        self.wheel_delta += event.angleDelta().y()
+        while abs(self.wheel_delta) >= 120:
+            if self.wheel_delta < 0:
+                self.nextPage()
+                self.wheel_delta += 120
+            else:
+                self.previousPage()
+                self.wheel_delta -= 120
+        event.accept()
+
+    def static_text(self, char):
+        static_text = self.static_texts.get(char)
+        if static_text is None:
+            static_text = QStaticText(char)
+            static_text.setTextFormat(Qt.PlainText)
+            static_text.prepare(font=self.font())
+            self.static_texts[char] = static_text
+        return static_text
+
+    # 重写paint事件，实现竖向排版；只绘制需要重绘的区域内的字
     def paintEvent(self, event):
+        self.ensure_layout()
+        layout = self.vertical_layout
         painter = QPainter(self.viewport())
         painter.setFont(self.font())
-        metrics = QFontMetrics(self.font())
+        dirty = event.rect()
 
-        # 计算可用绘制区域
-        rect = self.contentsRect().adjusted(self.margin, self.margin, -self.margin, -self.margin)
-        max_height = rect.height()
-        max_width = rect.width()
-        current_x = rect.right() - self.column_width  # 从最右边开始
-        current_y = rect.top()  # 从顶部开始
-        column_count = 0
-
-        text = self.toPlainText()
-        cursor = self.textCursor()
-        cursor_pos = cursor.position()
-
-        char_index = 0
-        for char in text:
-            if char == '\n':  # 忽略换行符
-                continue
-            elif current_y + self.line_height > max_height:  # 如果当前列高度超出可用高度
-                current_x -= self.column_width  # 开始新列
-                current_y = rect.top()  # 重置 y 坐标为顶部
-                column_count += 1
-                if current_x < rect.left():  # 如果超过了最大列数，停止绘制
-                    break
-
-            # 绘制单个字符
-            painter.drawText(QRectF(current_x, current_y, self.column_width, self.line_height), Qt.AlignCenter | Qt.AlignVCenter, char)
-
-            # 更新光标位置
-            if char_index == cursor_pos - 1:
-                self.cursor_position = (current_x, current_y)
-            char_index += 1
-
-            current_y += self.line_height  # 下移一行
+        for i in layout.glyphs_in(dirty.left(), dirty.top(), dirty.right(), dirty.bottom()):
+            x, y = layout.cell(i)
+            static_text = self.static_text(layout.glyphs[i])
+            size = static_text.size()
+            # 单个字在格子中居中
+            painter.drawStaticText(QPointF(x + (self.column_width - size.width()) / 2,
+                                           y + (self.line_height - size.height()) / 2), static_text)
 
         # 在每列的右边画竖线作为分隔线
+        column_count = layout.used_columns - (0 if layout.overflow else 1)
         if column_count > 0:
             pen = QPen(QColor(Qt.black))
             pen.setWidth(1)
             painter.setPen(pen)
             for col in range(1, column_count + 1):
-                line_x = rect.right() - (col * self.column_width)
-                painter.drawLine(line_x, rect.top(), line_x, rect.bottom())
+                line_x = layout.right - (col * self.column_width)
+                if dirty.left() - 1 <= line_x <= dirty.right() + 1:
+                    painter.drawLine(line_x, dirty.top(), line_x, dirty.bottom())
 
         # 绘制光标
-        if self.cursor_position and self.cursor_visible:
-            cursor_rect = QRectF(self.cursor_position[0], self.cursor_position[1], 2, self.line_height)
+        if self.cursor_visible and not self.cursor_rect.isNull():
             pen = QPen(QColor(Qt.black))
             pen.setWidth(2)  # 设置光标的宽度
             painter.setPen(pen)
-            painter.drawLine(cursor_rect.topLeft(), cursor_rect.bottomLeft())
+            painter.drawLine(self.cursor_rect.topLeft(), self.cursor_rect.bottomLeft())
+
+    def compute_cursor_rect(self):
+        i = self.vertical_layout.cursor_glyph(self.textCursor().position())
+        if i is None:
+            return QRectF()
+        x, y = self.vertical_layout.cell(i)
+        return QRectF(x, y, 2, self.line_height)
+
+    def update_cursor_rect(self):
+        # 光标移动时只重绘新旧两处光标
+        old_rect = self.cursor_rect
+        self.cursor_rect = self.compute_cursor_rect()
+        self.viewport().update(old_rect.adjusted(-2, -2, 2, 2).toAlignedRect())
+        self.viewport().update(self.cursor_rect.adjusted(-2, -2, 2, 2).toAlignedRect())
 
     def toggle_cursor_visibility(self):
         self.cursor_visible = not self.cursor_visible
-        self.viewport().update()  # 触发重绘
+        # 闪烁时只重绘光标所在区域
+        if not self.cursor_rect.isNull():
+            self.viewport().update(self.cursor_rect.adjusted(-2, -2, 2, 2).toAlignedRect())
 
     def update_cursor_position(self):
-        cursor = self.textCursor()
-        cursor_pos = cursor.position()
-        self.viewport().update()  # 触发重绘以更新光标位置
+        self.text_dirty = True
+        self.viewport().update()  # 文本变化，整体重绘
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        # 父类构造时就会设置字体，此时缓存尚未创建
+        if event.type() == QEvent.FontChange and hasattr(self, 'static_texts'):
+            # 行高跟随字体，已缓存的字形作废
+            self.line_height = self.fontMetrics().height() + 5
+            self.static_texts.clear()
+            self.viewport().update()
+            self.repaginate()
 
     def keyPressEvent(self, event):
+        if self.pager is not None:
+            # 竖排从右向左阅读：PageDown/左方向键/空格为下一页，PageUp/右方向键为上一页
+            key = event.key()
+            if key in (Qt.Key_PageDown, Qt.Key_Left, Qt.Key_Space):
+                self.nextPage()
+                return
+            if key in (Qt.Key_PageUp, Qt.Key_Right):
+                self.previousPage()
+                return
+            if key == Qt.Key_Home:
+                self.goToPage(0)
+                return
+            if key == Qt.Key_End:
+                self.goToPage(self.page_count() - 1)
+                return
         super().keyPressEvent(event)
-        self.update_cursor_position()  # 确保每次按键后都更新光标位置
+        self.update_cursor_rect()  # 确保每次按键后都更新光标位置
 
     def focusInEvent(self, event):
         super().focusInEvent(event)
@@ -803,7 +937,8 @@ class VerticalColumnTextEdit(PlainTextEdit):
 
 class SubRead(ReadUi, QWidget):
     # 2024-11-05 程序优化，路径改为相对路径，便于后续文件夹的创建和移动
-    my_data_dct = {"dir": "../OCR/reading", "uuid": {}, "txt": {}}
+    my_data_dct = {"dir": "../OCR/reading"}
+    # 当前显示文本所属的目录
     scdj = ""
 
     def __init__(self, text: str, parent=None):
@@ -812,6 +947,8 @@ class SubRead(ReadUi, QWidget):
         self.setupUi(self)
         self.setObjectName(text.replace(' ', '-'))
         self.TreeWidBook.itemClicked.connect(self.clickeditems)
+        # 2025-01-27 目录展开时才加载下一层
+        self.TreeWidBook.itemExpanded.connect(self.expand_item)
 
         self.TreeWidBook.setColumnCount(3)
         self.TreeWidBook.setHeaderLabels(["我的藏书", "描述", ""])
@@ -825,23 +962,30 @@ class SubRead(ReadUi, QWidget):
         self.root_dir = self.my_data_dct["dir"]
         # 如果不存在则创建目录
         self.create_dir(self.root_dir)
-        # 从根节点开始填充
+        # 2025-01-27 已加载的目录 -> 树节点，只监视这些目录，变化时只更新对应的一层
+        self.tree_items = {}
+        # 从根节点开始填充（只加载第一层，书库索引见library_index.py）
         self.populate_tree(self.root_dir, self.TreeWidBook.invisibleRootItem())
-
-        self.file_watcher = QFileSystemWatcher()
-        self.file_watcher.addPath(self.root_dir)  # 监视整个文件夹
-        # 连接文件夹变化的信号
-        self.file_watcher.directoryChanged.connect(self.refresh_tree)
+        # 2025-02-13 从书架取出的书不再复制到reading，直接显示binding中的书（排在reading中的书之后）
+        for book in libraryIndex.borrowed():
+            self.TreeWidBook.addTopLevelItem(self.create_item(book, True))
+        signalBus.bookBorrowed.connect(self.on_book_borrowed)
+        # 连接文件夹变化的信号（fs_watcher.py，已算出变化的文件和子目录）
+        signalBus.dirChanged.connect(self.refresh_tree)
         # self.frame_2.setStyleSheet("border: 1px solid red;")  # 设置边框为1px宽的红色实线
         self.show()
-        self.SearchLineEdit.textChanged.connect(self.filter_book)
-
-        # 2024-12-06 在SubApplication中实例化SettingsManager
-        self.settings_manager = SettingsManager('settings')
-        # 连接信号
-        self.settings_manager.settingVar.connect(self.receivedReadSettings)
-        # 从文件加载设置并发射信号
-        self.settings_manager.loadSettings()
+        # 2025-02-12 停止输入200ms后再搜索书名和全文
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.filter_book)
+        self.SearchLineEdit.textChanged.connect(self.search_timer.start)
+        signalBus.searchIndexUpdated.connect(self.on_search_index_updated)
+        SearchIndexJob(self.root_dir).start()
+
+        # 2025-02-15 设置从全局设置读取，设置页修改后立即生效
+        self.receivedReadSettings(settingsStore.all())
+        settingsStore.changed.connect(self.on_setting_changed)
 
         # 接收设置并实例化变量
         self.PlainTextClassic = VerticalColumnTextEdit(self)
@@ -851,7 +995,8 @@ class SubRead(ReadUi, QWidget):
         self.PlainText.setReadOnly(True)
         self.PlainTextClassic.setReadOnly(True)
         self.PlainText.setFocusPolicy(Qt.NoFocus)
-        self.PlainTextClassic.setFocusPolicy(Qt.NoFocus)
+        # 2025-02-03 古典模式点击后可用键盘翻页
+        self.PlainTextClassic.setFocusPolicy(Qt.ClickFocus)
 
 
     def receivedReadSettings(self, settings):
@@ -862,12 +1007,65 @@ class SubRead(ReadUi, QWidget):
         self.read_font_size = self.font_size
         self.read_status_C = self.status_C
         self.read_status_M = self.status_M
-
-
-    def refresh_tree(self):
-        self.TreeWidBook.clear()
-        # 重新填充树
-        self.populate_tree(self.root_dir, self.TreeWidBook.invisibleRootItem())
+        if hasattr(self, 'page_view'):
+            self.page_view.prefetch = getattr(self, 'read_prefetch', 2)
+
+    def on_setting_changed(self, key, value):
+        self.receivedReadSettings(settingsStore.all())
+        if key in ('font_family', 'font_size', 'status_C', 'status_M') and self.scdj:
+            # 按新的字体或阅读模式重新显示当前的书，古典模式保持当前页的第一个字
+            dir_path, self.scdj = self.scdj, ""
+            self.show_text(dir_path, self.PlainTextClassic.anchor_glyph)
+
+
+    def refresh_tree(self, changes):
+        # 2025-01-27 只处理发生变化的目录，增删对应的子节点，不再清空重建整棵树
+        dir_path = changes.path
+        parent_item = self.tree_items.get(dir_path)
+        if parent_item is None:
+            return
+        # 书架上增删了书，或某本书中的txt发生变化时更新全文索引
+        root = os.path.normpath(self.root_dir)
+        if dir_path == root and (changes.added or changes.removed):
+            SearchIndexJob(root, changes.added + changes.removed).start()
+        elif dir_path != root and parent_item.parent() is None and changes.text_changed:
+            # 顶层的书（reading中的书或取出的书）；书架根目录下的txt不属于任何一本书
+            SearchIndexJob(os.path.dirname(dir_path), [dir_path]).start()
+        if dir_path in changes.removed:
+            # 目录本身被删除，由上一层目录的变化负责移除节点
+            self.forget_items(dir_path)
+            return
+        removed = set(changes.removed)
+        for i in reversed(range(parent_item.childCount())):
+            child = parent_item.child(i)
+            if child.data(0, Qt.UserRole) in removed:
+                self.forget_items(child.data(0, Qt.UserRole))
+                parent_item.removeChild(child)
+        if changes.added:
+            # 按索引中的顺序插入新增的节点
+            for row, (item_path, is_dir) in enumerate(libraryIndex.children(dir_path)):
+                if item_path in changes.added:
+                    parent_item.insertChild(row, self.create_item(item_path, is_dir))
+        if changes.text_changed and self.scdj == dir_path:
+            # 正在阅读的目录下的txt发生变化，重新加载文本
+            self.scdj = ""
+            self.show_text(dir_path, self.PlainTextClassic.anchor_glyph)
+
+    def on_book_borrowed(self, book, state):
+        items = [self.TreeWidBook.topLevelItem(i) for i in range(self.TreeWidBook.topLevelItemCount())]
+        item = next((item for item in items if item.data(0, Qt.UserRole) == book), None)
+        if state and item is None:
+            self.TreeWidBook.addTopLevelItem(self.create_item(book, True))
+        elif not state and item is not None:
+            self.forget_items(book)
+            self.TreeWidBook.takeTopLevelItem(self.TreeWidBook.indexOfTopLevelItem(item))
+
+    def forget_items(self, dir_path):
+        # 停止监视已删除的目录及其下已加载的子目录
+        prefix = dir_path + os.sep
+        for path in [p for p in self.tree_items if p == dir_path or p.startswith(prefix)]:
+            del self.tree_items[path]
+            fsWatcher.unwatch(path)
 
     # 2024-11-05 程序优化，便于后续文件夹的创建和移动，为update_TreeWidget前置条件
     def create_dir(self, dir_path):
@@ -898,33 +1096,29 @@ class SubRead(ReadUi, QWidget):
             )
 
     def populate_tree(self, dir_path, parent_item):
-        """递归填充树控件"""
-        txt_data = ""
-        for item_name in os.listdir(dir_path):
-            item_path = os.path.join(dir_path, item_name)
-            if ".txt" in item_path:
-                with open(item_path, "r", encoding="utf-8") as f:
-                    txt_data += f.read()
-        short_ida = shortuuid.uuid()  # 生成 22 位的短 UUID
-        self.my_data_dct["txt"][short_ida] = txt_data
-
-        for item_name in os.listdir(dir_path):
-            item_path = os.path.join(dir_path, item_name)
-            if os.path.isfile(item_path):
-                hzm = str(item_path).split(".")[-1]
-                if not hzm in ['png', 'jpg', 'jpeg', 'gif', 'bmp', 'tif', 'tga']:
-                    continue
-            item = QTreeWidgetItem(parent_item)
-            # 显示路径和uuid对应关系
-            # print("wty:", dir_path, "a", item_path)
-            item.setText(0, item_name)
-            short_id = shortuuid.uuid()  # 生成 22 位的短 UUID
-            self.my_data_dct["uuid"][short_id] = item_path
-            item.setText(1, short_id)
-            item.setText(2, short_ida)
-
-            if os.path.isdir(item_path):
-                self.populate_tree(item_path, item)  # 递归处理子目录
+        """填充一层树节点，子目录在展开时再填充"""
+        dir_path = os.path.normpath(dir_path)
+        self.tree_items[dir_path] = parent_item
+        fsWatcher.watch(dir_path)
+        for item_path, is_dir in libraryIndex.children(dir_path):
+            parent_item.addChild(self.create_item(item_path, is_dir))
+
+    def create_item(self, item_path, is_dir):
+        item = QTreeWidgetItem()
+        item.setText(0, os.path.basename(item_path))
+        # 节点上直接保存完整路径
+        item.setData(0, Qt.UserRole, item_path)
+        if is_dir:
+            item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+        return item
+
+    def expand_item(self, item):
+        item_path = item.data(0, Qt.UserRole)
+        if item_path is None or item_path in self.tree_items:
+            return
+        self.populate_tree(item_path, item)
+        if item.childCount() == 0:
+            item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicatorWhenChildless)
 
     def addPixmap(self, parent, filename):
         item = QTreeWidgetItem(parent)
@@ -941,28 +1135,31 @@ class SubRead(ReadUi, QWidget):
                 self.addPixmap(parent, filepath)
 
     def clickeditems(self):
-        item = self.TreeWidBook.currentItem().text(0)
-        item2 = self.TreeWidBook.currentItem().text(1)
-        item3 = self.TreeWidBook.currentItem().text(2)
+        item_path = self.TreeWidBook.currentItem().data(0, Qt.UserRole)
+        # 显示节点所在目录下全部txt拼接的文本，点击时才从磁盘读取
+        self.show_text(os.path.dirname(item_path))
 
-        if not self.scdj == item3:
-            txt_data = self.my_data_dct["txt"][item3]
-            if self.read_status_C == True:
-                self.PlainTextClassic.setPlainText(txt_data)
-                font = QFont(self.read_font_family, self.read_font_size)
-                self.PlainTextClassic.setFont(font)
+        if not item_path.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tga')):
+            return
+        self.show_reading_img(item_path)
 
-            else:
-                self.PlainText.setPlainText(txt_data)
-                font = QFont(self.read_font_family, self.read_font_size)
-                self.PlainText.setFont(font)
-                self.PlainTextClassic.hide()
-            self.scdj = item3
-
-        paths_img = self.my_data_dct["uuid"][item2]
-        if not any(ext in str(paths_img).lower() for ext in ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tga')):
+    def show_text(self, dir_path, anchor_glyph=0):
+        if self.scdj == dir_path:
             return
-        self.show_reading_img(paths_img)
+        if self.read_status_C == True:
+            # 2025-02-03 古典模式按页显示整本书，只读取当前页和前后页涉及的txt
+            font = QFont(self.read_font_family, self.read_font_size)
+            self.PlainTextClassic.setFont(font)
+            self.PlainTextClassic.show()
+            self.PlainTextClassic.setBook(BookPager.from_dir(dir_path), anchor_glyph)
+
+        else:
+            txt_data = libraryIndex.text(dir_path)
+            self.PlainText.setPlainText(txt_data)
+            font = QFont(self.read_font_family, self.read_font_size)
+            self.PlainText.setFont(font)
+            self.PlainTextClassic.hide()
+        self.scdj = dir_path
 
     def show_reading_img(self, image_file):
         if self.show_flag == 0:
@@ -974,82 +1171,78 @@ class SubRead(ReadUi, QWidget):
             self.view_box = self.graphics_layout.addViewBox()
             self.view_box.setAspectLocked(True)  # 锁定纵横比
             self.view_box.setBackgroundColor('w')
-            # 处理文件不存在的情况
-            try:
-                pixmap = QPixmap(image_file)
-                image = pixmap.toImage()
-                image_array = pg.imageToArray(image, copy=True)
-                # image_array = np.flipud(image_array)  # 垂直翻转 numpy 数组
-                image_array = np.fliplr(image_array)  # 水平翻转 numpy 数组
-                self.image_item = pg.ImageItem(image_array)
-                # self.view_box.addItem(image_array)
-                self.view_box.addItem(self.image_item)
-            except FileNotFoundError:
-                InfoBar.error(
-                    title='指定的文件不存在',
-                    content=str(image_file) + ' 未找到',
-                    orient=Qt.Horizontal,
-                    isClosable=True,
-                    position=InfoBarPosition.BOTTOM_RIGHT,
-                    duration=-1,
-                    parent=self
-                )
+            # 2025-02-05 按缩放比例分块加载图片金字塔，大图不再整张解码、转换和翻转
+            self.page_view = PyramidView(self.view_box, prefetch=getattr(self, 'read_prefetch', 2), parent=self)
+            signalBus.pyramidFailed.connect(self.on_pyramid_failed)
             # 显示完图片后，show_flag置1，避免重复
             self.show_flag = 1
-        else:
-            pixmap = QPixmap(image_file)
-            image = pixmap.toImage()
-            image_array = pg.imageToArray(image, copy=True)
-            image_array = np.fliplr(image_array)  # 水平翻转 numpy 数组
-            # image_item = pg.ImageItem(image_array)
-            self.image_item.setImage(image_array)  # 更新图片
-            self.view_box.autoRange()  # 自动调整视图范围
+        # 处理文件不存在的情况
+        if not os.path.exists(image_file):
+            InfoBar.error(
+                title='指定的文件不存在',
+                content=str(image_file) + ' 未找到',
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.BOTTOM_RIGHT,
+                duration=-1,
+                parent=self
+            )
+            return
+        # 2025-02-07 同时在后台预读同一目录中前后几页
+        pages = [path for path, is_dir in libraryIndex.children(os.path.dirname(image_file)) if not is_dir]
+        self.page_view.setImage(image_file, pages)
+
+    def on_pyramid_failed(self, image_file, message):
+        InfoBar.error(
+            title='图片加载失败',
+            content=f'{image_file}：{message}',
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.BOTTOM_RIGHT,
+            duration=-1,
+            parent=self
+        )
 
     def filter_book(self):
-        name = self.SearchLineEdit.text()
-        # card_list = []
-        count = self.TreeWidBook.topLevelItemCount()
-        # 由于TreeWidget和SmoothScrollArea控件本质不同，所以filter_book()隐藏和显示的逻辑不同
-        for i in range(count):
-            widget = self.TreeWidBook.topLevelItem(i)
-            folder_name = widget.text(0).lower()
-            if name in folder_name:
-                widget.setHidden(False)  # 显示匹配项
-            else:
-                widget.setHidden(True)  # 隐藏不匹配项
-
-
+        # 2025-02-12 书名或全文包含搜索内容的书才显示，搜索为空时全部显示
+        query = self.SearchLineEdit.text().strip()
+        items = [self.TreeWidBook.topLevelItem(i) for i in range(self.TreeWidBook.topLevelItemCount())]
+        if not query:
+            hits = None
+        else:
+            # 取出的书在binding中，逐个书架判断索引是否建好，没建好的书架先按书名过滤
+            hits = set(bookSearch.matches(query, [item.data(0, Qt.UserRole) for item in items]))
+        for item in items:
+            item.setHidden(hits is not None and item.data(0, Qt.UserRole) not in hits)
 
+    def on_search_index_updated(self, root):
+        if self.SearchLineEdit.text().strip():
+            self.filter_book()
 
 
 class SubSetting(SetUi, QWidget):
     settingVar = Signal(dict)  # 定义信号，将设置参数以字典形式传递
 
-    settings = {
-    "font_family": ["Microsoft YaHei UI"],
-    "font_size": 9,
-    "color": "#009faa",
-    "confidence": 1.0,
-    "ocrs": "\u767e\u5ea6OCR",
-    "status_C": True,
-    "status_M": False,
-    "path": ""
-    }
-
     def __init__(self, text: str, parent=None):
         super().__init__(parent=parent)
         self.setupUi(self)
         self.pBtn_Font.clicked.connect(self.chooseFont)
         self.pBtn_Color.clicked.connect(self.chooseColor)
         self.DSpinBox_acc.valueChanged.connect(self.confidence)
-        self.ComboBox_OCRS.addItems(['百度OCR', '腾讯OCR', '阿里OCR', '常中医OCR'])
+        # 2025-02-17 可选的识别后端来自后端注册表（ocr_backends.py）
+        self.ComboBox_OCRS.addItems(backend_names())
         self.ComboBox_OCRS.currentTextChanged.connect(self.ocrSouce)
+        # 2025-02-19 ONNX后端可选INT8量化模型（ocr_quant.py），其他后端不可选
+        self.ComboBox_Prec.addItems(precision_names())
+        self.ComboBox_Prec.currentTextChanged.connect(self.modelPrecision)
         self.LineEdit_Path.textChanged.connect(self.savePath)
         self.RadioButton_C.toggled.connect(self.readClassic)
         self.RadioButton_M.toggled.connect(self.readModern)
         self.setObjectName(text.replace(' ', '-'))
 
-        self.loadSettings('settings')
+        # 2025-02-15 设置保存在全局设置中（settings_store.py），修改时通知各页面，停止修改后才在后台写文件
+        settingsStore.saveFailed.connect(self.on_save_failed)
+        self.loadSettings()
 
     def chooseFont(self):
         ok, font = QFontDialog.getFont()
@@ -1077,7 +1270,6 @@ class SubSetting(SetUi, QWidget):
         ok = color.isValid()
         if ok:
             self.pBtn_Color.setStyleSheet(f"border-radius: 5px; background: {color.name()};")
-            self.settings['color'] = color.name()
             self.updateSettings('color', color.name())
             # return color
 
@@ -1089,8 +1281,26 @@ class SubSetting(SetUi, QWidget):
     def ocrSouce(self):
         ocrs = self.ComboBox_OCRS.currentText()
         self.updateSettings('ocrs', ocrs)
+        self.ComboBox_Prec.setEnabled(ocrBackends.supports(ocrs, 'int8'))
         # return ocrs
 
+    def modelPrecision(self):
+        precision = precision_key(self.ComboBox_Prec.currentText())
+        # 2025-02-26 没有校准图片时不能静态量化，改选动态量化（改选后会再次进入本函数）
+        if precision == 'int8-static' and not calibration_images(CALIBRATION_DIR):
+            InfoBar.warning(
+                title='无法使用静态量化',
+                content=f'{CALIBRATION_DIR} 文件夹中没有校准图片，已改用INT8动态量化',
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.BOTTOM_RIGHT,
+                duration=5000,
+                parent=self
+            )
+            self.ComboBox_Prec.setCurrentText(PRECISIONS['int8-dynamic'])
+            return
+        self.updateSettings('ocr_precision', precision)
+
     def savePath(self):
         # 保存路径
         path = self.LineEdit_Path.text()
@@ -1110,99 +1320,56 @@ class SubSetting(SetUi, QWidget):
         # text_M = self.RadioButton_M.text()
         # return status_M
 
-    # 更新 settings 字典对应键值对
+    # 更新全局设置中对应的键值对
     def updateSettings(self, key, value):
-        self.settings[key] = value
-        self.saveSettings(self.settings, 'settings')
-
-    # 保存设置到 JSON 文件
-    def saveSettings(self, settings, file_path):
-        try:
-            with open(file_path, 'w') as json_file:
-                json.dump(settings, json_file, indent=4)
-        except Exception as e:
-            InfoBar.error(
-                title='保存设置文件异常',
-                content=str(e),
-                orient=Qt.Horizontal,
-                # orient=Qt.Vertical,
-                isClosable=True,
-                position=InfoBarPosition.BOTTOM_RIGHT,
-                duration=-1,  # -1不会自动消失
-                parent=self
-            )
+        settingsStore.set(key, value)
+
+    def on_save_failed(self, message):
+        InfoBar.error(
+            title='保存设置文件异常',
+            content=message,
+            orient=Qt.Horizontal,
+            # orient=Qt.Vertical,
+            isClosable=True,
+            position=InfoBarPosition.BOTTOM_RIGHT,
+            duration=-1,  # -1不会自动消失
+            parent=self
+        )
 
-    # 从 JSON 文件读取设置
-    def loadSettings(self, file_path):
-        try:
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as json_file:
-                    settings = json.load(json_file)
-                    # 如果不符合就else为默认格式
-                    if "font_family" in settings and "font_size" in settings:
-                        self.pBtn_Font.setText(f"{settings['font_family']}      {settings['font_size']}px")
-                    else:
-                        self.pBtn_Font.setText("选择字体")
-
-                    if "color" in settings:
-                        self.pBtn_Color.setStyleSheet(f"border-radius: 5px; background: {settings['color']};")
-                    else:
-                        self.pBtn_Color.setStyleSheet(f"border-radius: 5px; background: '#009faa';")
-
-                    if "confidence" in settings:
-                        self.DSpinBox_acc.setValue(settings['confidence'])
-                    else:
-                        self.DSpinBox_acc.setValue(1.00)
-
-                    if "ocrs" in settings:
-                        self.ComboBox_OCRS.setCurrentText(settings['ocrs'])
-                    else:
-                        self.ComboBox_OCRS.setCurrentIndex(0)
-
-                    if "path" in settings:
-                        self.LineEdit_Path.setText(settings['path'])
-                    else:
-                        self.LineEdit_Path.setText("")
-
-                    if "status_C" in settings:
-                        self.RadioButton_C.setChecked(settings['status_C'])
-                    else:
-                        self.RadioButton_C.setChecked(True)
-
-                    if "status_M" in settings:
-                        self.RadioButton_M.setChecked(settings['status_M'])
-                    else:
-                        self.RadioButton_M.setChecked(False)
-                    # 更新字典
-                    #self.settings.update(settings)
-            else:
-                InfoBar.error(
-                    title='设置文件缺失',
-                    content='文件' + str(file_path) + '不存在',
-                    orient=Qt.Horizontal,
-                    # orient=Qt.Vertical,
-                    isClosable=False,
-                    position=InfoBarPosition.BOTTOM_RIGHT,
-                    duration=3000,  # -1不会自动消失
-                    parent=self
-                )
-        except Exception as e:
+    # 从全局设置读取并显示到控件上
+    def loadSettings(self):
+        settings = settingsStore.all()
+        self.pBtn_Font.setText(f"{settings['font_family']}      {settings['font_size']}px")
+        self.pBtn_Color.setStyleSheet(f"border-radius: 5px; background: {settings['color']};")
+        self.DSpinBox_acc.setValue(settings['confidence'])
+        self.ComboBox_OCRS.setCurrentText(settings['ocrs'])
+        self.ComboBox_Prec.setCurrentText(PRECISIONS.get(settings['ocr_precision'], PRECISIONS['fp32']))
+        self.ComboBox_Prec.setEnabled(ocrBackends.supports(settings['ocrs'], 'int8'))
+        self.LineEdit_Path.setText(settings['path'])
+        self.RadioButton_C.setChecked(settings['status_C'])
+        self.RadioButton_M.setChecked(settings['status_M'])
+        if not os.path.exists(settingsStore.path):
             InfoBar.error(
-                title='设置文件加载异常',
-                content=str(e),
+                title='设置文件缺失',
+                content='文件' + str(settingsStore.path) + '不存在',
                 orient=Qt.Horizontal,
                 # orient=Qt.Vertical,
-                isClosable=True,
+                isClosable=False,
                 position=InfoBarPosition.BOTTOM_RIGHT,
-                duration=-1,  # -1不会自动消失
+                duration=3000,  # -1不会自动消失
                 parent=self
             )
 
 
-
 if __name__ == '__main__':
     # setTheme(Theme.DARK)
+    startupReport.mark('导入模块')
     app = QApplication(sys.argv)
-    w = Window()
+    # 退出前写入尚未保存的设置
+    app.aboutToQuit.connect(lambda: settingsStore.save(wait=True))
+    app.aboutToQuit.connect(SearchIndexJob.stop_all)
+    app.aboutToQuit.connect(fsWatcher.stop)
+    with startupReport.measure('创建主窗口'):
+        w = Window()
     w.show()
     app.exec()
\ No newline at end of file
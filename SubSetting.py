@@ -95,6 +95,15 @@ class Ui_Form(object):
         self.RadioButton_M = RadioButton(self.CardWidget_6)
         self.RadioButton_M.setObjectName(u"RadioButton_M")
         self.RadioButton_M.setGeometry(QRect(935, 20, 70, 24))
+        self.CardWidget_7 = CardWidget(Form)
+        self.CardWidget_7.setObjectName(u"CardWidget_7")
+        self.CardWidget_7.setGeometry(QRect(30, 510, 1030, 60))
+        self.ComboBox_Prec = ComboBox(self.CardWidget_7)
+        self.ComboBox_Prec.setObjectName(u"ComboBox_Prec")
+        self.ComboBox_Prec.setGeometry(QRect(850, 15, 153, 33))
+        self.SubTLabel_Prec = SubtitleLabel(self.CardWidget_7)
+        self.SubTLabel_Prec.setObjectName(u"SubTLabel_Prec")
+        self.SubTLabel_Prec.setGeometry(QRect(60, 15, 101, 30))
 
         self.retranslateUi(Form)
 
@@ -114,5 +123,7 @@ class Ui_Form(object):
         self.SubTLabel_Read.setText(QCoreApplication.translate("Form", u"\u9605\u8bfb\u4e60\u60ef", None))
         self.RadioButton_C.setText(QCoreApplication.translate("Form", u"\u53e4\u5178", None))
         self.RadioButton_M.setText(QCoreApplication.translate("Form", u"\u73b0\u4ee3", None))
+        self.ComboBox_Prec.setText("")
+        self.SubTLabel_Prec.setText(QCoreApplication.translate("Form", u"\u6a21\u578b\u7cbe\u5ea6", None))
     # retranslateUi
 
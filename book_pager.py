@@ -0,0 +1,83 @@
+# coding:utf-8
+# 2025-02-03 古典阅读模式分页：整本书按字（不含换行符）连续排版，第N页从第 N*每页字数 个字开始
+# 每个txt的字数来自书库索引，翻页时只读取这一页涉及的txt，内存占用与书的长度无关
+from collections import OrderedDict
+
+import numpy as np
+
+from library_index import libraryIndex, read_text
+
+
+class BookPager:
+    """
+    :param files: [(txt路径, 不含换行符的字数), ...]，按阅读顺序
+    :param cache_chars: 最多缓存多少字的txt内容（当前页和预读的页），超出时丢弃最久未用的txt
+    """
+
+    def __init__(self, files, cache_chars=200000):
+        self.paths = [path for path, _ in files]
+        counts = np.asarray([glyphs or 0 for _, glyphs in files], dtype=np.int64)
+        # starts[i]为第i个txt的第一个字在整本书中的序号
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+        self.cache_chars = cache_chars
+        self._texts = OrderedDict()
+        self._cached_chars = 0
+
+    @classmethod
+    def from_dir(cls, dir_path, index=None):
+        """目录下全部txt按文件名顺序组成一本书"""
+        return cls([(path, glyphs) for path, _, _, glyphs in (index or libraryIndex).text_files(dir_path)])
+
+    @property
+    def total(self):
+        return int(self.starts[-1])
+
+    def page_count(self, page_size):
+        return max(-(-self.total // page_size), 1)
+
+    def page_start(self, page, page_size):
+        return page * page_size
+
+    def page_of(self, glyph, page_size):
+        """第glyph个字所在的页"""
+        return min(glyph // page_size, self.page_count(page_size) - 1)
+
+    def _file_text(self, i):
+        text = self._texts.get(i)
+        if text is None:
+            try:
+                text = read_text(self.paths[i]).replace("\n", "")
+            except (OSError, UnicodeDecodeError):
+                text = ""
+            self._texts[i] = text
+            self._cached_chars += len(text)
+            while self._cached_chars > self.cache_chars and len(self._texts) > 1:
+                self._cached_chars -= len(self._texts.popitem(last=False)[1])
+        else:
+            self._texts.move_to_end(i)
+        return text
+
+    def _files_between(self, start, stop):
+        first = int(np.searchsorted(self.starts, start, side='right')) - 1
+        last = int(np.searchsorted(self.starts, stop, side='left'))
+        return range(max(first, 0), min(last, len(self.paths)))
+
+    def text(self, start, stop):
+        """整本书中第start到stop个字（不含换行符）"""
+        parts = []
+        for i in self._files_between(start, stop):
+            file_start = int(self.starts[i])
+            parts.append(self._file_text(i)[max(start - file_start, 0):stop - file_start])
+        return "".join(parts)
+
+    def page(self, page, page_size):
+        start = self.page_start(page, page_size)
+        return self.text(start, start + page_size)
+
+    def prefetch(self, page, page_size, window=1):
+        """预读前后window页涉及的txt"""
+        for neighbour in range(page - window, page + window + 1):
+            if 0 <= neighbour < self.page_count(page_size):
+                start = self.page_start(neighbour, page_size)
+                for i in self._files_between(start, start + page_size):
+                    self._file_text(i)
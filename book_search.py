@@ -0,0 +1,221 @@
+# coding:utf-8
+# 2025-02-12 书架搜索：书名和识别出的全文保存在SQLite FTS5全文索引中，搜索时按相关度排序
+# 中文没有分词，建索引时把每段连续文字切成相邻两字（bigram），查询时转换成由相邻两字组成的短语
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from library_index import libraryIndex, norm
+
+# 表结构或切词规则变化时加1，旧索引直接重建
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    root TEXT NOT NULL,
+    signature TEXT
+);
+CREATE INDEX IF NOT EXISTS books_root ON books(root);
+CREATE VIRTUAL TABLE IF NOT EXISTS book_fts USING fts5(title, body);
+CREATE TABLE IF NOT EXISTS roots (
+    root TEXT PRIMARY KEY,
+    synced REAL
+);
+"""
+
+# 连续的字母、数字和汉字（不含下划线，与FTS5 unicode61分词器的规则一致）
+RUN = re.compile(r'[^\W_]+')
+# bm25的列权重：书名命中远比正文命中重要
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+
+def grams(text):
+    """建索引用：每段连续文字切成相邻两字，段末的字单独成词，这样单字也能用前缀查询找到"""
+    tokens = []
+    for run in RUN.findall(text.lower()):
+        tokens.extend(run[i:i + 2] for i in range(len(run)))
+    return " ".join(tokens)
+
+
+def match_expr(query):
+    """
+    查询转换为FTS5表达式：每段连续文字为相邻两字组成的短语，单字为前缀查询，各段之间为AND
+    没有可搜索的文字时返回空字符串
+    """
+    parts = []
+    for run in RUN.findall(query.lower()):
+        if len(run) == 1:
+            parts.append(f'"{run}"*')
+        else:
+            parts.append('"' + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + '"')
+    return " AND ".join(parts)
+
+
+def title_matches(query, paths):
+    """索引尚未建好时的退路：书名包含query（不区分大小写）的书，保持paths中的顺序"""
+    query = query.strip().lower()
+    return [path for path in paths if query in os.path.basename(path).lower()]
+
+
+class BookSearch:
+    """
+    书的全文索引，每本书（书架根目录下的一个子目录）一行：书名 + 目录下全部txt的内容
+    :param db_path: SQLite文件路径，首次使用时才打开
+    :param library: 书库索引，用于列出书和txt
+    """
+
+    def __init__(self, db_path='cache/search.db', library=None):
+        self.db_path = db_path
+        self.library = library or libraryIndex
+        self._db = None
+        # 后台建索引和界面搜索共用一个连接
+        self._lock = threading.RLock()
+
+    @property
+    def db(self):
+        if self._db is None:
+            if os.path.dirname(self.db_path):
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self._db.executescript("DROP TABLE IF EXISTS books; DROP TABLE IF EXISTS book_fts;")
+                self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._db.executescript(SCHEMA)
+            # 索引可随时重建，每本书提交一次时不必等待写盘
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---- 建索引 ----
+    def signature(self, book):
+        """书中txt的文件名、大小和修改时间，与已索引的不同时才重新索引"""
+        parts = []
+        for file_path, _, _, _ in self.library.text_files(book):
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            parts.append(f"{os.path.basename(file_path)}:{st.st_size}:{st.st_mtime_ns}")
+        return "|".join(parts)
+
+    def index_book(self, book):
+        """索引一本书，内容没有变化时跳过，返回是否重新索引"""
+        book = norm(book)
+        signature = self.signature(book)
+        with self._lock:
+            row = self.db.execute("SELECT signature FROM books WHERE path=?", (book,)).fetchone()
+        if row is not None and row[0] == signature:
+            return False
+        # 读取文本和切词不持有锁，避免阻塞界面上的搜索
+        body = grams(self.library.text(book))
+        title = grams(os.path.basename(book))
+        with self._lock, self.db:
+            db = self.db
+            row = db.execute("SELECT id FROM books WHERE path=?", (book,)).fetchone()
+            if row is not None:
+                db.execute("DELETE FROM book_fts WHERE rowid=?", (row[0],))
+                db.execute("UPDATE books SET signature=? WHERE id=?", (signature, row[0]))
+                book_id = row[0]
+            else:
+                book_id = db.execute("INSERT INTO books(path, root, signature) VALUES (?, ?, ?)",
+                                     (book, os.path.dirname(book), signature)).lastrowid
+            db.execute("INSERT INTO book_fts(rowid, title, body) VALUES (?, ?, ?)", (book_id, title, body))
+        return True
+
+    def remove_book(self, book):
+        """删除一本书的索引，返回是否存在"""
+        book = norm(book)
+        with self._lock, self.db:
+            row = self.db.execute("SELECT id FROM books WHERE path=?", (book,)).fetchone()
+            if row is None:
+                return False
+            self.db.execute("DELETE FROM book_fts WHERE rowid=?", (row[0],))
+            self.db.execute("DELETE FROM books WHERE id=?", (row[0],))
+        return True
+
+    def sync(self, root, books=None, stop=None):
+        """
+        使root下的书与索引一致，返回索引发生变化的书
+        :param books: 只处理这些书（新增、删除或刚装订的书）；为None时对比root下的全部书
+        :param stop: 每本书之前调用，返回真时停止（程序退出时）
+        """
+        root = norm(root)
+        full = books is None
+        if books is None:
+            present = [path for path, is_dir in self.library.children(root) if is_dir]
+            with self._lock:
+                indexed = {row[0] for row in self.db.execute("SELECT path FROM books WHERE root=?", (root,))}
+            books = sorted(indexed - set(present)) + present
+        changed = []
+        for book in books:
+            if stop is not None and stop():
+                full = False
+                break
+            book = norm(book)
+            try:
+                updated = self.index_book(book) if os.path.isdir(book) else self.remove_book(book)
+            except (OSError, UnicodeDecodeError):
+                continue
+            if updated:
+                changed.append(book)
+        if full:
+            # 2025-02-24 root下的书全部索引过一次之后，搜索才以索引为准（见ready）
+            with self._lock, self.db:
+                self.db.execute("INSERT OR REPLACE INTO roots(root, synced) VALUES (?, ?)", (root, time.time()))
+        return changed
+
+    def ready(self, root):
+        """root下的书是否已全部索引过（之前运行时建好的索引也算），未就绪时搜索结果不完整"""
+        with self._lock:
+            return self.db.execute("SELECT 1 FROM roots WHERE root=?", (norm(root),)).fetchone() is not None
+
+    # ---- 查询 ----
+    def search(self, query, root=None, limit=None):
+        """
+        按相关度排序的 [(书的路径, 得分), ...]，得分越小越相关；root不为None时只返回root下的书
+        :param limit: 最多返回多少本，None为全部（书架按搜索结果过滤时不能截断）
+        """
+        expr = match_expr(query)
+        if not expr:
+            return []
+        sql = (f"SELECT books.path, bm25(book_fts, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+               "FROM book_fts JOIN books ON books.id = book_fts.rowid WHERE book_fts MATCH ?")
+        params = [expr]
+        if root is not None:
+            sql += " AND books.root=?"
+            params.append(norm(root))
+        sql += " ORDER BY score"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def matches(self, query, paths):
+        """
+        2025-02-26 书架按搜索内容过滤：paths（可来自多个书架）中书名或全文包含query的书
+        索引已建好的书架用全文搜索，按相关度排序；还没建好的书架先按书名过滤（title_matches），排在后面
+        """
+        shelves = {}
+        for path in paths:
+            shelves.setdefault(os.path.dirname(path), []).append(path)
+        ready, pending = [], []
+        for root, books in shelves.items():
+            if self.ready(root):
+                ready.extend(self.search(query, root))
+            else:
+                pending.extend(title_matches(query, books))
+        return [path for path, _ in sorted(ready, key=lambda hit: hit[1])] + pending
+
+
+bookSearch = BookSearch()
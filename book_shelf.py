@@ -0,0 +1,254 @@
+# coding:utf-8
+# 2025-02-10 书架改为 模型/委托 结构：QListView只绘制可见的卡片，不再为每本书创建一个FolderCard控件
+# 书目和每本书的页数、字数来自书库索引，目录变化时只增删变化的行
+import os
+import sys
+import threading
+
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QRectF, QSize, Signal, QEvent, \
+    QRunnable, QSortFilterProxyModel, QThreadPool
+from PySide6.QtGui import QColor, QFont, QPainter, QPen
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle
+from qfluentwidgets import themeColor
+
+from book_search import bookSearch
+from library_index import libraryIndex
+from signal_bus import signalBus
+
+
+class BookShelfModel(QAbstractListModel):
+    """binding目录下的每本书一行，行数据为书的完整路径"""
+    PathRole = Qt.UserRole + 1
+    InfoRole = Qt.UserRole + 2
+    bookToggled = Signal(str, bool)  # 书名, 是否取书
+
+    def __init__(self, root, library=None, parent=None):
+        super().__init__(parent)
+        self.root = os.path.normpath(root)
+        self.library = library or libraryIndex
+        self.paths = []
+        # 已取书（“取書”按钮为选中状态）的书名，2025-02-13 取书状态保存在书库索引中
+        self.checked = {os.path.basename(path) for path in self.library.borrowed(self.root)}
+        self.reload()
+
+    def reload(self):
+        self.beginResetModel()
+        self.paths = [path for path, is_dir in self.library.children(self.root) if is_dir]
+        self.endResetModel()
+
+    def refresh(self, changes=None):
+        """
+        目录变化时调用，只插入/删除变化的行
+        :param changes: 目录监视服务已算出的DirChanges，为None时重新扫描书架目录这一层
+        """
+        if changes is None:
+            changes = self.library.refresh_dir(self.root)
+        removed = set(changes.removed)
+        for row in reversed(range(len(self.paths))):
+            if self.paths[row] in removed:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                self.checked.discard(os.path.basename(self.paths.pop(row)))
+                self.endRemoveRows()
+        added = set(changes.added)
+        if added:
+            paths = [path for path, is_dir in self.library.children(self.root) if is_dir]
+            for row, path in enumerate(paths):
+                if path in added:
+                    self.beginInsertRows(QModelIndex(), row, row)
+                    self.paths.insert(row, path)
+                    self.endInsertRows()
+        return changes
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self.paths[index.row()]
+        if role == Qt.DisplayRole:
+            return os.path.basename(path)
+        if role == self.PathRole:
+            return path
+        if role == self.InfoRole:
+            # 只有绘制到的卡片才查询，首次查询时扫描这本书的目录，之后从索引读取
+            return self.library.book_info(path)
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if os.path.basename(path) in self.checked else Qt.Unchecked
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or not index.isValid():
+            return False
+        name = os.path.basename(self.paths[index.row()])
+        state = value in (Qt.Checked, Qt.Checked.value, True)
+        if state:
+            self.checked.add(name)
+        else:
+            self.checked.discard(name)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        self.bookToggled.emit(name, state)
+        return True
+
+    def setBorrowed(self, path, state):
+        """取书/还书失败时恢复按钮状态，不发出bookToggled"""
+        name = os.path.basename(path)
+        if state:
+            self.checked.add(name)
+        else:
+            self.checked.discard(name)
+        if path in self.paths:
+            index = self.index(self.paths.index(path))
+            self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+
+class BookSearchProxyModel(QSortFilterProxyModel):
+    """2025-02-12 按全文搜索结果过滤书架并按相关度排序，没有搜索时显示全部并保持书名顺序"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.ranks = None  # 书的路径 -> 名次
+        self.sort(0)
+
+    def setHits(self, paths):
+        """paths为按相关度排序的书的路径，None表示不过滤"""
+        self.ranks = None if paths is None else {path: rank for rank, path in enumerate(paths)}
+        self.invalidate()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.ranks is None:
+            return True
+        index = self.sourceModel().index(source_row, 0, source_parent)
+        return index.data(BookShelfModel.PathRole) in self.ranks
+
+    def lessThan(self, left, right):
+        if self.ranks is None:
+            return left.row() < right.row()
+        return self.ranks.get(left.data(BookShelfModel.PathRole), 0) < \
+            self.ranks.get(right.data(BookShelfModel.PathRole), 0)
+
+
+class SearchIndexJob(QRunnable):
+    """
+    在后台更新书架的全文索引，有变化时发出signalBus.searchIndexUpdated(书架根目录)
+    :param books: 只索引这些书，None时对比根目录下的全部书
+    """
+    # 程序退出时停止所有索引任务，不必等全部书索引完
+    _stopping = threading.Event()
+
+    def __init__(self, root, books=None):
+        super().__init__()
+        self.root = os.path.normpath(root)
+        self.books = books
+
+    def start(self, pool=None):
+        (pool or QThreadPool.globalInstance()).start(self)
+
+    @classmethod
+    def stop_all(cls):
+        cls._stopping.set()
+
+    def run(self):
+        try:
+            was_ready = bookSearch.ready(self.root)
+            changed = bookSearch.sync(self.root, self.books, self._stopping.is_set)
+            # 首次建完索引时也通知，界面从按书名过滤改为全文搜索
+            became_ready = not was_ready and bookSearch.ready(self.root)
+        except Exception as e:
+            print(f"Error indexing books in {self.root}: {e}", file=sys.stderr)
+            return
+        if changed or became_ready:
+            signalBus.searchIndexUpdated.emit(self.root)
+
+
+class BorrowJob(QRunnable):
+    """
+    2025-02-13 在后台记录取书/还书，书不再复制或移动，耗时与书的大小无关
+    完成后发出signalBus.bookBorrowed(书的路径, 是否取书)，失败时发出bookBorrowFailed
+    """
+
+    def __init__(self, book, borrow, library=None):
+        super().__init__()
+        self.book = os.path.normpath(book)
+        self.borrow = borrow
+        self.library = library or libraryIndex
+
+    def start(self, pool=None):
+        (pool or QThreadPool.globalInstance()).start(self)
+
+    def run(self):
+        try:
+            if self.borrow:
+                self.library.borrow(self.book)
+            else:
+                self.library.give_back(self.book)
+        except Exception as e:
+            print(f"Error {'borrowing' if self.borrow else 'returning'} {self.book}: {e}", file=sys.stderr)
+            signalBus.bookBorrowFailed.emit(self.book, self.borrow, str(e))
+            return
+        signalBus.bookBorrowed.emit(self.book, self.borrow)
+
+
+class BookCardDelegate(QStyledItemDelegate):
+    """绘制一张书卡片：书名、页数/字数，以及右下角的“取書”按钮"""
+    card_size = QSize(220, 300)
+    margin = 5
+
+    def sizeHint(self, option, index):
+        return QSize(self.card_size.width() + 2 * self.margin, self.card_size.height() + 2 * self.margin)
+
+    def cardRect(self, option):
+        return QRect(option.rect.topLeft(), self.card_size).translated(self.margin, self.margin)
+
+    def pillRect(self, option):
+        card = self.cardRect(option)
+        return QRect(card.right() - 80, card.bottom() - 46, 66, 32)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        card = QRectF(self.cardRect(option))
+        hover = bool(option.state & QStyle.State_MouseOver)
+        painter.setPen(QPen(QColor(0, 0, 0, 40 if hover else 20), 1))
+        painter.setBrush(QColor(255, 255, 255) if not hover else QColor(250, 250, 250))
+        painter.drawRoundedRect(card.adjusted(0.5, 0.5, -0.5, -0.5), 8, 8)
+
+        # 书名
+        title_font = QFont(option.font)
+        title_font.setPointSize(max(title_font.pointSize(), 10))
+        title_font.setBold(True)
+        painter.setFont(title_font)
+        painter.setPen(QColor(0, 0, 0))
+        text_rect = card.adjusted(14, 14, -14, -60)
+        painter.drawText(text_rect, Qt.AlignTop | Qt.AlignLeft | Qt.TextWordWrap, index.data(Qt.DisplayRole))
+
+        # 页数和字数
+        pages, chars = index.data(BookShelfModel.InfoRole)
+        painter.setFont(option.font)
+        painter.setPen(QColor(0, 0, 0, 140))
+        painter.drawText(card.adjusted(14, 0, -90, -14), Qt.AlignBottom | Qt.AlignLeft, f"{pages}页  {chars}字")
+
+        # “取書”按钮，选中时使用主题色
+        pill = QRectF(self.pillRect(option))
+        checked = index.data(Qt.CheckStateRole) == Qt.Checked
+        if checked:
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(themeColor())
+        else:
+            painter.setPen(QPen(QColor(0, 0, 0, 30), 1))
+            painter.setBrush(QColor(251, 251, 251))
+        painter.drawRoundedRect(pill, pill.height() / 2, pill.height() / 2)
+        painter.setPen(QColor(255, 255, 255) if checked else QColor(0, 0, 0))
+        painter.drawText(pill, Qt.AlignCenter, '取書')
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        # 点击“取書”按钮切换取书/还书
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton \
+                and self.pillRect(option).contains(event.position().toPoint()):
+            checked = index.data(Qt.CheckStateRole) == Qt.Checked
+            return model.setData(index, Qt.Unchecked if checked else Qt.Checked, Qt.CheckStateRole)
+        return super().editorEvent(event, model, option, index)
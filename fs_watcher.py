@@ -0,0 +1,150 @@
+# coding:utf-8
+# 2025-02-14 书架和阅读页共用的目录监视服务（watchdog）
+# 一次取书、装订或复制会产生一连串文件事件，停止变化300ms后才对涉及的目录各扫描一次，
+# 通过书库索引算出新增/删除/修改的文件和子目录，再以signalBus.dirChanged(DirChanges)发布
+import os
+import sys
+import threading
+import time
+
+from PySide6.QtCore import QObject, QTimer, Signal
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from library_index import libraryIndex, norm
+from signal_bus import signalBus
+
+
+class _EventHandler(FileSystemEventHandler):
+    """在watchdog线程中收集发生变化的目录"""
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ('opened', 'closed', 'closed_no_write'):
+            return
+        paths = [event.src_path, getattr(event, 'dest_path', '')]
+        self.watcher.touch([os.fsdecode(path) for path in paths if path])
+
+
+class FsWatcher(QObject):
+    """
+    :param debounce: 最后一个事件之后等待多少毫秒再扫描
+    :param max_delay: 事件持续不断时，最多等待多少毫秒就扫描一次
+    """
+    # 从watchdog线程转到主线程启动定时器
+    _touched = Signal()
+
+    def __init__(self, library=None, debounce=300, max_delay=2000, parent=None):
+        super().__init__(parent)
+        self.library = library or libraryIndex
+        self.max_delay = max_delay
+        self._observer = None
+        self._handler = _EventHandler(self)
+        # 绝对路径 -> [规范化的原路径, ObservedWatch, 引用数]
+        self._watches = {}
+        self._pending = set()
+        self._first_event = None
+        self._lock = threading.Lock()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce)
+        self._timer.timeout.connect(self.flush)
+        self._touched.connect(self._schedule)
+
+    @property
+    def observer(self):
+        if self._observer is None:
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._observer.start()
+        return self._observer
+
+    def watch(self, path):
+        """监视path这一层（不含子目录），同一目录可被多处监视，unwatch相同次数后才停止"""
+        path = norm(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._watches.get(key)
+            if entry is not None:
+                entry[2] += 1
+                return
+        try:
+            watch = self.observer.schedule(self._handler, path, recursive=False)
+        except OSError as e:
+            print(f"Error watching {path}: {e}", file=sys.stderr)
+            return
+        with self._lock:
+            self._watches[key] = [path, watch, 1]
+
+    def unwatch(self, path):
+        key = os.path.abspath(norm(path))
+        with self._lock:
+            entry = self._watches.get(key)
+            if entry is None:
+                return
+            entry[2] -= 1
+            if entry[2] > 0:
+                return
+            del self._watches[key]
+        try:
+            self.observer.unschedule(entry[1])
+        except (KeyError, OSError):
+            # 目录已被删除，watchdog已自行停止监视
+            pass
+
+    def stop(self):
+        """
+        2025-02-26 退出前停止（QApplication.aboutToQuit）：结束并等待watchdog线程，
+        丢弃尚未扫描的目录，界面销毁过程中不再发布dirChanged；之后重新watch会启动新的线程
+        """
+        self._timer.stop()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        with self._lock:
+            self._pending.clear()
+            # 监视随旧线程一起失效
+            self._watches.clear()
+
+    def touch(self, paths):
+        """记下受事件影响的已监视目录：事件路径本身（目录被删除/修改）及其所在目录"""
+        with self._lock:
+            dirs = set()
+            for path in paths:
+                path = os.path.abspath(path)
+                for candidate in (path, os.path.dirname(path)):
+                    entry = self._watches.get(candidate)
+                    if entry is not None:
+                        dirs.add(entry[0])
+            if not dirs:
+                return
+            self._pending |= dirs
+        self._touched.emit()
+
+    def _schedule(self):
+        now = time.monotonic()
+        if not self._timer.isActive():
+            self._first_event = now
+            self._timer.start()
+        elif (now - self._first_event) * 1000 < self.max_delay:
+            # 连续的事件推迟扫描，但不超过max_delay
+            self._timer.start()
+
+    def flush(self):
+        """扫描积累的目录，每个有变化的目录发布一次signalBus.dirChanged"""
+        with self._lock:
+            dirs, self._pending = self._pending, set()
+        # 上层目录先扫描，删除的子目录随之从索引中移除
+        for path in sorted(dirs, key=lambda p: (p.count(os.sep), p)):
+            if not self.library.scanned(path):
+                continue
+            changes = self.library.refresh_dir(path)
+            if changes:
+                signalBus.dirChanged.emit(changes)
+
+
+fsWatcher = FsWatcher()
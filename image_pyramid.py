@@ -0,0 +1,180 @@
+# coding:utf-8
+# 2025-02-05 阅读页大图的分块金字塔：每页只生成一次并缓存在磁盘，显示时按缩放比例读取需要的层和块
+# 第0层为原图，每往上一层长宽各缩小一半，最顶层不超过一个块
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+
+import cv2
+
+from ocr_crop import load_image
+
+# 同一页只允许一个线程生成（打开页面和后台预读可能同时请求同一页）
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+
+class ImagePyramid:
+    """
+    :param img_path: 原图路径
+    :param cache_dir: 金字塔缓存目录，每页一个子目录 <key>/<层>/<行>_<列>.png
+    :param tile_size: 块的边长（像素）
+    """
+
+    def __init__(self, img_path, cache_dir='cache/pyramid', tile_size=512):
+        self.img_path = img_path
+        self.cache_dir = cache_dir
+        self.tile_size = tile_size
+        self._meta = None
+        self._key = None
+
+    @property
+    def key(self):
+        # 按路径、大小和修改时间区分，原图被替换后自动重新生成
+        if self._key is None:
+            st = os.stat(self.img_path)
+            source = f"{os.path.abspath(self.img_path)}|{st.st_size}|{st.st_mtime_ns}|{self.tile_size}"
+            self._key = hashlib.sha1(source.encode('utf-8')).hexdigest()
+        return self._key
+
+    @property
+    def dir(self):
+        return os.path.join(self.cache_dir, self.key)
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            try:
+                with open(os.path.join(self.dir, 'meta.json'), 'r', encoding='utf-8') as f:
+                    self._meta = json.load(f)
+            except (OSError, ValueError):
+                return None
+        return self._meta
+
+    @property
+    def built(self):
+        return self.meta is not None
+
+    @property
+    def width(self):
+        return self.meta["width"]
+
+    @property
+    def height(self):
+        return self.meta["height"]
+
+    @property
+    def levels(self):
+        return self.meta["levels"]
+
+    def touch(self):
+        """记录最近使用时间，清理缓存时最久未用的页面先删除"""
+        try:
+            os.utime(os.path.join(self.dir, 'meta.json'))
+        except OSError:
+            pass
+
+    def build(self):
+        """解码原图并写出全部层的块，meta.json最后写入，作为生成完成的标志"""
+        if self.built:
+            return self.meta
+        with _build_locks_lock:
+            lock = _build_locks.setdefault(self.key, threading.Lock())
+        with lock:
+            if self.built:
+                return self.meta
+            return self._build()
+
+    def _build(self):
+        img = load_image(self.img_path)
+        height, width = img.shape[:2]
+        levels = max(math.ceil(math.log2(max(width, height) / self.tile_size)), 0) + 1
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 先写到临时目录，完成后整体改名，避免显示到一半写入的块
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            level_img = img
+            sizes = []
+            for level in range(levels):
+                if level:
+                    h, w = level_img.shape[:2]
+                    level_img = cv2.resize(level_img, (max(w // 2, 1), max(h // 2, 1)), interpolation=cv2.INTER_AREA)
+                sizes.append(level_img.shape[1::-1])
+                self._write_level(level_img, os.path.join(tmp_dir, str(level)))
+            # sizes为每层的 [宽, 高]
+            meta = {"width": width, "height": height, "levels": levels, "tile_size": self.tile_size, "sizes": sizes}
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            try:
+                os.replace(tmp_dir, self.dir)
+            except OSError:
+                # 其他线程已生成同一页
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self._meta = None
+        return self.meta
+
+    def _write_level(self, level_img, level_dir):
+        os.makedirs(level_dir)
+        h, w = level_img.shape[:2]
+        t = self.tile_size
+        for ty in range(0, -(-h // t)):
+            for tx in range(0, -(-w // t)):
+                tile = level_img[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t]
+                cv2.imencode('.png', tile, [cv2.IMWRITE_PNG_COMPRESSION, 1])[1].tofile(
+                    os.path.join(level_dir, f'{ty}_{tx}.png'))
+
+    def tile(self, level, ty, tx):
+        """读取一个块（cv2格式），块内像素对应原图中 (tx, ty) * tile_size * 2**level 起的区域"""
+        return load_image(os.path.join(self.dir, str(level), f'{ty}_{tx}.png'))
+
+    def fit_level(self, view_width, view_height):
+        """整页缩放到 view_width x view_height 像素显示时使用的层"""
+        if view_width <= 0 or view_height <= 0:
+            return self.levels - 1
+        return self.level_for(max(self.width / view_width, self.height / view_height))
+
+    def level_for(self, image_pixels_per_screen_pixel):
+        """屏幕上一个像素对应原图多少像素时应使用的层"""
+        if image_pixels_per_screen_pixel <= 1:
+            return 0
+        return min(int(math.log2(image_pixels_per_screen_pixel)), self.levels - 1)
+
+    def tiles_in(self, level, x0, y0, x1, y1):
+        """第level层中与原图坐标矩形 (x0, y0)-(x1, y1) 相交的块 [(行, 列), ...]"""
+        span = self.tile_size * (1 << level)
+        width, height = self.meta["sizes"][level]
+        rows = -(-height // self.tile_size)
+        cols = -(-width // self.tile_size)
+        first_ty, last_ty = max(int(y0 // span), 0), min(int(y1 // span), rows - 1)
+        first_tx, last_tx = max(int(x0 // span), 0), min(int(x1 // span), cols - 1)
+        return [(ty, tx) for ty in range(first_ty, last_ty + 1) for tx in range(first_tx, last_tx + 1)]
+
+
+def prune_pyramids(cache_dir='cache/pyramid', max_bytes=1 << 30):
+    """金字塔缓存超过max_bytes时，按最近生成/使用时间删除最旧的页面"""
+    entries = []
+    total = 0
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        page_dir = os.path.join(cache_dir, name)
+        meta_path = os.path.join(page_dir, 'meta.json')
+        if not os.path.exists(meta_path):
+            continue
+        size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(page_dir) for f in files)
+        entries.append((os.path.getmtime(meta_path), page_dir, size))
+        total += size
+    for _, page_dir, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(page_dir, ignore_errors=True)
+        total -= size
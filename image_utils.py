@@ -0,0 +1,33 @@
+# coding:utf-8
+# 2025-01-17 numpy(cv2)图像与QImage之间的零拷贝转换
+import numpy as np
+from PySide6.QtGui import QImage
+
+
+def ndarray_to_qimage(arr):
+    """
+    将cv2解码得到的灰度/BGR/BGRA图像包装成QImage，不复制像素
+    arr可以是整页图像上的切片视图，QImage直接引用整页缓冲区中的对应位置；
+    返回的QImage使用期间需保持arr存活，长期保存请调用 .copy() 或转为QPixmap
+    """
+    if arr.ndim == 2:
+        fmt, channels = QImage.Format_Grayscale8, 1
+    elif arr.shape[2] == 3:
+        fmt, channels = QImage.Format_BGR888, 3
+    else:
+        # 小端序下BGRA的内存排列即为ARGB32
+        fmt, channels = QImage.Format_ARGB32, 4
+    h, w = arr.shape[:2]
+    # 每行内部的像素必须连续，否则只能复制一份
+    if arr.dtype != np.uint8 or arr.strides[1] != channels:
+        arr = np.ascontiguousarray(arr, dtype=np.uint8)
+    root = arr
+    while isinstance(root.base, np.ndarray):
+        root = root.base
+    if not root.flags.c_contiguous:
+        arr = root = np.ascontiguousarray(arr)
+    offset = arr.ctypes.data - root.ctypes.data
+    image = QImage(memoryview(root).cast('B')[offset:], w, h, arr.strides[0], fmt)
+    # QImage不持有缓冲区，挂在对象上防止被回收
+    image.buffer = root
+    return image
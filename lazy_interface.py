@@ -0,0 +1,90 @@
+# coding:utf-8
+# 2025-02-16 页面延迟创建：导航栏先注册空的占位页，首次切换到该页、或窗口显示后事件循环空闲时才创建真正的页面
+# 窗口显示前只创建主页，启动时间与书库大小、模型加载无关；启动各阶段耗时记录在startupReport中
+import sys
+import time
+from contextlib import contextmanager
+
+from PySide6.QtCore import QTimer, Signal
+from PySide6.QtWidgets import QVBoxLayout, QWidget
+
+
+class StartupReport:
+    """启动耗时记录，从导入本模块开始计时"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = []  # (阶段, 距开始的秒数, 本阶段耗时秒数)
+
+    def mark(self, name, duration=None):
+        elapsed = time.perf_counter() - self.start
+        self.marks.append((name, elapsed, duration))
+
+    @contextmanager
+    def measure(self, name):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(name, time.perf_counter() - begin)
+
+    def report(self, title='启动耗时', file=None):
+        lines = [f"{title}:"]
+        for name, elapsed, duration in self.marks:
+            cost = f"  耗时 {duration * 1000:7.1f} ms" if duration is not None else ""
+            lines.append(f"  {elapsed * 1000:8.1f} ms  {name}{cost}")
+        print("\n".join(lines), file=file or sys.stderr)
+
+
+startupReport = StartupReport()
+
+
+class LazyInterface(QWidget):
+    """
+    导航栏中的占位页，ensure()时调用factory(self)创建真正的页面并放入占位页
+    :param factory: 创建页面的函数，参数为父控件
+    :param text: 页面名称，按照各页面的规则转换为objectName（导航的路由键）
+    """
+    built = Signal(QWidget)
+
+    def __init__(self, factory, text, parent=None):
+        super().__init__(parent=parent)
+        self.factory = factory
+        self.text = text
+        self.widget = None
+        self.setObjectName(text.replace(' ', '-'))
+        self.vBoxLayout = QVBoxLayout(self)
+        self.vBoxLayout.setContentsMargins(0, 0, 0, 0)
+
+    @property
+    def isBuilt(self):
+        return self.widget is not None
+
+    def ensure(self):
+        """返回真正的页面，未创建时立即创建"""
+        if self.widget is None:
+            with startupReport.measure(f"创建 {self.text}"):
+                self.widget = self.factory(self)
+                self.vBoxLayout.addWidget(self.widget)
+            self.built.emit(self.widget)
+        return self.widget
+
+
+def build_when_idle(interfaces, finished=None):
+    """
+    窗口显示后在事件循环空闲时按顺序创建尚未创建的页面，每轮只创建一个，页面之间仍可响应用户操作
+    :param finished: 全部创建完成后调用
+    """
+    pending = [interface for interface in interfaces if not interface.isBuilt]
+
+    def build_next():
+        while pending and pending[0].isBuilt:
+            pending.pop(0)
+        if not pending:
+            if finished is not None:
+                finished()
+            return
+        pending.pop(0).ensure()
+        QTimer.singleShot(0, build_next)
+
+    QTimer.singleShot(0, build_next)
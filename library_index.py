@@ -0,0 +1,288 @@
+# coding:utf-8
+# 2025-01-27 书库索引：目录、图片和txt（含字数与在整本书文本中的偏移）保存在SQLite中
+# 启动时不再遍历整个书库，目录展开时才扫描该目录；目录变化时只重新扫描发生变化的那一层
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tga')
+TEXT_EXTS = ('.txt',)
+
+# 表结构变化时加1，旧索引直接重建（索引只是缓存，可随时从磁盘重新扫描）
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    name TEXT,
+    mtime REAL,
+    scanned INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    offset INTEGER,
+    chars INTEGER,
+    glyphs INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+"""
+# 2025-02-13 取书状态：取书只在此表中记一行，书仍留在binding中，阅读页直接显示
+# 这是用户数据而不是缓存，表结构版本变化时不删除
+LOANS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS loans (
+    path TEXT PRIMARY KEY,
+    borrowed REAL
+);
+"""
+
+
+def norm(path):
+    return os.path.normpath(path)
+
+
+def file_kind(name):
+    ext = os.path.splitext(name)[1].lower()
+    if ext in IMAGE_EXTS:
+        return 'image'
+    if ext in TEXT_EXTS:
+        return 'text'
+    return None
+
+
+def read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@dataclass
+class DirChanges:
+    """一次目录扫描前后的差异，均为完整路径"""
+    path: str
+    added: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    # 内容（大小/修改时间）发生变化的文件
+    changed: list = field(default_factory=list)
+
+    @property
+    def text_changed(self):
+        return any(file_kind(p) == 'text' for p in self.added + self.removed + self.changed)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+
+class LibraryIndex:
+    """
+    书库索引，路径统一用os.path.normpath规范化后作为键
+    :param db_path: SQLite文件路径，首次使用时才打开
+    """
+
+    def __init__(self, db_path='cache/library.db'):
+        self.db_path = db_path
+        self._db = None
+        # 连接可能被后台线程使用，所有读写都持有同一把锁
+        self._lock = threading.RLock()
+
+    @property
+    def db(self):
+        if self._db is None:
+            if os.path.dirname(self.db_path):
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self._db.executescript("DROP TABLE IF EXISTS dirs; DROP TABLE IF EXISTS files;")
+                self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._db.executescript(SCHEMA)
+            self._db.executescript(LOANS_SCHEMA)
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---- 扫描 ----
+    def ensure(self, path):
+        """目录未扫描过或修改时间变化时重新扫描，返回DirChanges（无需扫描时为空）"""
+        path = norm(path)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return self.forget(path)
+        with self._lock:
+            row = self.db.execute("SELECT mtime, scanned FROM dirs WHERE path=?", (path,)).fetchone()
+        if row is not None and row[1] and row[0] == mtime:
+            return DirChanges(path)
+        return self.refresh_dir(path)
+
+    def refresh_dir(self, path):
+        """只扫描path这一层：新增/删除的子目录和文件、内容变化的txt，子目录待展开时再扫描"""
+        path = norm(path)
+        try:
+            mtime = os.stat(path).st_mtime
+            entries = list(os.scandir(path))
+        except OSError:
+            return self.forget(path)
+        dirs, files = set(), {}
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    dirs.add(norm(entry.path))
+                elif file_kind(entry.name):
+                    st = entry.stat()
+                    files[norm(entry.path)] = (entry.name, st.st_size, st.st_mtime)
+            except OSError:
+                continue
+        changes = DirChanges(path)
+        with self._lock, self.db:
+            db = self.db
+            old_dirs = {row[0] for row in db.execute("SELECT path FROM dirs WHERE parent=?", (path,))}
+            old_files = {row[0]: (row[1], row[2]) for row in
+                         db.execute("SELECT path, size, mtime FROM files WHERE dir=?", (path,))}
+            for sub in old_dirs - dirs:
+                self._delete_tree(sub)
+                changes.removed.append(sub)
+            for sub in sorted(dirs - old_dirs):
+                db.execute("INSERT OR REPLACE INTO dirs(path, parent, name, mtime, scanned) VALUES (?, ?, ?, NULL, 0)",
+                           (sub, path, os.path.basename(sub)))
+                changes.added.append(sub)
+            for file_path in old_files.keys() - files.keys():
+                db.execute("DELETE FROM files WHERE path=?", (file_path,))
+                changes.removed.append(file_path)
+            for file_path, (name, size, file_mtime) in sorted(files.items()):
+                old = old_files.get(file_path)
+                if old == (size, file_mtime):
+                    continue
+                (changes.added if old is None else changes.changed).append(file_path)
+                db.execute("INSERT OR REPLACE INTO files(path, dir, name, kind, size, mtime, offset, chars, glyphs) "
+                           "VALUES (?, ?, ?, ?, ?, ?, NULL, NULL, NULL)",
+                           (file_path, path, name, file_kind(name), size, file_mtime))
+            db.execute("INSERT INTO dirs(path, parent, name, mtime, scanned) VALUES (?, ?, ?, ?, 1) "
+                       "ON CONFLICT(path) DO UPDATE SET mtime=excluded.mtime, scanned=1",
+                       (path, os.path.dirname(path), os.path.basename(path), mtime))
+            if changes.text_changed:
+                self._count_text(path)
+        return changes
+
+    def forget(self, path):
+        """目录已不存在：删除其索引，返回DirChanges(removed=[path])"""
+        path = norm(path)
+        with self._lock, self.db:
+            exists = self.db.execute("SELECT 1 FROM dirs WHERE path=?", (path,)).fetchone()
+            self._delete_tree(path)
+        return DirChanges(path, removed=[path] if exists else [])
+
+    def _delete_tree(self, path):
+        prefix = path + os.sep
+        self.db.execute("DELETE FROM dirs WHERE path=? OR substr(path, 1, ?)=?", (path, len(prefix), prefix))
+        self.db.execute("DELETE FROM files WHERE dir=? OR substr(dir, 1, ?)=?", (path, len(prefix), prefix))
+
+    def _count_text(self, path):
+        """
+        重新统计目录下各txt的字数，并按文件名顺序计算在整本书文本中的起始偏移
+        chars为字符数，glyphs为不含换行符的字数（竖排分页按glyphs计算）
+        """
+        offset = 0
+        for file_path, chars, glyphs in self.db.execute(
+                "SELECT path, chars, glyphs FROM files WHERE dir=? AND kind='text' ORDER BY name", (path,)).fetchall():
+            if chars is None or glyphs is None:
+                try:
+                    text = read_text(file_path)
+                except (OSError, UnicodeDecodeError):
+                    text = ""
+                chars, glyphs = len(text), len(text) - text.count("\n")
+            self.db.execute("UPDATE files SET offset=?, chars=?, glyphs=? WHERE path=?",
+                            (offset, chars, glyphs, file_path))
+            offset += chars
+
+    # ---- 查询 ----
+    def scanned(self, path):
+        """目录是否已扫描过（未扫描的目录在首次使用时才扫描，无需跟踪其变化）"""
+        with self._lock:
+            row = self.db.execute("SELECT scanned FROM dirs WHERE path=?", (norm(path),)).fetchone()
+        return bool(row and row[0])
+
+    def children(self, path):
+        """目录下的子目录和图片 [(完整路径, 是否目录), ...]，子目录在前，均按名称排序"""
+        path = norm(path)
+        self.ensure(path)
+        with self._lock:
+            dirs = self.db.execute("SELECT path FROM dirs WHERE parent=? ORDER BY name", (path,)).fetchall()
+            images = self.db.execute("SELECT path FROM files WHERE dir=? AND kind='image' ORDER BY name",
+                                     (path,)).fetchall()
+        return [(row[0], True) for row in dirs] + [(row[0], False) for row in images]
+
+    def book_info(self, path):
+        """一本书的 (页数, 字数)：图片数，以及txt中不含换行符的字数之和"""
+        path = norm(path)
+        self.ensure(path)
+        with self._lock:
+            pages, glyphs = self.db.execute("SELECT COALESCE(SUM(kind='image'), 0), COALESCE(SUM(glyphs), 0) "
+                                            "FROM files WHERE dir=?", (path,)).fetchone()
+        return pages, glyphs
+
+    def text_files(self, path):
+        """目录下的txt [(完整路径, 偏移, 字符数, 不含换行符的字数), ...]，内容被原地修改过的文件会重新计数"""
+        path = norm(path)
+        self.ensure(path)
+        with self._lock, self.db:
+            rows = self.db.execute("SELECT path, size, mtime FROM files WHERE dir=? AND kind='text' ORDER BY name",
+                                   (path,)).fetchall()
+            stale = False
+            for file_path, size, mtime in rows:
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+                if (st.st_size, st.st_mtime) != (size, mtime):
+                    self.db.execute("UPDATE files SET size=?, mtime=?, chars=NULL, glyphs=NULL WHERE path=?",
+                                    (st.st_size, st.st_mtime, file_path))
+                    stale = True
+            if stale:
+                self._count_text(path)
+            return self.db.execute("SELECT path, offset, chars, glyphs FROM files WHERE dir=? AND kind='text' "
+                                   "ORDER BY name", (path,)).fetchall()
+
+    # ---- 取书/还书 ----
+    def borrow(self, path):
+        """取书：只记录状态，与书的大小无关"""
+        with self._lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO loans(path, borrowed) VALUES (?, ?)", (norm(path), time.time()))
+
+    def give_back(self, path):
+        """还书，返回这本书之前是否已取出"""
+        with self._lock, self.db:
+            return self.db.execute("DELETE FROM loans WHERE path=?", (norm(path),)).rowcount > 0
+
+    def borrowed(self, root=None):
+        """已取出且仍存在的书，按取书顺序；root不为None时只返回root下的书"""
+        with self._lock:
+            rows = self.db.execute("SELECT path FROM loans ORDER BY borrowed").fetchall()
+        paths = [row[0] for row in rows if os.path.isdir(row[0])]
+        if root is not None:
+            root = norm(root)
+            paths = [path for path in paths if os.path.dirname(path) == root]
+        return paths
+
+    def text(self, path):
+        """读取目录下全部txt并按文件名顺序拼接，只在打开这本书时调用"""
+        parts = []
+        for file_path, _, _, _ in self.text_files(path):
+            try:
+                parts.append(read_text(file_path))
+            except (OSError, UnicodeDecodeError):
+                # 与_count_text一致：读不了的txt按空文本处理，其余文件的偏移不变
+                continue
+        return "".join(parts)
+
+
+libraryIndex = LibraryIndex()
@@ -0,0 +1,416 @@
+# coding:utf-8
+# 2025-02-17 OCR后端注册表：settings中的"ocrs"决定使用哪个识别引擎
+# 各后端都继承OcrEngine的接口（detect / recognize / recognize_crops / iter_recognize / warm_up / capabilities），
+# 缓存、流式识别、多进程批量识别对所有后端通用；本模块不依赖PySide6
+# 命令行：
+#   python ocr_backends.py list                         列出已注册的后端及是否可用
+#   python ocr_backends.py bench input/ -b 百度OCR -b ONNX(RapidOCR)   对比各后端的速度和识别结果
+#   python ocr_backends.py serve -b 百度OCR --port 8866  把本地后端包装成HTTP桩服务，供“远程OCR”测试
+import argparse
+import base64
+import difflib
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from ocr_engine import OcrEngine, ocrEngine
+from ocr_onnx import OnnxOcrEngine
+
+
+def _plain(obj):
+    """numpy数组/数值（含dict、list中的）转换为可JSON序列化的列表和float"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, dict):
+        return {key: _plain(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(item) for item in obj]
+    return obj
+
+
+def encode_image(img):
+    """图片路径或cv2图像 -> base64字符串（路径直接读取原文件，图像编码为png）"""
+    if isinstance(img, str):
+        with open(img, 'rb') as f:
+            data = f.read()
+    else:
+        import cv2
+        data = cv2.imencode('.png', np.ascontiguousarray(img))[1].tobytes()
+    return base64.b64encode(data).decode('ascii')
+
+
+def decode_image(data):
+    import cv2
+    return cv2.imdecode(np.frombuffer(base64.b64decode(data), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+# ---- 后端实现 ----
+class RapidOcrEngine(OcrEngine):
+    """ONNX Runtime推理（rapidocr_onnxruntime，内置同样的PP-OCRv4模型），CPU上无需安装Paddle"""
+    name = "rapidocr"
+    capabilities = frozenset({"det", "rec", "cls", "batch_rec"})
+    default_params = {}
+    settings_keys = {"rec_batch_size": "rec_batch_num"}
+    thread_param = None
+
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec("rapidocr_onnxruntime") is not None
+
+    def _load(self):
+        from rapidocr_onnxruntime import RapidOCR
+        start = time.perf_counter()
+        model = RapidOCR(**self.params)
+        self.load_seconds = time.perf_counter() - start
+        self.load_count += 1
+        return model
+
+    def model_config(self, cls=True):
+        try:
+            from importlib.metadata import version
+            engine_version = version("rapidocr_onnxruntime")
+        except Exception:
+            engine_version = None
+        return {"engine": self.name, "version": engine_version, "params": self.params, "cls": cls}
+
+    def _infer_det(self, model, img):
+        boxes, _ = model(img, use_det=True, use_cls=False, use_rec=False)
+        return boxes or []
+
+    def _infer_rec(self, model, crops, cls):
+        crops = list(crops)
+        if cls:
+            crops, _, _ = model.text_cls(crops)
+        result, _ = model.text_rec(crops)
+        return [(item[0], float(item[1])) for item in result]
+
+    def drop_score(self):
+        return self.get().text_score
+
+
+class _RemoteClient:
+    """远程识别服务的HTTP客户端，协议见make_stub_server"""
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.info = self.call('info')
+
+    def call(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode('utf-8')
+        request = urllib.request.Request(f"{self.url}/{path}", data=data,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+
+class RemoteOcrEngine(OcrEngine):
+    """
+    通过HTTP调用远程识别服务，接口与本地后端相同
+    可用 python ocr_backends.py serve 在本地起一个桩服务测试
+    """
+    name = "remote"
+    capabilities = frozenset({"det", "rec", "cls", "batch_rec"})
+    default_params = {"url": "http://127.0.0.1:8866", "timeout": 30}
+    # rec_batch_num只决定每次请求发送的行数
+    settings_keys = {"ocr_remote_url": "url", "rec_batch_size": "rec_batch_num"}
+    thread_param = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def _load(self):
+        start = time.perf_counter()
+        client = _RemoteClient(self.params["url"], self.params.get("timeout", 30))
+        self.load_seconds = time.perf_counter() - start
+        self.load_count += 1
+        return client
+
+    def model_config(self, cls=True):
+        return {"engine": self.name, "url": self.params["url"], "cls": cls}
+
+    def _infer_det(self, model, img):
+        return model.call('det', {"image": encode_image(img)})["boxes"]
+
+    def _infer_rec(self, model, crops, cls):
+        result = model.call('rec', {"images": [encode_image(crop) for crop in crops], "cls": cls})["result"]
+        return [(text, score) for text, score in result]
+
+    def drop_score(self):
+        return self.get().info.get("drop_score", 0.5)
+
+
+def make_stub_server(engine, host='127.0.0.1', port=8866):
+    """
+    把本地引擎包装成HTTP服务（RemoteOcrEngine的桩），返回ThreadingHTTPServer，调用serve_forever()开始服务
+    GET  /info -> {"name", "capabilities", "drop_score"}
+    POST /ocr  {"image": base64, "cls": bool} -> {"result": result_t}
+    POST /det  {"image": base64} -> {"boxes": [[x, y] * 4, ...]}
+    POST /rec  {"images": [base64, ...], "cls": bool} -> {"result": [[text, score], ...]}
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, payload, status=200):
+            body = json.dumps(_plain(payload), ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/') != '/info':
+                return self.reply({"error": "not found"}, 404)
+            self.reply({"name": engine.name, "capabilities": sorted(engine.capabilities),
+                        "drop_score": engine.drop_score()})
+
+        def do_POST(self):
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode('utf-8'))
+                path = self.path.rstrip('/')
+                cls = request.get("cls", True)
+                if path == '/ocr':
+                    return self.reply({"result": engine.ocr(decode_image(request["image"]), cls=cls)})
+                if path == '/det':
+                    return self.reply({"boxes": engine.detect(decode_image(request["image"]))})
+                if path == '/rec':
+                    crops = [decode_image(image) for image in request["images"]]
+                    return self.reply({"result": engine.recognize_crops(crops, cls)})
+                self.reply({"error": "not found"}, 404)
+            except Exception as e:
+                self.reply({"error": str(e)}, 500)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+# ---- 注册表 ----
+@dataclass
+class Backend:
+    """
+    :param name: 显示在设置页中的名称，即settings中"ocrs"的值
+    :param factory: 创建新引擎实例的函数，参数为 (cache, **params)
+    """
+    name: str
+    factory: object
+    description: str = ""
+    # 已创建的共用实例
+    instance: object = field(default=None, repr=False)
+
+    @property
+    def available(self):
+        return getattr(self.factory, "available", lambda: True)()
+
+
+BACKENDS = {}
+DEFAULT_BACKEND = "百度OCR"
+# 按基准测试结果选择最快的可用后端
+AUTO_BACKEND = "自动（最快）"
+BENCH_FILE = 'cache/ocr_bench.json'
+
+
+def register_backend(name, factory, description="", instance=None):
+    BACKENDS[name] = Backend(name, factory, description, instance)
+    return BACKENDS[name]
+
+
+register_backend(DEFAULT_BACKEND, OcrEngine, "本地PaddleOCR", instance=ocrEngine)
+register_backend("ONNX(PP-OCRv4)", OnnxOcrEngine, "ONNX Runtime直接推理PP-OCRv4模型，可调线程数（ocr_onnx.py）")
+register_backend("ONNX(RapidOCR)", RapidOcrEngine, "ONNX Runtime推理PP-OCRv4（rapidocr_onnxruntime）")
+register_backend("远程OCR", RemoteOcrEngine, "HTTP识别服务，地址为settings中的ocr_remote_url")
+
+
+def backend_names(available_only=True):
+    """设置页中可选的后端名称，第一个为自动选择"""
+    names = [name for name, backend in BACKENDS.items() if backend.available or not available_only]
+    return [AUTO_BACKEND] + names
+
+
+def load_bench(bench_file=BENCH_FILE):
+    try:
+        with open(bench_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def fastest_backend(bench_file=BENCH_FILE):
+    """基准测试中平均每页耗时最短的可用后端，没有测试结果时为默认后端"""
+    results = load_bench(bench_file).get("backends", {})
+    candidates = [(result["page_mean"], name) for name, result in results.items()
+                  if name in BACKENDS and BACKENDS[name].available and result.get("page_mean") is not None]
+    return min(candidates)[1] if candidates else DEFAULT_BACKEND
+
+
+class OcrBackends:
+    """当前使用的后端，由settings中的"ocrs"决定；未注册或不可用的名称退回默认后端"""
+
+    def __init__(self, name=DEFAULT_BACKEND):
+        self.name = name
+        self._lock = threading.Lock()
+
+    def resolve(self, name):
+        if name == AUTO_BACKEND:
+            return fastest_backend()
+        backend = BACKENDS.get(name)
+        if backend is None or not backend.available:
+            if name:
+                print(f"OCR backend '{name}' is not available, using {DEFAULT_BACKEND}", file=sys.stderr)
+            return DEFAULT_BACKEND
+        return name
+
+    def engine(self, name=None):
+        """name对应后端的共用实例，首次使用时创建（不加载模型）"""
+        backend = BACKENDS[self.resolve(name) if name else self.name]
+        with self._lock:
+            if backend.instance is None:
+                backend.instance = backend.factory()
+        return backend.instance
+
+    @property
+    def current(self):
+        return self.engine()
+
+    def supports(self, name, capability):
+        """name对应的后端是否支持某项功能（见OcrEngine.capabilities），不创建实例"""
+        return capability in getattr(BACKENDS[self.resolve(name)].factory, "capabilities", ())
+
+    def select(self, name):
+        self.name = self.resolve(name)
+        return self.current
+
+    @staticmethod
+    def settings_keys():
+        """影响识别后端的settings键：后端选择、缓存、预加载、分块检测，以及各后端的参数"""
+        keys = {"ocrs", "ocr_cache", "ocr_cache_mb", "ocr_preload", "det_tile_size"}
+        for backend in BACKENDS.values():
+            keys.update(getattr(backend.factory, "settings_keys", {}))
+        return keys
+
+    def apply_settings(self, settings):
+        """按settings选择后端并更新其参数；切换后端时沿用之前的缓存设置"""
+        engine = self.select(settings.get("ocrs", self.name))
+        engine.apply_settings(settings)
+        return engine
+
+
+ocrBackends = OcrBackends()
+
+
+# ---- 基准测试 ----
+def char_agreement(text, reference):
+    """两段识别结果逐字比对的相似度（0~1），忽略换行"""
+    a, b = text.replace("\n", ""), reference.replace("\n", "")
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def benchmark(names, img_paths, repeat=1):
+    """
+    依次用各后端识别img_paths（不使用缓存），返回每个后端的加载耗时、每页耗时和与第一个后端的逐字一致率
+    """
+    from ocr_pipeline import page_text
+    report = {"pages": list(img_paths), "backends": {}}
+    reference = None
+    for name in names:
+        backend = BACKENDS[name]
+        engine = backend.factory()
+        start = time.perf_counter()
+        engine.get()
+        load_seconds = time.perf_counter() - start
+        # 先跑一次，排除首次推理的初始化开销
+        engine.recognize(img_paths[0])
+        timings, texts, lines = [], [], 0
+        for img_path in img_paths:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                page_lines = engine.recognize(img_path)
+                timings.append(time.perf_counter() - start)
+            texts.append(page_text(page_lines))
+            lines += len(page_lines)
+        if reference is None:
+            reference = texts
+        report["backends"][name] = {
+            "engine": engine.name,
+            "load_seconds": round(load_seconds, 3),
+            "page_mean": round(statistics.mean(timings), 4),
+            "page_median": round(statistics.median(timings), 4),
+            "lines": lines,
+            "chars": sum(len(text.replace("\n", "")) for text in texts),
+            "agreement": round(statistics.mean(char_agreement(text, ref) for text, ref in zip(texts, reference)), 4),
+        }
+    return report
+
+
+def print_report(report, file=sys.stdout):
+    print(f"{len(report['pages'])} pages", file=file)
+    print(f"{'backend':<20}{'load s':>8}{'page ms':>10}{'median ms':>11}{'lines':>7}{'chars':>7}{'agree':>8}",
+          file=file)
+    for name, result in report["backends"].items():
+        print(f"{name:<20}{result['load_seconds']:>8.2f}{result['page_mean'] * 1000:>10.1f}"
+              f"{result['page_median'] * 1000:>11.1f}{result['lines']:>7}{result['chars']:>7}"
+              f"{result['agreement']:>8.2%}", file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OCR后端：列出、基准测试、HTTP桩服务")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="列出已注册的后端")
+    bench = sub.add_parser("bench", help="对比各后端的速度和识别结果，结果写入" + BENCH_FILE)
+    bench.add_argument("inputs", nargs="+", help="图片文件、文件夹或通配符")
+    bench.add_argument("-b", "--backend", action="append", help="参与对比的后端，第一个作为一致率的基准；默认为全部可用后端")
+    bench.add_argument("-r", "--repeat", type=int, default=1, help="每页重复识别次数")
+    bench.add_argument("--no-save", action="store_true", help="不保存结果（自动选择后端时使用保存的结果）")
+    serve = sub.add_parser("serve", help="把本地后端包装成HTTP桩服务")
+    serve.add_argument("-b", "--backend", default=DEFAULT_BACKEND)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8866)
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name in backend_names(available_only=False)[1:]:
+            backend = BACKENDS[name]
+            print(f"{name:<20}{'available' if backend.available else 'missing':<11}{backend.description}")
+        return 0
+    if args.command == "serve":
+        engine = ocrBackends.engine(args.backend)
+        server = make_stub_server(engine, args.host, args.port)
+        print(f"serving {args.backend} ({engine.name}) on http://{args.host}:{server.server_port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    from ocr_pipeline import expand_inputs
+    names = args.backend or [name for name in backend_names()[1:] if name != "远程OCR"]
+    img_paths = expand_inputs(args.inputs)
+    if not img_paths:
+        print("no images", file=sys.stderr)
+        return 1
+    report = benchmark(names, img_paths, args.repeat)
+    print_report(report)
+    if not args.no_save:
+        os.makedirs(os.path.dirname(BENCH_FILE), exist_ok=True)
+        with open(BENCH_FILE, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# coding:utf-8
+# 2025-01-10 文件夹批量识别：多进程并行，每个进程持有自己的OCR引擎
+# 本模块不依赖PySide6，子进程只需导入ocr_engine；但spawn的子进程会重新导入启动程序的主模块（界面中为整个界面），
+# 所以只用一个进程时调用方在本进程中识别（ocr_pipeline.iter_pages），不启动进程池
+import multiprocessing
+import os
+import shutil
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tga')
+# 2025-02-20 每个进程一次取几页，几页的文本行合在一起分桶识别（rec_scheduler.py）
+GROUP_PAGES = 4
+
+# 子进程中的引擎实例，由_init_worker创建
+_engine = None
+
+
+def list_images(folder):
+    """按文件名排序列出文件夹中的图片（每页一张）"""
+    names = sorted(name for name in os.listdir(folder) if name.lower().endswith(IMAGE_EXTS))
+    return [os.path.join(folder, name) for name in names]
+
+
+def resolve_workers(workers, jobs):
+    """workers<=0 表示按CPU核数自动决定，且不超过页数"""
+    if not workers or workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, jobs))
+
+
+def _init_worker(engine_cls, params, cache_config, det_tile_size=0, cpu_share=None):
+    global _engine
+    import cv2
+    # 并行度由进程数提供，每个进程内部只用少量线程，避免核数超订
+    cv2.setNumThreads(1)
+    cache = None
+    if cache_config is not None:
+        from ocr_cache import OcrCache
+        cache = OcrCache(*cache_config)
+    _engine = engine_cls(cache, **params)
+    _engine.det_tile_size = det_tile_size
+    _engine.cpu_share = cpu_share
+    # 开启缓存时模型在第一次未命中时才加载
+    if cache is None:
+        _engine.get()
+
+
+def _recognize_group(img_paths):
+    """识别一组页面，返回 ([(img_path, lines, cached, seconds), ...], 本组的RecStats)"""
+    from rec_scheduler import RecScheduler, recognize_pages
+    scheduler = RecScheduler(_engine)
+    return list(recognize_pages(_engine, img_paths, scheduler=scheduler)), scheduler.stats
+
+
+def page_groups(img_paths, workers, group_pages=GROUP_PAGES):
+    """按顺序把页面分成每组不超过group_pages页，页数少时保证每个进程都分到页面"""
+    size = max(1, min(group_pages, -(-len(img_paths) // workers)))
+    return [img_paths[i:i + size] for i in range(0, len(img_paths), size)]
+
+
+def recognize_folder(img_paths, workers=0, params=None, cache=None, engine_cls=None, on_rec_stats=None,
+                     det_tile_size=0):
+    """
+    在进程池中识别多张图片，按输入顺序逐页返回 (img_path, lines, seconds)，seconds为子进程中这一页的耗时
+    :param img_paths: 图片路径列表
+    :param workers: 进程数，0为自动
+    :param params: 传给引擎的参数（PaddleOCR参数等）
+    :param cache: OcrCache，各进程共用同一缓存目录
+    :param engine_cls: 各进程中创建的引擎类（见ocr_backends.py），默认为本地PaddleOCR
+    :param on_rec_stats: 每组页面识别完成后以该组的RecStats调用，用于汇总识别速度
+    :param det_tile_size: 分块检测的块边长（tiled_det.py），0为整页检测
+    """
+    from ocr_engine import OcrEngine
+    if not img_paths:
+        return
+    engine_cls = engine_cls or OcrEngine
+    workers = resolve_workers(workers, len(img_paths))
+    params = dict(engine_cls.default_params, **(params or {}))
+    cpu_share = max(1, (os.cpu_count() or 1) // workers)
+    if engine_cls.thread_param and not params.get(engine_cls.thread_param):
+        params[engine_cls.thread_param] = cpu_share
+    # spawn在各平台行为一致，也避免fork后推理库线程状态异常
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(engine_cls, params, cache.config() if cache is not None else None, det_tile_size, cpu_share)) as pool:
+        # imap保证按页码顺序返回，同时不必等待整本书识别完
+        for pages, rec_stats in pool.imap(_recognize_group, page_groups(img_paths, workers), chunksize=1):
+            if on_rec_stats is not None:
+                on_rec_stats(rec_stats)
+            for img_path, lines, cached, seconds in pages:
+                # 子进程的命中情况汇总到主进程的缓存统计中
+                if cache is not None:
+                    cache.record(cached)
+                yield img_path, lines, seconds
+
+
+def write_binding(pages, binding_dir):
+    """
+    一次性写出装订结果：每页图片和同名txt放到binding_dir中
+    :param pages: [(img_path, text), ...]
+    """
+    os.makedirs(binding_dir, exist_ok=True)
+    for img_path, text in pages:
+        name = os.path.basename(img_path)
+        shutil.copy(img_path, os.path.join(binding_dir, name))
+        with open(os.path.join(binding_dir, os.path.splitext(name)[0] + '.txt'), 'w', encoding='utf-8') as txt:
+            txt.write(text)
+    return binding_dir
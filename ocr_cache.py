@@ -0,0 +1,142 @@
+# coding:utf-8
+# 2025-01-15 按图片内容哈希+模型配置缓存识别结果，重复打开同一页面时不再推理
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+
+def image_digest(img):
+    """图片路径按文件内容计算哈希，numpy数组按形状和像素计算哈希"""
+    sha = hashlib.sha256()
+    if isinstance(img, np.ndarray):
+        sha.update(f"{img.shape}{img.dtype}".encode())
+        sha.update(np.ascontiguousarray(img).data)
+    else:
+        with open(img, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+    return sha.hexdigest()
+
+
+class OcrCache:
+    """
+    磁盘上的LRU缓存，每条结果一个json文件，文件修改时间即最近使用时间
+    :param cache_dir: 缓存目录
+    :param max_bytes: 缓存总大小上限，超出时删除最久未使用的结果
+    """
+
+    def __init__(self, cache_dir='cache/ocr', max_bytes=256 << 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # 路径 -> 文件大小，首次使用时扫描目录
+        self._sizes = None
+        self._total = 0
+
+    def config(self):
+        """重建同一缓存所需的参数（用于传给子进程）"""
+        return self.cache_dir, self.max_bytes
+
+    def key(self, img, model_config):
+        config = json.dumps(model_config, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256((image_digest(img) + config).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def _scan(self):
+        if self._sizes is not None:
+            return
+        self._sizes = {}
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    self._sizes[path] = os.path.getsize(path)
+        self._total = sum(self._sizes.values())
+
+    def get(self, key):
+        """返回缓存的result_t，未命中返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            # 更新修改时间，作为最近使用的依据
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def record(self, hit):
+        """记录在其他进程中发生的一次命中/未命中"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key, result):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再替换，避免多进程同时写入时读到半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, default=float)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._scan()
+            self._total += os.path.getsize(path) - self._sizes.get(path, 0)
+            self._sizes[path] = os.path.getsize(path)
+            self._evict()
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        entries = []
+        for path in self._sizes:
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                entries.append((0, path))
+        for _, path in sorted(entries):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._total -= self._sizes.pop(path)
+
+    def clear(self):
+        with self._lock:
+            self._scan()
+            for path in list(self._sizes):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._sizes.clear()
+            self._total = 0
+
+    def stats(self):
+        with self._lock:
+            self._scan()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+                "entries": len(self._sizes),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,157 @@
+# coding:utf-8
+# 2025-01-20 按PaddleOCR四点框做透视校正切图，整页所有框的变换矩阵一次性批量求解
+import cv2
+import numpy as np
+
+
+def load_image(img_path):
+    """解码图片（支持中文路径），16位图像转为8位"""
+    img = cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), -1)
+    if img is None:
+        raise ValueError(f"无法解码图片 {img_path}")
+    if img.dtype == np.uint16:
+        img = (img >> 8).astype(np.uint8)
+    return img
+
+
+def to_bgr(img):
+    """灰度/BGRA图像转为识别模型需要的3通道BGR，透明部分填充为白色"""
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    if img.shape[2] == 4:
+        alpha = img[..., 3:].astype(np.float32) / 255
+        return (img[..., :3] * alpha + 255 * (1 - alpha)).astype(np.uint8)
+    return img
+
+
+def as_polys(boxes):
+    """将 [[左上, 右上, 右下, 左下], ...] 转为 (N, 4, 2) 的float32数组"""
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 4, 2)
+
+
+def order_points(points):
+    """(N, 4, 2) 的四个点按 左上、右上、右下、左下 排列（与PaddleOCR的get_mini_boxes相同）"""
+    n = len(points)
+    by_x = np.take_along_axis(points, np.argsort(points[..., 0], axis=1, kind='stable')[..., None], axis=1)
+    left, right = by_x[:, :2], by_x[:, 2:]
+    # 左边两点中y小的为左上，右边两点中y小的为右上
+    left_swap = left[:, 1, 1] <= left[:, 0, 1]
+    right_swap = right[:, 1, 1] <= right[:, 0, 1]
+    rows = np.arange(n)
+    top_left = left[rows, left_swap.astype(int)]
+    bottom_left = left[rows, 1 - left_swap.astype(int)]
+    top_right = right[rows, right_swap.astype(int)]
+    bottom_right = right[rows, 1 - right_swap.astype(int)]
+    return np.stack([top_left, top_right, bottom_right, bottom_left], axis=1)
+
+
+def crop_sizes(polys):
+    """每个框校正后的宽高 (N, 2)，取对边长度的较大值，至少为1像素"""
+    edges = np.linalg.norm(polys - np.roll(polys, -1, axis=1), axis=2)  # 上、右、下、左四条边
+    w = np.maximum(edges[:, 0], edges[:, 2])
+    h = np.maximum(edges[:, 1], edges[:, 3])
+    return np.maximum(np.rint(np.stack([w, h], axis=1)), 1).astype(np.int32)
+
+
+def poly_areas(polys):
+    x, y = polys[..., 0], polys[..., 1]
+    return 0.5 * np.abs(np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1))
+
+
+def perspective_matrices(polys, sizes):
+    """
+    批量求解把每个四边形映射到 (0,0)-(w,h) 矩形的透视矩阵，返回 (N, 3, 3)
+    与cv2.getPerspectiveTransform相同的8元线性方程组，只是一次求解全部框
+    """
+    n = len(polys)
+    w, h = sizes[:, 0].astype(np.float64), sizes[:, 1].astype(np.float64)
+    zeros = np.zeros(n)
+    dst = np.stack([np.stack([zeros, zeros], 1), np.stack([w, zeros], 1),
+                    np.stack([w, h], 1), np.stack([zeros, h], 1)], axis=1)  # (N, 4, 2)
+    src = polys.astype(np.float64)
+    x, y = src[..., 0], src[..., 1]
+    u, v = dst[..., 0], dst[..., 1]
+    one, zero = np.ones_like(x), np.zeros_like(x)
+    rows_u = np.stack([x, y, one, zero, zero, zero, -x * u, -y * u], axis=2)
+    rows_v = np.stack([zero, zero, zero, x, y, one, -x * v, -y * v], axis=2)
+    a = np.concatenate([rows_u, rows_v], axis=1)  # (N, 8, 8)
+    b = np.concatenate([u, v], axis=1)  # (N, 8)
+    matrices = np.empty((n, 9))
+    matrices[:, 8] = 1
+    # 退化的框（面积接近0）无法求解，单独处理，其余一次性求解
+    ok = poly_areas(polys) > 1
+    if ok.any():
+        matrices[ok, :8] = np.linalg.solve(a[ok], b[ok][..., None])[..., 0]
+    if not ok.all():
+        matrices[~ok] = np.nan
+    return matrices.reshape(n, 3, 3)
+
+
+def axis_aligned(polys):
+    """整数坐标、与图像边平行的矩形框可以直接取切片视图，无需透视变换"""
+    p = polys
+    return (np.all(p == np.rint(p), axis=(1, 2))
+            & (p[:, 0, 1] == p[:, 1, 1]) & (p[:, 2, 1] == p[:, 3, 1])
+            & (p[:, 0, 0] == p[:, 3, 0]) & (p[:, 1, 0] == p[:, 2, 0])
+            & (p[:, 1, 0] > p[:, 0, 0]) & (p[:, 2, 1] > p[:, 1, 1]))
+
+
+class PageCrops:
+    """
+    一页图像上所有文本行的校正切图，按下标取用时才渲染
+    :param image: 整页图像（cv2格式）
+    :param boxes: 四点框列表，或 (N, 4, 2) 数组
+    :param rotate_vertical: 为True时将高宽比>=1.5的竖排行旋转为横向（送入识别模型时使用）
+    """
+
+    def __init__(self, image, boxes, rotate_vertical=False):
+        self.image = image
+        self.polys = as_polys(boxes)
+        self.rotate_vertical = rotate_vertical
+        self.sizes = crop_sizes(self.polys)
+        self.aligned = axis_aligned(self.polys)
+        self._matrices = None
+
+    def __len__(self):
+        return len(self.polys)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def matrices(self):
+        if self._matrices is None:
+            self._matrices = perspective_matrices(self.polys, self.sizes)
+        return self._matrices
+
+    def __getitem__(self, i):
+        if self.aligned[i]:
+            # 轴对齐的框直接返回整页图像上的视图，不复制像素
+            (x1, y1), (x2, y2) = self.polys[i, 0].astype(int), self.polys[i, 2].astype(int)
+            h, w = self.image.shape[:2]
+            crop = self.image[max(y1, 0):min(y2, h), max(x1, 0):min(x2, w)]
+        else:
+            matrix = self.matrices[i]
+            w, h = (int(v) for v in self.sizes[i])
+            if np.isnan(matrix).any():
+                crop = self.image[0:0, 0:0]
+            else:
+                crop = cv2.warpPerspective(self.image, matrix, (w, h), flags=cv2.INTER_CUBIC,
+                                           borderMode=cv2.BORDER_REPLICATE)
+        if self.rotate_vertical and crop.shape[0] >= crop.shape[1] * 1.5:
+            crop = np.ascontiguousarray(np.rot90(crop))
+        return crop
+
+    def extend(self, boxes):
+        """追加一批框（流式识别时逐批加入），变换矩阵下次取用时再统一求解"""
+        polys = as_polys(boxes)
+        if not len(polys):
+            return
+        self.polys = np.concatenate([self.polys, polys])
+        self.sizes = np.concatenate([self.sizes, crop_sizes(polys)])
+        self.aligned = np.concatenate([self.aligned, axis_aligned(polys)])
+        self._matrices = None
+
+    def all(self):
+        return list(self)
@@ -0,0 +1,342 @@
+# coding:utf-8
+# 2025-01-06 进程级共享的OCR引擎，模型只加载一次，供所有页面识别复用
+# 本模块不依赖PySide6，命令行/多进程场景也可直接使用
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+def current_rss():
+    """返回当前进程常驻内存（字节），无法获取时返回None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    # Linux下直接读取/proc，避免额外依赖
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def sort_boxes(boxes):
+    """与PaddleOCR的sorted_boxes相同的阅读顺序：先上后下，同一行(y相差<10)内先左后右"""
+    boxes = boxes[np.lexsort((boxes[:, 0, 0], boxes[:, 0, 1]))] if len(boxes) else boxes
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            if abs(boxes[j + 1, 0, 1] - boxes[j, 0, 1]) < 10 and boxes[j + 1, 0, 0] < boxes[j, 0, 0]:
+                boxes[[j, j + 1]] = boxes[[j + 1, j]]
+            else:
+                break
+    return boxes
+
+
+class OcrEngine:
+    """
+    本地PaddleOCR引擎，同时定义了各识别后端的公共接口（见ocr_backends.py）
+    2025-02-17 推理调用集中在_infer_det/_infer_rec，其他后端只需重写这几个方法和_load、model_config
+    """
+    name = "paddleocr"
+    # 后端支持的功能：det检测，rec识别，cls方向分类，batch_rec一次识别多个切图，gpu，
+    # parallel_det检测可多线程同时调用（分块检测时各块并行），
+    # pooled_rec识别结果与同批有哪些切图无关（批量识别时几页的行可合在一起识别，见rec_scheduler.recognize_pages）
+    capabilities = frozenset({"det", "rec", "cls", "batch_rec", "gpu"})
+    # 与原先show_result中的初始化参数保持一致
+    default_params = {"use_angle_cls": True, "lang": "ch", "device": "cpu"}
+    # settings中的键与PaddleOCR参数的对应关系
+    settings_keys = {"ocr_device": "device", "rec_batch_size": "rec_batch_num"}
+    # 多进程批量识别时按进程数分配的线程数参数，为None时不设置
+    thread_param = "cpu_threads"
+
+    @classmethod
+    def available(cls):
+        """依赖是否已安装（不导入，不加载模型）"""
+        return importlib.util.find_spec("paddleocr") is not None
+
+    def __init__(self, cache=None, **params):
+        self.params = dict(self.default_params, **params)
+        self._ocr = None
+        # 2025-01-15 识别结果缓存(OcrCache)，为None时不缓存
+        self.cache = cache
+        # _load_lock保证模型只加载一次，_infer_lock保证同一时刻只有一个推理（predictor非线程安全）
+        self._load_lock = threading.Lock()
+        self._infer_lock = threading.Lock()
+        self._warm_thread = None
+        self.load_count = 0
+        self.load_seconds = 0.0
+        self.load_rss_delta = None
+        self.calls = 0
+        self.infer_seconds = 0.0
+        # 2025-02-20 识别调度的累计统计（rec_scheduler.RecStats），首次识别时创建
+        self.rec_stats = None
+        # 2025-02-22 长边超过此值的页面分块检测（tiled_det.py），0为整页检测
+        self.det_tile_size = 0
+        # 2025-02-25 本引擎可用的CPU核数，None为全部；多进程批量识别时每个进程只分到一份
+        self.cpu_share = None
+
+    @property
+    def loaded(self):
+        return self._ocr is not None
+
+    def get(self):
+        """返回已加载的PaddleOCR实例，首次调用时加载模型"""
+        ocr = self._ocr
+        if ocr is None:
+            with self._load_lock:
+                if self._ocr is None:
+                    self._ocr = self._load()
+                ocr = self._ocr
+        return ocr
+
+    def _load(self):
+        os.environ["KMP_DUPLICATE_LIB_OK"] = "True"
+        from paddleocr import PaddleOCR
+        rss_before = current_rss()
+        start = time.perf_counter()
+        ocr = PaddleOCR(**self.params)
+        self.load_seconds = time.perf_counter() - start
+        rss_after = current_rss()
+        if rss_before is not None and rss_after is not None:
+            self.load_rss_delta = rss_after - rss_before
+        self.load_count += 1
+        return ocr
+
+    def model_config(self, cls=True):
+        """决定识别结果的模型配置，作为缓存键的一部分；无需加载模型即可得到"""
+        try:
+            from importlib.metadata import version
+            engine_version = version("paddleocr")
+        except Exception:
+            engine_version = None
+        lang = self.params.get("lang", "ch")
+        ocr_version = self.params.get("ocr_version", "PP-OCRv4")
+        return {
+            "engine": "paddleocr",
+            "version": engine_version,
+            "ocr_version": ocr_version,
+            "det_model": self.params.get("det_model_dir") or f"{lang}_{ocr_version}_det_infer",
+            "rec_model": self.params.get("rec_model_dir") or f"{lang}_{ocr_version}_rec_infer",
+            "use_angle_cls": self.params.get("use_angle_cls", False),
+            "cls": cls,
+            "lang": lang,
+        }
+
+    def cache_config(self, cls=True):
+        """缓存键使用的配置：模型配置加上识别的分批方式（批内补齐的宽度会影响结果）和分块检测的块大小"""
+        from rec_scheduler import RecScheduler
+        scheduler = RecScheduler(self)
+        config = dict(self.model_config(cls), rec_batch=[scheduler.batch_size, scheduler.window])
+        return dict(config, det_tile_size=self.det_tile_size) if self.det_tile_size else config
+
+    # ---- 推理，各后端重写 ----
+    def _infer_det(self, model, img):
+        """只做检测，返回框的列表（未排序）"""
+        return model.ocr(img, det=True, rec=False)[0] or []
+
+    def _infer_rec(self, model, crops, cls):
+        """识别切图列表，返回 [(text, score), ...]"""
+        return model.ocr(list(crops), det=False, rec=True, cls=cls)[0]
+
+    def drop_score(self):
+        """低于此置信度的行不输出"""
+        return getattr(self.get(), "drop_score", 0.5)
+
+    def ocr(self, img, cls=True):
+        """与PaddleOCR.ocr用法相同，返回result_t；开启缓存时先查缓存，命中则不加载模型"""
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(img, self.cache_config(cls))
+            result = self.cache.get(key)
+            if result is not None:
+                return result
+        from ocr_crop import load_image, to_bgr
+        img = to_bgr(load_image(img) if isinstance(img, str) else img)
+        lines = [line for chunk, _, _ in self._iter_lines(img, cls) for line in chunk]
+        result = [[[box, [text, score]] for box, text, score in lines] or None]
+        if key is not None:
+            self.cache.put(key, result)
+        return result
+
+    def _tiled_page(self, img):
+        """需要分块检测时返回解码后的整页图像，否则返回None"""
+        if not self.det_tile_size:
+            return None
+        if isinstance(img, str):
+            from ocr_crop import load_image, to_bgr
+            img = to_bgr(load_image(img))
+        return img if max(img.shape[:2]) > self.det_tile_size else None
+
+    def det_workers(self):
+        """
+        2025-02-25 分块检测并行的线程数：每次检测推理本身已用thread_param个线程，
+        并行块数×推理线程数不超过可用核数（cpu_share）；未限定推理线程数（推理已用满全部核）或不支持并行检测时逐块串行
+        """
+        if "parallel_det" not in self.capabilities or not self.thread_param:
+            return 1
+        threads = int(self.params.get(self.thread_param) or 0)
+        if threads <= 0:
+            return 1
+        return max(1, (self.cpu_share or os.cpu_count() or 1) // threads)
+
+    def _iter_lines(self, img, cls):
+        """
+        2025-02-24 整页识别和流式识别共用的检测→切图→分类/识别流程，两者结果完全相同
+        先返回 ([], 0, 总框数)，之后按阅读顺序每RecScheduler.window行返回一次 (本批结果, 已识别框数, 总框数)
+        """
+        from ocr_crop import PageCrops
+        from rec_scheduler import RecScheduler
+        boxes = self.detect(img)
+        # 与recognize_pages相同，检测完即计数（流式识别中途取消的页也计入）
+        self.calls += 1
+        yield [], 0, len(boxes)
+        crops = PageCrops(img, boxes, rotate_vertical=True)
+        drop_score = self.drop_score()
+        scheduler = RecScheduler(self)
+        for start in range(0, len(boxes), scheduler.window):
+            stop = min(start + scheduler.window, len(boxes))
+            rec_res = scheduler.run([crops[i] for i in range(start, stop)], cls)
+            yield [(boxes[i].tolist(), text, score)
+                   for i, (text, score) in zip(range(start, stop), rec_res) if score >= drop_score], stop, len(boxes)
+
+    def recognize(self, img, cls=True):
+        """识别单张图片，返回 [(box, text, score), ...]，空白页面返回空列表"""
+        result_t = self.ocr(img, cls=cls)
+        return [(item[0], item[1][0], item[1][1]) for item in (result_t[0] or [])]
+
+    # 2025-01-24 流式识别：先检测出全部文本框，再分批识别，每识别完一批就返回一批结果
+    def detect(self, img):
+        """只做文本检测，返回按阅读顺序排好的 (N, 4, 2) 框"""
+        ocr = self.get()
+        page = self._tiled_page(img)
+        if page is not None:
+            from tiled_det import detect_tiled
+            detect_fn = lambda tile: self._infer_det(ocr, tile)
+            start = time.perf_counter()
+            workers = self.det_workers()
+            if workers > 1:
+                boxes = detect_tiled(page, detect_fn, self.det_tile_size, workers=workers)
+            else:
+                with self._infer_lock:
+                    boxes = detect_tiled(page, detect_fn, self.det_tile_size)
+            self.infer_seconds += time.perf_counter() - start
+            return sort_boxes(boxes)
+        with self._infer_lock:
+            start = time.perf_counter()
+            boxes = self._infer_det(ocr, img)
+            self.infer_seconds += time.perf_counter() - start
+        return sort_boxes(np.asarray(boxes, dtype=np.float32).reshape(-1, 4, 2))
+
+    def recognize_crops(self, crops, cls=True):
+        """识别已切好的文本行图像列表，返回 [(text, score), ...]"""
+        if not len(crops):
+            return []
+        ocr = self.get()
+        with self._infer_lock:
+            start = time.perf_counter()
+            result = self._infer_rec(ocr, crops, cls)
+            self.infer_seconds += time.perf_counter() - start
+        return [tuple(item) for item in result]
+
+    def record_rec_stats(self, stats):
+        if self.rec_stats is None:
+            from rec_scheduler import RecStats
+            self.rec_stats = RecStats()
+        self.rec_stats.add(stats)
+
+    def iter_recognize(self, img_path, img=None, cls=True):
+        """
+        逐批返回 (本批结果 [(box, text, score), ...], 已识别框数, 总框数)，合并后与recognize(img_path)一致
+        检测完成后先返回一个空批次（用于显示进度）；缓存命中时一次返回全部
+        :param img: 已解码的整页图像，为None时从img_path读取
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(img_path, self.cache_config(cls))
+            result = self.cache.get(key)
+            if result is not None:
+                lines = [(item[0], item[1][0], item[1][1]) for item in (result[0] or [])]
+                yield lines, len(lines), len(lines)
+                return
+        from ocr_crop import load_image, to_bgr
+        img = to_bgr(load_image(img_path) if img is None else img)
+        lines = []
+        for chunk, done, total in self._iter_lines(img, cls):
+            lines.extend(chunk)
+            yield chunk, done, total
+        if key is not None:
+            self.cache.put(key, [[[box, [text, score]] for box, text, score in lines] or None])
+
+    def warm_up(self, background=False):
+        """预先加载模型并跑一次空白图，background=True时在后台线程进行"""
+        if background:
+            if self._warm_thread is None or not self._warm_thread.is_alive():
+                self._warm_thread = threading.Thread(target=self.warm_up, name="OcrEngineWarmUp", daemon=True)
+                self._warm_thread.start()
+            return
+        try:
+            self.ocr(np.full((64, 64, 3), 255, dtype=np.uint8))
+        except Exception as e:
+            print(f"OCR engine warm up failed: {e}", file=sys.stderr)
+
+    def configure(self, **params):
+        """更新模型参数，参数有变化时释放旧模型，下次使用时按新参数加载；返回是否发生变化"""
+        new_params = dict(self.params, **params)
+        if new_params == self.params:
+            return False
+        with self._load_lock, self._infer_lock:
+            self.params = new_params
+            self._ocr = None
+        return True
+
+    def apply_settings(self, settings):
+        """根据settings字典更新引擎，已加载且参数变化时重新加载（ocr_preload为真时在后台加载）"""
+        params = {param: settings[key] for key, param in self.settings_keys.items() if key in settings}
+        if "ocr_cache" in settings:
+            self.set_cache(settings["ocr_cache"], settings.get("ocr_cache_mb", 256))
+        if "det_tile_size" in settings:
+            self.det_tile_size = max(0, int(settings["det_tile_size"] or 0))
+        was_loaded = self.loaded
+        changed = self.configure(**params)
+        if (changed and was_loaded) or (settings.get("ocr_preload") and not self.loaded):
+            self.warm_up(background=True)
+        return changed
+
+    def set_cache(self, enabled, max_mb=256, cache_dir='cache/ocr'):
+        if not enabled:
+            self.cache = None
+        elif self.cache is None:
+            from ocr_cache import OcrCache
+            self.cache = OcrCache(cache_dir, int(max_mb * (1 << 20)))
+        else:
+            self.cache.max_bytes = int(max_mb * (1 << 20))
+
+    def reload(self):
+        """强制按当前参数重新加载模型"""
+        with self._load_lock, self._infer_lock:
+            self._ocr = None
+        return self.get()
+
+    def memory_stats(self):
+        return {
+            "engine": self.name,
+            "loaded": self.loaded,
+            "params": dict(self.params),
+            "load_count": self.load_count,
+            "load_seconds": round(self.load_seconds, 3),
+            "load_rss_delta": self.load_rss_delta,
+            "rss": current_rss(),
+            "calls": self.calls,
+            "avg_infer_seconds": round(self.infer_seconds / self.calls, 3) if self.calls else None,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "rec": self.rec_stats.as_dict() if self.rec_stats is not None else None,
+            "det_tile_size": self.det_tile_size,
+        }
+
+
+ocrEngine = OcrEngine()
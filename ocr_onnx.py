@@ -0,0 +1,441 @@
+# coding:utf-8
+# 2025-02-18 直接用ONNX Runtime推理PP-OCRv4的det/cls/rec模型，不导入Paddle
+# DB后处理（二值化、最小外接矩形、按比例外扩）和CTC解码用NumPy按整页/整批向量化计算，
+# 预处理和阈值与PaddleOCR的默认值一致，输出与PaddleOCR.ocr相同的result_t
+# 模型文件（paddle2onnx导出）放在models/onnx/下，没有时使用rapidocr_onnxruntime自带的同一套模型
+import importlib.util
+import math
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from ocr_crop import load_image, order_points, to_bgr
+from ocr_engine import OcrEngine, current_rss
+from rec_scheduler import class_ratio, ratio_classes
+
+MODEL_DIR = 'models/onnx'
+DET_MODEL = 'ch_PP-OCRv4_det_infer.onnx'
+REC_MODEL = 'ch_PP-OCRv4_rec_infer.onnx'
+CLS_MODEL = 'ch_ppocr_mobile_v2.0_cls_infer.onnx'
+
+
+def model_dirs(model_dir=None):
+    """依次查找模型的目录：参数指定的目录、models/onnx、rapidocr_onnxruntime自带的models"""
+    dirs = [model_dir] if model_dir else []
+    dirs.append(MODEL_DIR)
+    spec = importlib.util.find_spec("rapidocr_onnxruntime")
+    if spec is not None and spec.origin:
+        dirs.append(os.path.join(os.path.dirname(spec.origin), 'models'))
+    return dirs
+
+
+def find_model(file_name, model_dir=None):
+    """file_name为绝对路径或已存在的路径时直接返回，否则在model_dirs中查找，找不到时返回None"""
+    if os.path.isfile(file_name):
+        return file_name
+    for directory in model_dirs(model_dir):
+        path = os.path.join(directory, file_name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def file_signature(path):
+    """
+    文件的完整路径、大小和修改时间，作为缓存键的一部分：换了模型目录或同名的微调模型时缓存随之失效
+    path为None或文件不存在时返回None
+    """
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+
+def make_session(model_path, intra_threads=0, inter_threads=0):
+    """CPU推理会话；线程数为0时使用ONNX Runtime的默认值（物理核数）"""
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if intra_threads:
+        options.intra_op_num_threads = int(intra_threads)
+    if inter_threads:
+        options.inter_op_num_threads = int(inter_threads)
+    return ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+
+def min_area_rects(point_sets):
+    """每组点的最小外接矩形（cv2.minAreaRect），返回 (N, 5)：中心x, 中心y, 宽, 高, 角度"""
+    return np.array([(cx, cy, w, h, angle) for (cx, cy), (w, h), angle in map(cv2.minAreaRect, point_sets)],
+                    dtype=np.float64).reshape(-1, 5)
+
+
+def rect_points(rects):
+    """
+    批量计算旋转矩形的四个顶点，与cv2.boxPoints相同
+    :param rects: (N, 5) 数组，每行为 中心x, 中心y, 宽, 高, 角度（度）
+    """
+    cx, cy, w, h, angle = (rects[:, i] for i in range(5))
+    b = np.cos(np.deg2rad(angle)) * 0.5
+    a = np.sin(np.deg2rad(angle)) * 0.5
+    p0 = np.stack([cx - a * h - b * w, cy + b * h - a * w], axis=1)
+    p1 = np.stack([cx + a * h - b * w, cy - b * h - a * w], axis=1)
+    return np.stack([p0, p1, 2 * np.stack([cx, cy], axis=1) - p0, 2 * np.stack([cx, cy], axis=1) - p1], axis=1)
+
+
+def box_scores(pred, boxes):
+    """
+    每个框内预测概率的均值（PaddleOCR的score_mode='fast'）
+    所有框一次画到标签图上，用bincount同时求和，不必逐框切图
+    """
+    labels = np.zeros(pred.shape, dtype=np.int32)
+    for i, box in enumerate(boxes):
+        cv2.fillPoly(labels, [np.rint(box).astype(np.int32)], i + 1)
+    labels = labels.ravel()
+    sums = np.bincount(labels, weights=pred.ravel(), minlength=len(boxes) + 1)[1:]
+    counts = np.bincount(labels, minlength=len(boxes) + 1)[1:]
+    return np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+
+
+class DbDetector:
+    """
+    DB文本检测：整页缩放到32的倍数，输出概率图后提取四点框
+    :param limit_type: 'max'时长边不超过limit_side_len，'min'时短边不小于limit_side_len
+    """
+
+    def __init__(self, session, limit_side_len=960, limit_type='max', thresh=0.3, box_thresh=0.6,
+                 unclip_ratio=1.5, use_dilation=False, max_candidates=1000, min_size=3):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.limit_side_len = limit_side_len
+        self.limit_type = limit_type
+        self.use_dilation = use_dilation
+        self.thresh = thresh
+        self.box_thresh = box_thresh
+        self.unclip_ratio = unclip_ratio
+        self.max_candidates = max_candidates
+        self.min_size = min_size
+        self.mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+        self.std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+    def preprocess(self, img):
+        h, w = img.shape[:2]
+        if self.limit_type == 'min':
+            ratio = self.limit_side_len / min(h, w) if min(h, w) < self.limit_side_len else 1.0
+        else:
+            ratio = self.limit_side_len / max(h, w) if max(h, w) > self.limit_side_len else 1.0
+        resize_h = max(int(round(h * ratio / 32) * 32), 32)
+        resize_w = max(int(round(w * ratio / 32) * 32), 32)
+        resized = cv2.resize(img, (resize_w, resize_h))
+        blob = (resized.astype(np.float32) / 255 - self.mean) / self.std
+        return blob.transpose(2, 0, 1)[None]
+
+    def postprocess(self, pred, height, width):
+        """概率图 -> 原图坐标下的 (N, 4, 2) 框（未排序）"""
+        pred_h, pred_w = pred.shape
+        bitmap = (pred > self.thresh).astype(np.uint8) * 255
+        if self.use_dilation:
+            bitmap = cv2.dilate(bitmap, np.ones((2, 2), dtype=np.uint8))
+        contours, _ = cv2.findContours(bitmap, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        contours = contours[:self.max_candidates]
+        if not contours:
+            return np.zeros((0, 4, 2), dtype=np.float32)
+        rects = min_area_rects(contours)
+        rects = rects[np.minimum(rects[:, 2], rects[:, 3]) >= self.min_size]
+        if not len(rects):
+            return np.zeros((0, 4, 2), dtype=np.float32)
+        boxes = order_points(rect_points(rects))
+        keep = box_scores(pred, boxes) >= self.box_thresh
+        rects, boxes = rects[keep], boxes[keep]
+        # 外扩（unclip）：框按 面积*unclip_ratio/周长 的距离向外偏移（圆角），偏移后的最小外接矩形即宽高各加两倍距离，
+        # 不需要pyclipper；与PaddleOCR一样先把顶点截断为整数、偏移结果取整，水平/竖直的框与其结果相同，倾斜的框相差不超过1像素
+        w, h = rects[:, 2], rects[:, 3]
+        distance = w * h * self.unclip_ratio / (2 * (w + h))
+        rects = min_area_rects(np.trunc(boxes).astype(np.float32))
+        rects[:, 2:4] += 2 * distance[:, None]
+        boxes = order_points(np.round(rect_points(rects)))
+        sides = np.minimum(np.linalg.norm(boxes[:, 0] - boxes[:, 1], axis=1),
+                           np.linalg.norm(boxes[:, 0] - boxes[:, 3], axis=1))
+        boxes = boxes[sides >= self.min_size + 2]
+        # 概率图坐标换算回原图，取整后限制在图像范围内
+        boxes[..., 0] = np.clip(np.round(boxes[..., 0] / pred_w * width), 0, width - 1)
+        boxes[..., 1] = np.clip(np.round(boxes[..., 1] / pred_h * height), 0, height - 1)
+        boxes = order_points(boxes)
+        # 太小的框丢弃（PaddleOCR的filter_tag_det_res）
+        box_w = np.linalg.norm(boxes[:, 0] - boxes[:, 1], axis=1).astype(int)
+        box_h = np.linalg.norm(boxes[:, 0] - boxes[:, 3], axis=1).astype(int)
+        return boxes[(box_w > 3) & (box_h > 3)].astype(np.float32)
+
+    def __call__(self, img):
+        pred = self.session.run(None, {self.input_name: self.preprocess(img)})[0]
+        return self.postprocess(pred[0, 0], *img.shape[:2])
+
+
+def resize_norm(img, height, width):
+    """按高度等比缩放后归一化到[-1, 1]，右侧补0到width（cls、rec共用）"""
+    h, w = img.shape[:2]
+    resized_w = min(width, int(math.ceil(height * w / max(h, 1))))
+    resized = cv2.resize(img, (max(resized_w, 1), height)).astype(np.float32)
+    blob = np.zeros((3, height, width), dtype=np.float32)
+    blob[:, :, :resized.shape[1]] = ((resized / 255 - 0.5) / 0.5).transpose(2, 0, 1)
+    return blob
+
+
+class AngleClassifier:
+    """文本行方向分类（0°/180°），置信度超过thresh的180°切图旋转后再识别"""
+
+    def __init__(self, session, image_shape=(3, 48, 192), batch_size=6, thresh=0.9):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.height, self.width = image_shape[1:]
+        self.batch_size = batch_size
+        self.thresh = thresh
+
+    def __call__(self, crops):
+        crops = list(crops)
+        # 宽高比相近的切图放在同一批
+        order = np.argsort([crop.shape[1] / max(crop.shape[0], 1) for crop in crops], kind='stable')
+        for start in range(0, len(crops), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            blob = np.stack([resize_norm(crops[i], self.height, self.width) for i in batch])
+            probs = self.session.run(None, {self.input_name: blob})[0]
+            flip = (probs.argmax(axis=1) == 1) & (probs.max(axis=1) > self.thresh)
+            for i in batch[flip]:
+                crops[i] = cv2.rotate(crops[i], cv2.ROTATE_180)
+        return crops
+
+
+def ctc_decode(probs, characters):
+    """
+    批量CTC贪心解码：去掉连续重复和空白(0)，返回 [(text, score), ...]，score为保留字符概率的均值
+    :param probs: (N, T, C) softmax输出
+    :param characters: 下标到字符的numpy数组，0为空白
+    """
+    index = probs.argmax(axis=2)
+    prob = probs.max(axis=2)
+    keep = index != 0
+    keep[:, 1:] &= index[:, 1:] != index[:, :-1]
+    counts = keep.sum(axis=1)
+    scores = np.where(counts > 0, (prob * keep).sum(axis=1) / np.maximum(counts, 1), 0.0)
+    chars = characters[index[keep]]
+    ends = np.cumsum(counts)
+    return [("".join(chars[end - count:end]), float(score)) for end, count, score in zip(ends, counts, scores)]
+
+
+class CtcRecognizer:
+    """
+    文本行识别，同一批的切图缩放到相同高度，宽度按批内最大宽高比补齐
+    2025-02-26 改为补齐到切图所在宽高比档的上界（rec_scheduler.ratio_classes），同一批只放同一档的切图，
+    每个切图的输入只取决于它自己，识别结果与同批有哪些切图无关
+    """
+
+    def __init__(self, session, characters, image_shape=(3, 48, 320), batch_size=6):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.characters = characters
+        self.height, self.width = image_shape[1:]
+        self.batch_size = batch_size
+
+    def classes(self, crops):
+        """切图所在的宽高比档"""
+        return ratio_classes([crop.shape[1] / max(crop.shape[0], 1) for crop in crops])
+
+    def padded_width(self, ratio_class):
+        """一档切图补齐后的输入宽度"""
+        return max(self.width, int(round(self.height * float(class_ratio(ratio_class)))))
+
+    def __call__(self, crops):
+        crops = list(crops)
+        ratios = np.array([crop.shape[1] / max(crop.shape[0], 1) for crop in crops])
+        classes = self.classes(crops)
+        # 先按档、档内按宽高比排序，每批不跨档
+        order = np.lexsort((ratios, classes))
+        sorted_classes = classes[order]
+        result = [None] * len(crops)
+        start = 0
+        while start < len(crops):
+            stop = min(start + self.batch_size, np.searchsorted(sorted_classes, sorted_classes[start], side='right'))
+            batch = order[start:stop]
+            start = stop
+            width = self.padded_width(sorted_classes[stop - 1])
+            blob = np.stack([resize_norm(crops[i], self.height, width) for i in batch])
+            probs = self.session.run(None, {self.input_name: blob})[0]
+            for i, item in zip(batch, ctc_decode(probs, self.characters)):
+                result[i] = item
+        return result
+
+
+def load_characters(session, dict_path=None):
+    """字符表：优先读取dict_path（每行一个字符），否则取模型元数据中的character；首位补空白，末位补空格"""
+    if dict_path:
+        with open(dict_path, 'r', encoding='utf-8') as f:
+            chars = [line.rstrip('\r\n') for line in f]
+    else:
+        meta = session.get_modelmeta().custom_metadata_map
+        if 'character' not in meta:
+            raise ValueError("识别模型中没有字符表，请指定rec_char_dict_path")
+        chars = meta['character'].splitlines()
+    return np.array(['', *chars, ' '], dtype=object)
+
+
+class OnnxOcr:
+    """
+    det + cls + rec 三个模型（由OnnxOcrEngine加载和调用）
+    2025-02-26 只提供检测和识别两步，检测→切图→识别的流程统一在OcrEngine._iter_lines中
+    """
+
+    def __init__(self, det, rec, cls=None):
+        self.det = det
+        self.rec = rec
+        self.cls = cls
+
+    def detect(self, img):
+        return self.det(img)
+
+    def recognize(self, crops, cls=True):
+        if cls and self.cls is not None:
+            crops = self.cls(crops)
+        return self.rec(crops)
+
+
+class OnnxOcrEngine(OcrEngine):
+    """
+    PP-OCRv4 ONNX模型 + ONNX Runtime CPU推理，线程数可调；接口与其他后端相同
+    2025-02-19 precision为int8-dynamic/int8-static时det、rec使用量化模型（见ocr_quant.py），cls模型很小，始终为FP32
+    """
+    name = "onnx"
+    capabilities = frozenset({"det", "rec", "cls", "batch_rec", "int8", "parallel_det", "pooled_rec"})
+    default_params = {
+        "det_model": DET_MODEL,
+        "rec_model": REC_MODEL,
+        "cls_model": CLS_MODEL,
+        "model_dir": None,
+        "rec_char_dict_path": None,
+        "use_angle_cls": True,
+        "intra_threads": 0,
+        "inter_threads": 0,
+        "det_limit_side_len": 960,
+        "det_limit_type": "max",
+        "det_db_thresh": 0.3,
+        "det_db_box_thresh": 0.6,
+        "det_db_unclip_ratio": 1.5,
+        "use_dilation": False,
+        "rec_batch_num": 6,
+        "drop_score": 0.5,
+        "precision": "fp32",
+        "calibration_dir": "input",
+    }
+    settings_keys = {"ocr_threads": "intra_threads", "ocr_precision": "precision", "rec_batch_size": "rec_batch_num"}
+    # 多进程批量识别时按进程数分配的线程参数
+    thread_param = "intra_threads"
+
+    @classmethod
+    def available(cls):
+        return (importlib.util.find_spec("onnxruntime") is not None
+                and find_model(DET_MODEL) is not None and find_model(REC_MODEL) is not None)
+
+    def __init__(self, cache=None, **params):
+        super().__init__(cache, **params)
+        self.params = self._checked_precision(self.params)
+
+    @staticmethod
+    def _checked_precision(params):
+        """2025-02-26 静态量化没有校准图片时改用动态量化，不等到加载模型时才报错"""
+        if params.get("precision") != "int8-static":
+            return params
+        from ocr_quant import calibration_images
+        if calibration_images(params.get("calibration_dir")):
+            return params
+        print(f"静态量化需要校准图片，{params.get('calibration_dir')} 中没有图片，改用 int8-dynamic", file=sys.stderr)
+        return dict(params, precision="int8-dynamic")
+
+    def configure(self, **params):
+        params = self._checked_precision(dict(self.params, **params))
+        return super().configure(**params)
+
+    def model_path(self, key):
+        """FP32模型文件的路径"""
+        path = find_model(self.params[key], self.params.get("model_dir"))
+        if path is None:
+            raise FileNotFoundError(f"找不到模型文件 {self.params[key]}（查找目录：{model_dirs(self.params.get('model_dir'))}）")
+        return path
+
+    def inference_path(self, key):
+        """推理使用的模型文件，量化精度下det、rec为量化模型（首次使用时生成）"""
+        path = self.model_path(key)
+        precision = self.params.get("precision", "fp32")
+        if precision == "fp32" or key not in ("det_model", "rec_model"):
+            return path
+        from ocr_quant import ensure_quantized
+        return ensure_quantized(path, precision, key[:3], self.params["calibration_dir"], params=self.params)
+
+    def model_signature(self, key):
+        """模型文件的签名（见file_signature），找不到时为None"""
+        return file_signature(find_model(self.params[key], self.params.get("model_dir")))
+
+    def _load(self):
+        p = self.params
+        rss_before = current_rss()
+        start = time.perf_counter()
+
+        def session(key):
+            return make_session(self.inference_path(key), p["intra_threads"], p["inter_threads"])
+
+        det = DbDetector(session("det_model"), p["det_limit_side_len"], p["det_limit_type"], p["det_db_thresh"],
+                         p["det_db_box_thresh"], p["det_db_unclip_ratio"], p["use_dilation"])
+        rec_session = session("rec_model")
+        rec = CtcRecognizer(rec_session, load_characters(rec_session, p["rec_char_dict_path"]),
+                            batch_size=p["rec_batch_num"])
+        cls = AngleClassifier(session("cls_model")) if p["use_angle_cls"] else None
+        model = OnnxOcr(det, rec, cls)
+        self.load_seconds = time.perf_counter() - start
+        rss_after = current_rss()
+        if rss_before is not None and rss_after is not None:
+            self.load_rss_delta = rss_after - rss_before
+        self.load_count += 1
+        return model
+
+    def model_config(self, cls=True):
+        try:
+            from importlib.metadata import version
+            runtime_version = version("onnxruntime")
+        except Exception:
+            runtime_version = None
+        p = self.params
+        # 线程数不影响识别结果，不计入缓存键（批大小见cache_config）
+        config = {
+            "engine": self.name,
+            "version": runtime_version,
+            "det_model": self.model_signature("det_model"),
+            "rec_model": self.model_signature("rec_model"),
+            "cls_model": self.model_signature("cls_model") if p["use_angle_cls"] else None,
+            "rec_char_dict": file_signature(p["rec_char_dict_path"]),
+            "det": [p["det_limit_side_len"], p["det_limit_type"], p["det_db_thresh"], p["det_db_box_thresh"],
+                    p["det_db_unclip_ratio"], p["use_dilation"]],
+            "drop_score": p["drop_score"],
+            "precision": p["precision"],
+            "cls": cls,
+        }
+        # 2025-02-26 量化模型重新生成（换了校准图片等）后，之前的识别结果不再命中
+        if p["precision"] != "fp32":
+            config["quantized"] = [file_signature(self.inference_path(key)) for key in ("det_model", "rec_model")]
+        return config
+
+    @staticmethod
+    def _image(img):
+        return to_bgr(load_image(img) if isinstance(img, str) else img)
+
+    def _infer_det(self, model, img):
+        return model.detect(self._image(img))
+
+    def _infer_rec(self, model, crops, cls):
+        return model.recognize([to_bgr(crop) for crop in crops], cls)
+
+    def drop_score(self):
+        return self.params["drop_score"]
@@ -0,0 +1,216 @@
+# coding:utf-8
+# 2025-01-13 无界面的识别流水线：与“应用”页面相同的识别、置信度标记、切图和装订逻辑
+# 不导入PySide6/qfluentwidgets，可在服务器上直接运行：
+#   python ocr_pipeline.py input/ "history_img/*.png" --crops history_img --binding binding/book -o result.jsonl
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from dataclasses import dataclass, field
+
+import cv2
+
+from ocr_batch import IMAGE_EXTS, list_images, recognize_folder, resolve_workers, write_binding
+from ocr_crop import PageCrops, load_image
+from ocr_backends import ocrBackends
+from rec_scheduler import recognize_pages
+
+
+@dataclass
+class OcrPageResult:
+    img_path: str
+    # 每行为 (box, text, score)，box为四个点的坐标
+    lines: list = field(default_factory=list)
+    crop_paths: list = field(default_factory=list)
+    # 2025-01-17 解码后的整页图像，以及每行的切图（PageCrops）
+    image: object = None
+    crops: object = field(default_factory=list)
+    # 2025-02-24 识别这一页的耗时（秒），多页合并识别时识别时间按行数分摊
+    seconds: float = None
+
+    @property
+    def text(self):
+        return page_text(self.lines)
+
+
+def load_settings(settings_file='settings'):
+    """读取settings文件，文件不存在时返回空字典"""
+    if not os.path.exists(settings_file):
+        return {}
+    with open(settings_file, 'r') as json_file:
+        return json.load(json_file)
+
+
+def page_text(lines):
+    """将识别结果拼接成一个字符串，每行一条"""
+    return "".join(line[1] + "\n" for line in lines)
+
+
+def flag_lines(lines, confidence):
+    """置信度低于阈值的行需要人工复核，返回与lines对应的布尔列表"""
+    return [line[2] < confidence for line in lines]
+
+
+def recognize_image(img_path, engine=None):
+    start = time.perf_counter()
+    lines = (engine or ocrBackends.current).recognize(img_path)
+    return OcrPageResult(img_path, lines, seconds=time.perf_counter() - start)
+
+
+def crop_views(img, lines):
+    """
+    2025-01-20 按四点框做透视校正切图，返回PageCrops（按下标取用时才渲染）
+    与图像边平行的框仍然是整页图像上的视图，不复制像素
+    """
+    return PageCrops(img, [line[0] for line in lines])
+
+
+def crop_dir(img_path, crop_root='history_img'):
+    return f'{crop_root}/{os.path.splitext(os.path.basename(img_path))[0]}'
+
+
+def write_crops(crops, crop_img_dir):
+    """将切图保存为 crop_img_dir/cropped_serial_N.jpg，逐个返回保存路径"""
+    os.makedirs(crop_img_dir, exist_ok=True)
+    for i, crop_img in enumerate(crops):
+        crop_img_serial = f'{crop_img_dir}/cropped_serial_{i + 1}.jpg'
+        if crop_img.size:
+            # imwrite不支持中文路径，先编码再写文件
+            cv2.imencode('.jpg', crop_img)[1].tofile(crop_img_serial)
+        yield crop_img_serial
+
+
+def export_crops(img_path, lines, crop_root='history_img', img=None):
+    """按det坐标切割图片并保存到 crop_root/<图片名>/cropped_serial_N.jpg，逐个返回保存路径"""
+    if img is None:
+        img = load_image(img_path)
+    yield from write_crops(crop_views(img, lines), crop_dir(img_path, crop_root))
+
+
+def bind_image(img_path, binding_path):
+    """装订图片：复制为 binding_path 同名的png"""
+    binding_img_path = binding_path.rsplit('.', 1)[0] + '.png'
+    shutil.copy(img_path, binding_img_path)
+    return binding_img_path
+
+
+def bind_text(text, binding_path):
+    """装订文本：写入 binding_path 同名的txt"""
+    binding_txt_path = binding_path.rsplit('.', 1)[0] + '.txt'
+    with open(binding_txt_path, 'w', encoding='utf-8') as txt:
+        txt.write(text)
+    return binding_txt_path
+
+
+def expand_inputs(inputs):
+    """展开文件、文件夹和通配符，按出现顺序去重后返回图片路径列表"""
+    img_paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            img_paths.extend(list_images(item))
+        elif glob.has_magic(item):
+            img_paths.extend(sorted(path for path in glob.glob(item, recursive=True) if path.lower().endswith(IMAGE_EXTS)))
+        else:
+            img_paths.append(item)
+    return list(dict.fromkeys(img_paths))
+
+
+def iter_pages(img_paths, workers=1, engine=None):
+    """逐页识别，workers（<=0为按CPU核数）不止一个时使用进程池，否则在本进程中识别；返回 OcrPageResult"""
+    if len(img_paths) <= 1:
+        for img_path in img_paths:
+            yield recognize_image(img_path, engine)
+        return
+    engine = engine or ocrBackends.current
+    if resolve_workers(workers, len(img_paths)) == 1:
+        # 2025-02-20 多页的文本行合在一起分桶识别
+        for img_path, lines, _, seconds in recognize_pages(engine, img_paths):
+            yield OcrPageResult(img_path, lines, seconds=seconds)
+    else:
+        for img_path, lines, seconds in recognize_folder(img_paths, workers, engine.params, engine.cache, type(engine),
+                                                         engine.record_rec_stats, engine.det_tile_size):
+            yield OcrPageResult(img_path, lines, seconds=seconds)
+
+
+def run(inputs, settings=None, crop_root=None, binding_dir=None, workers=1):
+    """
+    无界面识别，逐页返回可写为JSONL的字典：
+        image   图片路径
+        text    识别出的文本，每行一条
+        lines   [{"box": 四点坐标, "text", "score", "flagged": 是否低于置信度阈值}, ...]
+        flagged 需要复核的行数
+        crops   导出的切图路径
+        elapsed 识别这一页的耗时（秒）；多页合并识别时含本页的读图和检测，以及按行数分摊的识别时间，
+                多进程时为子进程中的耗时，各页之和不等于总耗时
+    :param inputs: 文件、文件夹或通配符
+    :param settings: settings字典，使用其中的confidence和ocr_device
+    :param crop_root: 不为None时导出切图
+    :param binding_dir: 不为None时将全部页面一次性装订到该目录
+    :param workers: 进程数，1为当前进程，0为按CPU核数自动
+    """
+    settings = settings or {}
+    confidence = settings.get('confidence', 1.0)
+    ocrBackends.apply_settings(settings)
+    pages = []
+    for page in iter_pages(expand_inputs(inputs), workers):
+        if crop_root is not None:
+            page.crop_paths = list(export_crops(page.img_path, page.lines, crop_root))
+        pages.append((page.img_path, page.text))
+        flags = flag_lines(page.lines, confidence)
+        yield {
+            "image": page.img_path,
+            "text": page.text,
+            "lines": [{"box": [[float(x), float(y)] for x, y in box], "text": text, "score": float(score), "flagged": flag}
+                      for (box, text, score), flag in zip(page.lines, flags)],
+            "flagged": sum(flags),
+            "crops": page.crop_paths,
+            "elapsed": round(page.seconds, 3),
+        }
+    if binding_dir is not None and pages:
+        write_binding(pages, binding_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="无界面OCR识别，结果以JSONL逐页输出")
+    parser.add_argument("inputs", nargs="+", help="图片文件、文件夹或通配符")
+    parser.add_argument("--settings", default="settings", help="settings文件路径")
+    parser.add_argument("--confidence", type=float, help="置信度阈值，默认取settings中的confidence")
+    parser.add_argument("--device", help="cpu或gpu，默认取settings中的ocr_device")
+    parser.add_argument("--backend", help="识别后端（python ocr_backends.py list），默认取settings中的ocrs")
+    parser.add_argument("--crops", metavar="DIR", help="导出切图到DIR/<图片名>/")
+    parser.add_argument("--binding", metavar="DIR", help="将全部页面的图片和txt装订到DIR")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="识别进程数，0为按CPU核数自动")
+    parser.add_argument("-o", "--output", help="JSONL输出文件，默认输出到标准输出")
+    parser.add_argument("--no-cache", action="store_true", help="不使用识别结果缓存")
+    args = parser.parse_args(argv)
+
+    settings = load_settings(args.settings)
+    if args.confidence is not None:
+        settings['confidence'] = args.confidence
+    if args.device:
+        settings['ocr_device'] = args.device
+    if args.backend:
+        settings['ocrs'] = args.backend
+    if args.no_cache:
+        settings['ocr_cache'] = False
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for record in run(args.inputs, settings, args.crops, args.binding, args.workers):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if ocrBackends.current.cache is not None:
+        print(f"cache: {json.dumps(ocrBackends.current.cache.stats())}", file=sys.stderr)
+    if ocrBackends.current.rec_stats is not None:
+        print(f"rec: {json.dumps(ocrBackends.current.rec_stats.as_dict())}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
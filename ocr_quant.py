@@ -0,0 +1,348 @@
+# coding:utf-8
+# 2025-02-19 INT8量化模型：ONNX后端（ocr_onnx.py）可改用动态或静态量化的det/rec模型，设置页“模型精度”中选择
+# 量化模型首次使用时由FP32模型生成，保存在cache/onnx_int8/；静态量化用input/中的样张校准，
+# 生成时的原模型、校准图片和校准参数记录在同名.json中，任一变化时重新生成
+# 对比FP32与INT8的速度、内存和准确率：
+#   python ocr_quant.py compare input/                     每种精度在单独的进程中识别，报告每页耗时、峰值内存、字符准确率差
+#   python ocr_quant.py build int8-static --calibration input/   预先生成量化模型
+import argparse
+import difflib
+import hashlib
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+from ocr_engine import current_rss
+
+# settings中"ocr_precision"的取值 -> 设置页显示的名称
+PRECISIONS = {
+    "fp32": "FP32（原始模型）",
+    "int8-dynamic": "INT8 动态量化",
+    "int8-static": "INT8 静态量化",
+}
+QUANT_DIR = 'cache/onnx_int8'
+CALIBRATION_DIR = 'input'
+# 静态量化最多用多少张图片校准（校准时保存全部中间结果，图片越多越占内存）
+CALIBRATION_LIMIT = 16
+# 动态量化的算子：识别模型的卷积量化为ConvInteger后大部分字符识别错误，只量化其MatMul
+DYNAMIC_OPS = {"det": ["Conv", "MatMul"], "rec": ["MatMul"]}
+
+
+def quantization_available():
+    """量化需要onnx包（onnxruntime.quantization依赖它），只用FP32模型时不需要"""
+    import importlib.util
+    return importlib.util.find_spec("onnx") is not None and importlib.util.find_spec("onnxruntime") is not None
+
+
+def precision_names():
+    """设置页中可选的精度，未安装onnx时只有FP32"""
+    if quantization_available():
+        return list(PRECISIONS.values())
+    return [PRECISIONS["fp32"]]
+
+
+def precision_key(name):
+    """设置页显示的名称 -> settings中的取值，未知名称为fp32"""
+    for key, value in PRECISIONS.items():
+        if name in (key, value):
+            return key
+    return "fp32"
+
+
+def quantized_path(model_path, precision, quant_dir=QUANT_DIR):
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(quant_dir, f"{stem}.{precision}.onnx")
+
+
+def calibration_images(calibration_dir, limit=CALIBRATION_LIMIT):
+    """静态量化的校准图片：文件夹中按文件名排序的前limit张，文件夹不存在时为空"""
+    from ocr_batch import list_images
+    if not calibration_dir or not os.path.isdir(calibration_dir):
+        return []
+    return list_images(calibration_dir)[:limit]
+
+
+def calibration_engine(params=None):
+    """校准用的FP32引擎：与被量化的引擎参数相同（模型文件、检测预处理），不做方向分类"""
+    from ocr_onnx import OnnxOcrEngine
+    return OnnxOcrEngine(**dict(params or {}, precision="fp32", use_angle_cls=False))
+
+
+def quantization_record(model_path, precision, calibration=(), params=None):
+    """
+    2025-02-26 生成量化模型所用的输入，保存在量化模型旁（同名.json），不一致时重新生成：
+    原模型的文件签名；静态量化另有校准图片的签名和校准引擎配置（模型、检测预处理参数）的哈希
+    """
+    from ocr_onnx import file_signature
+    record = {"model": file_signature(model_path), "precision": precision}
+    if precision == "int8-static":
+        data = json.dumps([[file_signature(path) for path in calibration], calibration_engine(params).model_config(False)],
+                          sort_keys=True, default=str)
+        record["calibration"] = hashlib.sha1(data.encode('utf-8')).hexdigest()
+    return record
+
+
+def record_path(output_path):
+    return os.path.splitext(output_path)[0] + '.json'
+
+
+def read_record(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def calibration_inputs(kind, img_paths, limit=CALIBRATION_LIMIT, params=None):
+    """
+    静态量化的校准数据：与推理时相同的预处理结果 [{输入名: 数组}, ...]
+    det为整页图像，rec为FP32模型检测出的文本行切图；params为被量化引擎的参数
+    """
+    from ocr_crop import PageCrops, load_image, to_bgr
+    from ocr_onnx import resize_norm
+    engine = calibration_engine(params)
+    model = engine.get()
+    inputs = []
+    for img_path in img_paths[:limit]:
+        img = to_bgr(load_image(img_path))
+        if kind == "det":
+            inputs.append({model.det.input_name: model.det.preprocess(img)})
+            continue
+        rec = model.rec
+        for crop in PageCrops(img, engine.detect(img), rotate_vertical=True):
+            width = rec.padded_width(rec.classes([crop])[0])
+            inputs.append({rec.input_name: resize_norm(crop, rec.height, width)[None]})
+    return inputs
+
+
+def quantize_model(model_path, output_path, precision, kind, calibration=(), params=None):
+    """
+    生成量化模型：先做常量折叠等预处理（paddle2onnx导出的部分卷积权重不是常量，不能直接量化），再量化
+    :param kind: "det"或"rec"
+    :param calibration: 静态量化的校准图片
+    :param params: 被量化引擎的参数，校准时按相同的模型和预处理生成输入
+    """
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic,
+                                          quantize_static)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    class Reader(CalibrationDataReader):
+        def __init__(self, inputs):
+            self.inputs = iter(inputs)
+
+        def get_next(self):
+            return next(self.inputs, None)
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    # 先写临时文件，多个进程同时生成时不会读到写了一半的模型
+    pre_path = f"{output_path}.{os.getpid()}.pre"
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        quant_pre_process(model_path, pre_path, skip_symbolic_shape=True)
+        if precision == "int8-dynamic":
+            quantize_dynamic(pre_path, tmp_path, weight_type=QuantType.QUInt8, op_types_to_quantize=DYNAMIC_OPS[kind])
+        elif precision == "int8-static":
+            if not calibration:
+                raise ValueError("静态量化需要校准图片")
+            inputs = calibration_inputs(kind, list(calibration), len(calibration), params)
+            quantize_static(pre_path, tmp_path, Reader(inputs),
+                            quant_format=QuantFormat.QOperator, per_channel=True,
+                            weight_type=QuantType.QInt8, activation_type=QuantType.QUInt8)
+        else:
+            raise ValueError(f"未知的精度 {precision}")
+        os.replace(tmp_path, output_path)
+    finally:
+        for path in (pre_path, tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return output_path
+
+
+def ensure_quantized(model_path, precision, kind, calibration_dir=CALIBRATION_DIR, quant_dir=QUANT_DIR, params=None,
+                     limit=CALIBRATION_LIMIT):
+    """
+    返回量化模型的路径；不存在，或原模型、校准图片、校准参数与生成时不同（见quantization_record）时重新生成
+    :param params: 被量化引擎的参数
+    """
+    output_path = quantized_path(model_path, precision, quant_dir)
+    calibration = calibration_images(calibration_dir, limit) if precision == "int8-static" else []
+    record = quantization_record(model_path, precision, calibration, params)
+    if os.path.exists(output_path) and read_record(record_path(output_path)) == record:
+        return output_path
+    print(f"quantizing {os.path.basename(model_path)} ({precision})", file=sys.stderr)
+    quantize_model(model_path, output_path, precision, kind, calibration, params)
+    with open(record_path(output_path), 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False)
+    return output_path
+
+
+# ---- FP32 / INT8 对比 ----
+def peak_rss():
+    """本进程的峰值常驻内存（字节）"""
+    # Linux下getrusage的峰值会从父进程继承（spawn也是fork+exec），优先读取/proc中的VmHWM
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS为字节
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        return current_rss()
+
+
+def char_accuracy(text, reference):
+    """字符准确率：1 - 编辑距离/参考文本长度（忽略换行），不低于0"""
+    a, b = text.replace("\n", ""), reference.replace("\n", "")
+    if not b:
+        return 1.0 if not a else 0.0
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    errors = sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal')
+    return max(0.0, 1 - errors / len(b))
+
+
+def _run_precision(precision, img_paths, params, repeat):
+    """在单独的进程中运行，峰值内存只包含本精度的模型"""
+    from ocr_onnx import OnnxOcrEngine
+    from ocr_pipeline import page_text
+    engine = OnnxOcrEngine(precision=precision, **params)
+    start = time.perf_counter()
+    engine.get()
+    load_seconds = time.perf_counter() - start
+    engine.recognize(img_paths[0])
+    timings, texts = [], []
+    for img_path in img_paths:
+        page_timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            lines = engine.recognize(img_path)
+            page_timings.append(time.perf_counter() - start)
+        timings.append(statistics.median(page_timings))
+        texts.append(page_text(lines))
+    return {"load_seconds": load_seconds, "timings": timings, "texts": texts, "peak_rss": peak_rss()}
+
+
+def ground_truth(img_path):
+    """与图片同名的txt为人工校对的文本，没有时返回None"""
+    txt_path = os.path.splitext(img_path)[0] + '.txt'
+    try:
+        with open(txt_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def compare(img_paths, precisions=tuple(PRECISIONS), params=None, repeat=1):
+    """
+    依次用各精度识别img_paths，返回每种精度的每页耗时、峰值内存和字符准确率
+    准确率以同名txt为参考；没有txt的页以FP32的结果为参考
+    """
+    params = params or {}
+    from ocr_onnx import OnnxOcrEngine
+    # 先生成量化模型，不计入加载时间
+    probe = OnnxOcrEngine(**params)
+    for precision in precisions:
+        if precision != "fp32":
+            for key, kind in (("det_model", "det"), ("rec_model", "rec")):
+                ensure_quantized(probe.model_path(key), precision, kind, probe.params["calibration_dir"],
+                                 params=dict(probe.params, precision=precision))
+    ctx = multiprocessing.get_context("spawn")
+    runs = {}
+    for precision in precisions:
+        with ctx.Pool(1) as pool:
+            runs[precision] = pool.apply(_run_precision, (precision, img_paths, params, repeat))
+    baseline = runs.get("fp32") or next(iter(runs.values()))
+    references = [ground_truth(img_path) for img_path in img_paths]
+    references = [ref if ref is not None else text for ref, text in zip(references, baseline["texts"])]
+    report = {"pages": list(img_paths), "ground_truth": sum(ground_truth(p) is not None for p in img_paths),
+              "precisions": {}}
+    for precision, run in runs.items():
+        accuracy = [char_accuracy(text, ref) for text, ref in zip(run["texts"], references)]
+        report["precisions"][precision] = {
+            "load_seconds": round(run["load_seconds"], 3),
+            "page_ms": [round(t * 1000, 1) for t in run["timings"]],
+            "page_mean_ms": round(statistics.mean(run["timings"]) * 1000, 1),
+            "peak_rss_mb": round(run["peak_rss"] / (1 << 20), 1) if run["peak_rss"] else None,
+            "accuracy": [round(a, 4) for a in accuracy],
+            "accuracy_mean": round(statistics.mean(accuracy), 4),
+        }
+    fp32 = report["precisions"].get("fp32")
+    for result in report["precisions"].values():
+        if fp32 is not None:
+            result["speedup"] = round(fp32["page_mean_ms"] / result["page_mean_ms"], 2)
+            result["accuracy_delta"] = round(result["accuracy_mean"] - fp32["accuracy_mean"], 4)
+    return report
+
+
+def print_report(report, file=sys.stdout):
+    reference = "人工校对文本" if report["ground_truth"] == len(report["pages"]) else "FP32识别结果（无同名txt的页）"
+    print(f"{len(report['pages'])} pages, 准确率参考: {reference}", file=file)
+    print(f"{'precision':<14}{'load s':>8}{'page ms':>10}{'speedup':>9}{'peak MB':>9}{'accuracy':>10}{'delta':>9}",
+          file=file)
+    for precision, r in report["precisions"].items():
+        peak = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "-"
+        print(f"{precision:<14}{r['load_seconds']:>8.2f}{r['page_mean_ms']:>10.1f}{r.get('speedup', 1):>8.2f}x"
+              f"{peak:>9}{r['accuracy_mean']:>10.2%}{r.get('accuracy_delta', 0):>+9.2%}", file=file)
+    print("每页耗时(ms):", file=file)
+    for i, page in enumerate(report["pages"]):
+        cells = "  ".join(f"{precision} {r['page_ms'][i]:.0f} ({r['accuracy'][i]:.1%})"
+                          for precision, r in report["precisions"].items())
+        print(f"  {os.path.basename(page)}: {cells}", file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ONNX模型INT8量化与对比")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="生成量化模型")
+    build.add_argument("precision", choices=[p for p in PRECISIONS if p != "fp32"])
+    build.add_argument("--calibration", default=CALIBRATION_DIR, help="静态量化的校准图片文件夹")
+    cmp_parser = sub.add_parser("compare", help="对比FP32与INT8的每页耗时、峰值内存和字符准确率")
+    cmp_parser.add_argument("inputs", nargs="+", help="图片文件、文件夹或通配符")
+    cmp_parser.add_argument("-p", "--precision", action="append", choices=list(PRECISIONS),
+                            help="参与对比的精度，默认为全部")
+    cmp_parser.add_argument("-r", "--repeat", type=int, default=1, help="每页重复识别次数（取中位数）")
+    cmp_parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime推理线程数，0为默认")
+    cmp_parser.add_argument("--calibration", default=CALIBRATION_DIR, help="静态量化的校准图片文件夹")
+    cmp_parser.add_argument("-o", "--output", help="把结果保存为JSON")
+    args = parser.parse_args(argv)
+
+    if not quantization_available():
+        print("需要安装onnx：pip install onnx", file=sys.stderr)
+        return 1
+    if args.command == "build":
+        from ocr_onnx import OnnxOcrEngine
+        engine = OnnxOcrEngine(calibration_dir=args.calibration)
+        for key, kind in (("det_model", "det"), ("rec_model", "rec")):
+            print(ensure_quantized(engine.model_path(key), args.precision, kind, args.calibration, params=engine.params))
+        return 0
+
+    from ocr_pipeline import expand_inputs
+    img_paths = expand_inputs(args.inputs)
+    if not img_paths:
+        print("no images", file=sys.stderr)
+        return 1
+    params = {"intra_threads": args.threads, "calibration_dir": args.calibration}
+    report = compare(img_paths, args.precision or tuple(PRECISIONS), params, args.repeat)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# coding:utf-8
+# 2025-01-08 在线程池中执行OCR识别，避免模型加载和推理阻塞界面
+import itertools
+import sys
+import threading
+
+from PySide6.QtCore import QRunnable, QThreadPool
+
+from ocr_backends import ocrBackends
+from ocr_pipeline import OcrPageResult, crop_dir, crop_views, iter_pages, load_image, write_crops
+from signal_bus import signalBus
+
+
+class OcrJob(QRunnable):
+    """
+    单张图片的识别任务，通过signalBus发出 started/progress/partial/finished 信号，结果为OcrPageResult
+    partial信号逐批发出，每次只包含新识别出的行
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, img_path, crop_root='history_img', export=True):
+        super().__init__()
+        self.job_id = next(self._ids)
+        self.img_path = img_path
+        self.crop_root = crop_root
+        # 是否把切图另存到磁盘（在后台进行，不影响预览）
+        self.export = export
+        self._cancelled = threading.Event()
+        # 任务结束后由调用方持有，不交给线程池自动删除
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def start(self, pool=None):
+        (pool or QThreadPool.globalInstance()).start(self)
+        return self
+
+    def run(self):
+        signalBus.ocrStarted.emit(self.job_id)
+        try:
+            result = self.recognize()
+        except Exception as e:
+            signalBus.ocrFailed.emit(self.job_id, str(e))
+            return
+        if result is None:
+            signalBus.ocrCancelled.emit(self.job_id)
+        else:
+            signalBus.ocrFinished.emit(self.job_id, result)
+
+    def recognize(self):
+        # 2025-01-17 整页只解码一次，每行切图在选择ComboBox时才从整页图像渲染
+        result = OcrPageResult(self.img_path, image=load_image(self.img_path))
+        # 2025-01-24 先检测再分批识别，每批结果为只含新增行的OcrPageResult，界面逐批追加
+        for lines, done, total in ocrBackends.current.iter_recognize(self.img_path, result.image):
+            if self.cancelled:
+                return None
+            result.lines.extend(lines)
+            signalBus.ocrPartialResult.emit(self.job_id, OcrPageResult(self.img_path, lines, image=result.image))
+            signalBus.ocrProgress.emit(self.job_id, done, total)
+        result.crops = crop_views(result.image, result.lines)
+        if self.export and result.crops:
+            CropExportJob(result.crops, crop_dir(self.img_path, self.crop_root)).start()
+        return result
+
+
+class CropExportJob(QRunnable):
+    """在后台把切图写入 history_img/<图片名>/"""
+
+    def __init__(self, crops, crop_img_dir):
+        super().__init__()
+        self.crops = crops
+        self.crop_img_dir = crop_img_dir
+
+    def start(self, pool=None):
+        (pool or QThreadPool.globalInstance()).start(self)
+
+    def run(self):
+        try:
+            for _ in write_crops(self.crops, self.crop_img_dir):
+                pass
+        except Exception as e:
+            print(f"Error exporting crops to {self.crop_img_dir}: {e}", file=sys.stderr)
+
+
+class OcrBatchJob(OcrJob):
+    """文件夹批量识别任务，逐页发出ocrPartialResult(OcrPageResult)，结束时发出全部页面结果"""
+
+    def __init__(self, img_paths, workers=0):
+        super().__init__(None)
+        self.img_paths = list(img_paths)
+        self.workers = workers
+
+    def recognize(self):
+        total = len(self.img_paths)
+        signalBus.ocrProgress.emit(self.job_id, 0, total)
+        results = []
+        # 2025-02-17 各进程使用当前选择的后端
+        # 2025-02-26 只用一个进程时在本进程中用已加载的引擎识别，不启动进程池（spawn的子进程会重新导入界面主模块）
+        pages = iter_pages(self.img_paths, self.workers, ocrBackends.current)
+        try:
+            for page in pages:
+                if self.cancelled:
+                    return None
+                results.append(page)
+                signalBus.ocrPartialResult.emit(self.job_id, page)
+                signalBus.ocrProgress.emit(self.job_id, len(results), total)
+        finally:
+            # 关闭生成器即终止进程池
+            pages.close()
+        return results
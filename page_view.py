@@ -0,0 +1,228 @@
+# coding:utf-8
+# 2025-02-05 阅读页图片查看：金字塔的块直接作为QGraphicsPixmapItem放进pyqtgraph的ViewBox
+# 只加载可见区域在当前缩放比例下需要的层和块，不再把整张原图转换成数组、翻转后交给ImageItem
+import itertools
+import sys
+import threading
+from collections import OrderedDict
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Qt
+from PySide6.QtGui import QPixmap
+from PySide6.QtWidgets import QGraphicsPixmapItem
+
+from image_pyramid import ImagePyramid, prune_pyramids
+from image_utils import ndarray_to_qimage
+from signal_bus import signalBus
+
+
+class PyramidBuildJob(QRunnable):
+    """在后台生成金字塔，完成后发出signalBus.pyramidReady(原图路径)"""
+
+    def __init__(self, pyramid):
+        super().__init__()
+        self.pyramid = pyramid
+
+    def start(self, pool=None):
+        (pool or QThreadPool.globalInstance()).start(self)
+
+    def run(self):
+        try:
+            self.pyramid.build()
+            prune_pyramids(self.pyramid.cache_dir)
+        except Exception as e:
+            print(f"Error building image pyramid for {self.pyramid.img_path}: {e}", file=sys.stderr)
+            signalBus.pyramidFailed.emit(self.pyramid.img_path, str(e))
+            return
+        signalBus.pyramidReady.emit(self.pyramid.img_path)
+
+
+class TileCache:
+    """
+    2025-02-07 预读得到的块（QImage），按字节数限制的LRU，可在后台线程写入
+    键为 (金字塔key, 层, 行, 列)
+    """
+
+    def __init__(self, max_bytes=128 << 20):
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._images
+
+    def get(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            if key in self._images:
+                return
+            self._images[key] = image
+            self._bytes += image.sizeInBytes()
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                self._bytes -= self._images.popitem(last=False)[1].sizeInBytes()
+
+
+class PrefetchJob(QRunnable):
+    """
+    在后台为相邻的页面生成金字塔，并把整页显示时需要的块解码成QImage放入TileCache
+    翻页时直接命中缓存，只需上传为QPixmap
+    """
+    _generations = itertools.count(1)
+    current = 0
+
+    def __init__(self, img_paths, view_size, cache):
+        super().__init__()
+        self.img_paths = img_paths
+        self.view_size = view_size
+        self.cache = cache
+        # 每次打开新页面都会发起新的预读，旧的预读在处理下一页前发现过期即停止
+        self.generation = next(self._generations)
+        PrefetchJob.current = self.generation
+
+    def start(self, pool=None):
+        (pool or QThreadPool.globalInstance()).start(self)
+
+    def run(self):
+        for img_path in self.img_paths:
+            if self.generation != PrefetchJob.current:
+                return
+            try:
+                pyramid = ImagePyramid(img_path)
+                pyramid.build()
+                top = pyramid.levels - 1
+                levels = {top, pyramid.fit_level(*self.view_size)}
+                for level in sorted(levels, reverse=True):
+                    for ty, tx in pyramid.tiles_in(level, 0, 0, pyramid.width, pyramid.height):
+                        key = (pyramid.key, level, ty, tx)
+                        if key not in self.cache:
+                            self.cache.put(key, ndarray_to_qimage(pyramid.tile(level, ty, tx)))
+            except Exception as e:
+                print(f"Error prefetching {img_path}: {e}", file=sys.stderr)
+
+
+class PyramidView(QObject):
+    """
+    在view_box中显示一页金字塔：最顶层作为底图常驻，放大后在其上叠加所需层的块
+    :param view_box: pyqtgraph.ViewBox
+    :param max_tiles: 内存中最多保留多少个块的QPixmap
+    :param prefetch: 打开一页时在后台预读前后各几页
+    """
+
+    def __init__(self, view_box, max_tiles=64, prefetch=2, parent=None):
+        super().__init__(parent)
+        self.prefetch = prefetch
+        self.tile_cache = TileCache()
+        self.view_box = view_box
+        # 图像坐标y轴向下，与原图一致，无需翻转
+        self.view_box.invertY(True)
+        self.pyramid = None
+        self.max_tiles = max_tiles
+        self._pixmaps = OrderedDict()  # (层, 行, 列) -> QPixmap
+        self._items = {}  # (层, 行, 列) -> 已加入view_box的QGraphicsPixmapItem
+        # 缩放/平移时合并连续的变化，停下后再更新块
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(50)
+        self._timer.timeout.connect(self.update_tiles)
+        self.view_box.sigRangeChanged.connect(self._timer.start)
+        signalBus.pyramidReady.connect(self.on_pyramid_ready)
+
+    def setImage(self, img_path, neighbours=()):
+        """
+        显示img_path，金字塔未生成时先在后台生成
+        :param neighbours: 同一本书中按顺序排列的全部页面，用于预读img_path前后的页
+        """
+        pyramid = ImagePyramid(img_path)
+        self.clear()
+        self.pyramid = pyramid
+        if pyramid.built:
+            pyramid.touch()
+            self.show_pyramid()
+        else:
+            PyramidBuildJob(pyramid).start()
+        self.prefetch_neighbours(img_path, list(neighbours))
+
+    def prefetch_neighbours(self, img_path, pages):
+        if self.prefetch <= 0 or img_path not in pages:
+            return
+        i = pages.index(img_path)
+        # 先预读后面的页（通常向后翻），再预读前面的页
+        paths = pages[i + 1:i + 1 + self.prefetch] + pages[max(i - self.prefetch, 0):i][::-1]
+        if paths:
+            view_size = (self.view_box.width(), self.view_box.height())
+            PrefetchJob(paths, view_size, self.tile_cache).start()
+
+    def on_pyramid_ready(self, img_path):
+        if self.pyramid is not None and self.pyramid.img_path == img_path and not self._items:
+            # 重新读取meta
+            self.pyramid = ImagePyramid(img_path)
+            self.show_pyramid()
+
+    def show_pyramid(self):
+        top = self.pyramid.levels - 1
+        for ty, tx in self.pyramid.tiles_in(top, 0, 0, self.pyramid.width, self.pyramid.height):
+            self.add_tile(top, ty, tx)
+        self.view_box.setRange(xRange=(0, self.pyramid.width), yRange=(0, self.pyramid.height), padding=0)
+        self.update_tiles()
+
+    def clear(self):
+        for item in self._items.values():
+            self.view_box.removeItem(item)
+        self._items.clear()
+        self._pixmaps.clear()
+        self.pyramid = None
+
+    def pixmap(self, level, ty, tx):
+        key = (level, ty, tx)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is None:
+            # 优先使用预读好的QImage；否则解码后零拷贝包装成QImage，再上传为QPixmap
+            image = self.tile_cache.get((self.pyramid.key, level, ty, tx))
+            if image is None:
+                image = ndarray_to_qimage(self.pyramid.tile(level, ty, tx))
+            pixmap = QPixmap.fromImage(image)
+            self._pixmaps[key] = pixmap
+            while len(self._pixmaps) > self.max_tiles:
+                self._pixmaps.popitem(last=False)
+        else:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def add_tile(self, level, ty, tx):
+        key = (level, ty, tx)
+        if key in self._items:
+            return
+        span = self.pyramid.tile_size * (1 << level)
+        item = QGraphicsPixmapItem(self.pixmap(level, ty, tx))
+        item.setTransformationMode(Qt.SmoothTransformation)
+        item.setPos(tx * span, ty * span)
+        item.setScale(1 << level)
+        # 越精细的层越靠上，顶层底图在最下面
+        item.setZValue(self.pyramid.levels - level)
+        self.view_box.addItem(item)
+        self._items[key] = item
+
+    def update_tiles(self):
+        if self.pyramid is None or not self.pyramid.built:
+            return
+        top = self.pyramid.levels - 1
+        pixel_w, pixel_h = self.view_box.viewPixelSize()
+        if pixel_w <= 0 or pixel_h <= 0:
+            return
+        level = self.pyramid.level_for(min(pixel_w, pixel_h))
+        rect = self.view_box.viewRect()
+        wanted = set()
+        if level < top:
+            wanted = {(level, ty, tx) for ty, tx in
+                      self.pyramid.tiles_in(level, rect.left(), rect.top(), rect.right(), rect.bottom())}
+        for key in [key for key in self._items if key[0] != top and key not in wanted]:
+            self.view_box.removeItem(self._items.pop(key))
+        for key in sorted(wanted):
+            self.add_tile(*key)
@@ -0,0 +1,251 @@
+# coding:utf-8
+# 2025-02-20 文本行识别调度：收集一页（批量识别时为多页）的全部切图，按宽高比分桶后成批送入识别模型
+# 识别模型把同一批切图补齐到批内最宽的宽度，宽高比相近的切图放在一起补齐最少；
+# 批大小由settings中的rec_batch_size决定：多核CPU和GPU上大批量能减少调用开销，
+# 单核CPU上批越大每行越慢（实测1行/批最快），默认仍为6
+# 本模块不依赖PySide6
+#   python rec_scheduler.py input/ -b 6 -b 64        对比不同批大小、是否分桶的识别速度（行/秒）
+import argparse
+import sys
+import time
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+# PP-OCRv4识别模型的输入为 48x320，宽高比小于此值的切图都补齐到320宽
+MIN_RATIO = 320 / 48
+DEFAULT_BATCH_SIZE = 6
+# 单页识别按阅读顺序每WINDOW_LINES行（不少于批大小）分桶一次，流式识别每识别完一段就能显示
+WINDOW_LINES = 16
+# 2025-02-26 宽高比分档：第k档的上界为 MIN_RATIO × RATIO_STEP^k；ONNX识别模型把每个切图补齐到所在档的上界，
+# 同一批只放同一档的切图，识别结果与同批有哪些切图无关（多页合在一起识别与逐页识别结果相同）
+RATIO_STEP = 1.5
+
+
+@dataclass
+class RecStats:
+    """识别调度的累计统计"""
+    lines: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    # 送入模型的面积（按宽高比计）和其中切图本身占的面积，差值为补齐的部分
+    padded_area: float = 0.0
+    used_area: float = 0.0
+
+    @property
+    def lines_per_sec(self):
+        return self.lines / self.seconds if self.seconds else None
+
+    @property
+    def padding(self):
+        """补齐部分占送入模型面积的比例"""
+        return 1 - self.used_area / self.padded_area if self.padded_area else 0.0
+
+    def add(self, other):
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+    def as_dict(self):
+        return {
+            "lines": self.lines,
+            "batches": self.batches,
+            "seconds": round(self.seconds, 3),
+            "lines_per_sec": round(self.lines_per_sec, 1) if self.lines_per_sec else None,
+            "avg_batch": round(self.lines / self.batches, 1) if self.batches else None,
+            "padding": round(self.padding, 3),
+        }
+
+
+def crop_ratios(crops):
+    """切图的宽高比，不足MIN_RATIO的按MIN_RATIO计（模型输入的最小宽度）"""
+    ratios = np.array([crop.shape[1] / max(crop.shape[0], 1) for crop in crops], dtype=np.float64)
+    return np.maximum(ratios, MIN_RATIO)
+
+
+def ratio_classes(ratios, step=RATIO_STEP):
+    """宽高比所在的档：第k档为 (MIN_RATIO×step^(k-1), MIN_RATIO×step^k]，不超过MIN_RATIO的为第0档"""
+    ratios = np.maximum(np.asarray(ratios, dtype=np.float64), MIN_RATIO)
+    return np.ceil(np.log(ratios / MIN_RATIO) / np.log(step) - 1e-9).astype(int)
+
+
+def class_ratio(classes, step=RATIO_STEP):
+    """档的上界，即补齐后的宽高比"""
+    return MIN_RATIO * step ** np.asarray(classes, dtype=np.float64)
+
+
+def plan_batches(ratios, batch_size, max_spread=RATIO_STEP):
+    """
+    按宽高比分档（见ratio_classes，每档最大/最小宽高比不超过max_spread倍）后分批：每批不超过batch_size行，不跨档，
+    档内按宽高比排序；max_spread为None时不分档，只按宽高比排序后切分
+    返回每批的下标数组（对应ratios中的位置）
+    """
+    order = np.argsort(ratios, kind='stable')
+    if max_spread:
+        classes = ratio_classes(np.asarray(ratios)[order], max_spread)
+    else:
+        classes = np.zeros(len(order), dtype=int)
+    # 每个起点所在档的结束位置，一次searchsorted算出全部
+    limits = np.searchsorted(classes, classes, side='right')
+    batches = []
+    start = 0
+    while start < len(order):
+        stop = min(start + batch_size, limits[start])
+        batches.append(order[start:stop])
+        start = stop
+    return batches
+
+
+class RecScheduler:
+    """
+    :param engine: 识别引擎（OcrEngine及其子类），用recognize_crops识别每批切图
+    :param batch_size: 每批行数，默认取引擎参数rec_batch_num
+    :param max_spread: 宽高比分档的倍数（与ONNX识别模型补齐的档一致），为None时不分档（只按宽高比排序后切分）
+    """
+
+    def __init__(self, engine, batch_size=None, max_spread=RATIO_STEP):
+        self.engine = engine
+        self.batch_size = max(1, int(batch_size or engine.params.get("rec_batch_num") or DEFAULT_BATCH_SIZE))
+        self.max_spread = max_spread
+        self.window = max(WINDOW_LINES, self.batch_size)
+        self.stats = RecStats()
+
+    def plan(self, crops):
+        """返回 (每批的下标, 宽高比, 补齐后的宽高比)"""
+        ratios = crop_ratios(crops)
+        padded = class_ratio(ratio_classes(ratios, self.max_spread), self.max_spread) if self.max_spread else ratios
+        return plan_batches(ratios, self.batch_size, self.max_spread), ratios, padded
+
+    def run(self, crops, cls=True):
+        """识别crops，按输入顺序返回 [(text, score), ...]"""
+        crops = list(crops)
+        result = [None] * len(crops)
+        if not crops:
+            return result
+        batches, ratios, padded = self.plan(crops)
+        stats = RecStats()
+        for batch in batches:
+            start = time.perf_counter()
+            rec_res = self.engine.recognize_crops([crops[i] for i in batch], cls)
+            stats.seconds += time.perf_counter() - start
+            for i, item in zip(batch, rec_res):
+                result[i] = item
+            stats.batches += 1
+            stats.lines += len(batch)
+            stats.used_area += ratios[batch].sum()
+            stats.padded_area += padded[batch].max() * len(batch)
+        self.stats.add(stats)
+        self.engine.record_rec_stats(stats)
+        return result
+
+
+def recognize_pages(engine, img_paths, cls=True, max_lines=None, scheduler=None):
+    """
+    多页一起调度识别：逐页检测，按输入顺序逐页返回 (img_path, lines, cached, seconds)；缓存命中的页不检测
+    lines与engine.recognize(img_path)完全相同，两者共用同一个缓存键：
+    识别结果与同批有哪些切图无关的后端（capabilities含"pooled_rec"）积累到max_lines行（默认为批大小的4倍）后几页一起分档识别，
+    其他后端的补齐宽度随同批切图变化，逐页按与整页识别相同的窗口识别
+    seconds为这一页的耗时：读图和检测的时间，加上所在的那次识别按行数分摊到这一页的时间
+    """
+    from ocr_crop import PageCrops, load_image, to_bgr
+    scheduler = scheduler or RecScheduler(engine)
+    pooled = "pooled_rec" in engine.capabilities
+    max_lines = (max_lines or scheduler.batch_size * 4) if pooled else 0
+    config = engine.cache_config(cls)
+    drop_score = None
+    # 已检测、尚未识别的页：[img_path, key, boxes, crops, 读图和检测的耗时]
+    pending = []
+
+    def flush():
+        crops = [crop for page in pending for crop in page[3]]
+        start = time.perf_counter()
+        if pooled:
+            rec_res = scheduler.run(crops, cls)
+        else:
+            # 与整页识别（OcrEngine._iter_lines）相同：每页按阅读顺序每scheduler.window行识别一次
+            rec_res = [item for page in pending for i in range(0, len(page[3]), scheduler.window)
+                       for item in scheduler.run(page[3][i:i + scheduler.window], cls)]
+        rec_seconds = time.perf_counter() - start
+        offset = 0
+        for img_path, key, boxes, page_crops, det_seconds in pending:
+            page_res = rec_res[offset:offset + len(page_crops)]
+            offset += len(page_crops)
+            lines = [(box.tolist(), text, score) for box, (text, score) in zip(boxes, page_res) if score >= drop_score]
+            if key is not None:
+                engine.cache.put(key, [[[box, [text, score]] for box, text, score in lines] or None])
+            yield img_path, lines, False, det_seconds + rec_seconds * len(page_crops) / max(len(crops), 1)
+        pending.clear()
+
+    for img_path in img_paths:
+        start = time.perf_counter()
+        key = None
+        if engine.cache is not None:
+            key = engine.cache.key(img_path, config)
+            result = engine.cache.get(key)
+            if result is not None:
+                seconds = time.perf_counter() - start
+                # 前面尚未识别的页先识别，保证按输入顺序返回
+                yield from flush()
+                yield img_path, [(item[0], item[1][0], item[1][1]) for item in (result[0] or [])], True, seconds
+                continue
+        img = to_bgr(load_image(img_path))
+        boxes = engine.detect(img)
+        if drop_score is None:
+            drop_score = engine.drop_score()
+        crops = PageCrops(img, boxes, rotate_vertical=True)
+        pending.append([img_path, key, boxes, [crops[i] for i in range(len(boxes))], time.perf_counter() - start])
+        engine.calls += 1
+        if sum(len(page[3]) for page in pending) >= max_lines:
+            yield from flush()
+    if pending:
+        yield from flush()
+
+
+# ---- 速度对比 ----
+def benchmark(engine, img_paths, batch_sizes, spreads=(1.5, None), cls=True):
+    """同一批切图用不同批大小、分桶方式识别，返回 [(批大小, max_spread, RecStats), ...]"""
+    from ocr_crop import PageCrops, load_image, to_bgr
+    crops = []
+    for img_path in img_paths:
+        img = to_bgr(load_image(img_path))
+        page_crops = PageCrops(img, engine.detect(img), rotate_vertical=True)
+        crops.extend(page_crops[i] for i in range(len(page_crops)))
+    # 先跑一次，排除首次推理的初始化开销
+    engine.recognize_crops(crops[:1], cls)
+    results = []
+    for batch_size in batch_sizes:
+        # 引擎内部的批大小也随之改变（重新加载模型），加载和首次推理不计入
+        engine.configure(rec_batch_num=batch_size)
+        engine.recognize_crops(crops[:1], cls)
+        for spread in spreads:
+            scheduler = RecScheduler(engine, batch_size, spread)
+            scheduler.run(crops, cls)
+            results.append((batch_size, spread, scheduler.stats))
+    return results
+
+
+def main(argv=None):
+    from ocr_backends import DEFAULT_BACKEND, ocrBackends
+    from ocr_pipeline import expand_inputs
+    parser = argparse.ArgumentParser(description="对比不同批大小和分桶方式的文本行识别速度")
+    parser.add_argument("inputs", nargs="+", help="图片文件、文件夹或通配符")
+    parser.add_argument("-b", "--batch", type=int, action="append", help="批大小，可多次指定，默认 6 16 64")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, help="识别后端（python ocr_backends.py list）")
+    parser.add_argument("--no-cls", action="store_true", help="不做方向分类")
+    args = parser.parse_args(argv)
+    img_paths = expand_inputs(args.inputs)
+    if not img_paths:
+        print("no images", file=sys.stderr)
+        return 1
+    engine = ocrBackends.engine(args.backend)
+    results = benchmark(engine, img_paths, args.batch or [6, 16, 64], cls=not args.no_cls)
+    print(f"{len(img_paths)} pages, {results[0][2].lines} lines, backend {args.backend}")
+    print(f"{'batch':>6}{'bucket':>8}{'batches':>9}{'padding':>9}{'seconds':>9}{'lines/s':>9}")
+    for batch_size, spread, stats in results:
+        bucket = f"{spread:g}x" if spread else "-"
+        print(f"{batch_size:>6}{bucket:>8}{stats.batches:>9}{stats.padding:>9.1%}{stats.seconds:>9.2f}"
+              f"{stats.lines_per_sec:>9.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# coding:utf-8
+# 2025-01-22 识别结果表格模型：按列存储，显示时才格式化单元格，排序/筛选只调整行号索引
+import numpy as np
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QBrush, QColor, QFontMetrics
+
+
+class OcrResultModel(QAbstractTableModel):
+    headers = ['序号', '坐标', '结果', '置信度', '校验状态']
+    SERIAL, BOX, TEXT, SCORE, STATUS = range(5)
+
+    def __init__(self, lines=(), confidence=1.0, color='#009faa', parent=None):
+        super().__init__(parent)
+        # 每列一个数组，源行号即识别顺序（与ComboBox下标一致）
+        self.boxes = np.zeros((0, 4, 2))
+        self.texts = []
+        self.scores = np.zeros(0)
+        self.verified = np.zeros(0, dtype=bool)
+        self.confidence = confidence
+        self.brush = QBrush(QColor(color))
+        # 视图行 -> 源行，排序和筛选只改变这个索引数组
+        self._rows = np.zeros(0, dtype=np.intp)
+        self._sort = (self.SERIAL, Qt.AscendingOrder)
+        self._max_score = None
+        self.setLines(lines)
+
+    # ---- 数据 ----
+    def setLines(self, lines):
+        """lines为 [(box, text, score), ...]"""
+        self.beginResetModel()
+        self.boxes = np.asarray([line[0] for line in lines], dtype=np.float64).reshape(-1, 4, 2)
+        self.texts = [line[1] for line in lines]
+        self.scores = np.asarray([line[2] for line in lines], dtype=np.float64)
+        self.verified = np.zeros(len(self.texts), dtype=bool)
+        self._rows = self._viewRows()
+        self.endResetModel()
+
+    def appendLines(self, lines):
+        """2025-01-24 流式识别时逐批追加行；未排序、未筛选时只插入新行，不重置整个表格"""
+        if not lines:
+            return
+        first = len(self.texts)
+        self.boxes = np.concatenate([self.boxes, np.asarray([line[0] for line in lines], dtype=np.float64).reshape(-1, 4, 2)])
+        self.texts.extend(line[1] for line in lines)
+        self.scores = np.concatenate([self.scores, np.asarray([line[2] for line in lines], dtype=np.float64)])
+        self.verified = np.concatenate([self.verified, np.zeros(len(lines), dtype=bool)])
+        if self._sort == (self.SERIAL, Qt.AscendingOrder) and self._max_score is None:
+            self.beginInsertRows(QModelIndex(), first, len(self.texts) - 1)
+            self._rows = np.arange(len(self.texts), dtype=np.intp)
+            self.endInsertRows()
+        else:
+            self.beginResetModel()
+            self._rows = self._viewRows()
+            self.endResetModel()
+
+    def isVerified(self, source_row):
+        return bool(self.verified[source_row])
+
+    def setVerified(self, source_row, state):
+        self.verified[source_row] = state
+        view_rows = np.flatnonzero(self._rows == source_row)
+        if len(view_rows):
+            index = self.index(int(view_rows[0]), self.STATUS)
+            self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.CheckStateRole])
+
+    def unverifiedRows(self):
+        """未校验的源行号"""
+        return np.flatnonzero(~self.verified)
+
+    def sourceRow(self, view_row):
+        return int(self._rows[view_row])
+
+    def setHighlight(self, confidence, color):
+        """修改置信度阈值和标出低置信度的颜色，只刷新置信度列"""
+        self.confidence = confidence
+        self.brush = QBrush(QColor(color))
+        if len(self._rows):
+            self.dataChanged.emit(self.index(0, self.SCORE), self.index(len(self._rows) - 1, self.SCORE),
+                                  [Qt.ForegroundRole])
+
+    # ---- 排序与筛选 ----
+    def setConfidenceFilter(self, max_score=None):
+        """只显示置信度低于max_score的行，None为显示全部"""
+        self.beginResetModel()
+        self._max_score = max_score
+        self._rows = self._viewRows()
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self._sort = (column, order)
+        self._rows = self._viewRows()
+        self.layoutChanged.emit()
+
+    def _viewRows(self):
+        rows = np.arange(len(self.texts), dtype=np.intp)
+        if self._max_score is not None:
+            rows = rows[self.scores < self._max_score]
+        column, order = self._sort
+        if column == self.BOX:
+            # 按左上角先y后x
+            keys = np.lexsort((self.boxes[rows, 0, 0], self.boxes[rows, 0, 1]))
+        elif column == self.TEXT:
+            keys = np.array(sorted(range(len(rows)), key=lambda i: self.texts[rows[i]]), dtype=np.intp)
+        elif column == self.SCORE:
+            keys = np.argsort(self.scores[rows], kind='stable')
+        elif column == self.STATUS:
+            keys = np.argsort(self.verified[rows], kind='stable')
+        else:
+            keys = np.arange(len(rows))
+        rows = rows[keys]
+        if order == Qt.DescendingOrder:
+            rows = rows[::-1]
+        return rows
+
+    # ---- QAbstractTableModel ----
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return None
+
+    def flags(self, index):
+        if index.column() == self.STATUS:
+            # 校验状态只能通过“校验完成/取消”按钮修改
+            return Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == self.SERIAL:
+                return str(row + 1)  # 序号从 1 开始
+            if column == self.BOX:
+                return str(self.boxes[row].tolist())
+            if column == self.TEXT:
+                return self.texts[row]
+            if column == self.SCORE:
+                return str(float(self.scores[row]))
+            return '已校验' if self.verified[row] else '未校验'
+        if role == Qt.CheckStateRole and column == self.STATUS:
+            return Qt.Checked if self.verified[row] else Qt.Unchecked
+        if role == Qt.ForegroundRole and column == self.SCORE and self.scores[row] < self.confidence:
+            # 置信度低于阈值的单元格用settings中的颜色标出
+            return self.brush
+        return None
+
+    def sizeColumns(self, view, sample=64, padding=24):
+        """按前sample行估算列宽，避免resizeColumnsToContents逐格测量"""
+        metrics = QFontMetrics(view.font())
+        rows = min(sample, self.rowCount())
+        for column in range(self.columnCount()):
+            texts = [self.headers[column]] + [self.data(self.index(row, column)) for row in range(rows)]
+            width = max(metrics.horizontalAdvance(text) for text in texts) + padding
+            view.setColumnWidth(column, width)
@@ -0,0 +1,165 @@
+# coding:utf-8
+# 2025-02-15 全局设置：启动时读取一次settings文件，之后各页面都从内存读取并订阅变化
+# 修改设置立即通知订阅者生效，停止修改500ms后才在后台写文件（先写临时文件再替换，不会写出半个文件）
+import json
+import os
+import sys
+import tempfile
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+
+DEFAULTS = {
+    "font_family": ["Microsoft YaHei UI"],
+    "font_size": 9,
+    "color": "#009faa",
+    "confidence": 1.0,
+    "ocrs": "百度OCR",
+    "status_C": True,
+    "status_M": False,
+    "path": "",
+    "ocr_device": "cpu",
+    "ocr_preload": False,
+    "ocr_workers": 0,
+    "ocr_cache": True,
+    "ocr_cache_mb": 256,
+    "crop_export": True,
+    "read_prefetch": 2,
+    "ocr_remote_url": "http://127.0.0.1:8866",
+    "ocr_threads": 0,
+    "ocr_precision": "fp32",
+    "rec_batch_size": 6,
+    "det_tile_size": 0
+}
+
+
+def coerce(key, value):
+    """按默认值的类型转换（如SpinBox给出的数值、文件中手写的字符串），无法转换时原样返回"""
+    default = DEFAULTS.get(key)
+    if default is None or value is None or isinstance(value, type(default)):
+        return value
+    try:
+        if isinstance(default, bool):
+            return value.lower() in ('1', 'true', 'yes') if isinstance(value, str) else bool(value)
+        if isinstance(default, (int, float, str)):
+            return type(default)(value)
+    except (TypeError, ValueError):
+        pass
+    return value
+
+
+class _SaveJob(QRunnable):
+    def __init__(self, store, settings, version):
+        super().__init__()
+        self.store = store
+        self.settings = settings
+        self.version = version
+
+    def run(self):
+        self.store._write(self.settings, self.version)
+
+
+class SettingsStore(QObject):
+    """
+    :param path: 设置文件路径
+    :param save_delay: 最后一次修改之后多少毫秒写文件
+    """
+    # 键, 新值；每次修改一个键发出一次，值已按默认值的类型转换
+    changed = Signal(str, object)
+    # 写文件失败，参数为错误信息
+    saveFailed = Signal(str)
+
+    def __init__(self, path='settings', save_delay=500, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self._settings = dict(DEFAULTS)
+        self._loaded = False
+        self._version = 0
+        self._written = 0
+        self._write_lock = threading.Lock()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(save_delay)
+        self._timer.timeout.connect(self.save)
+
+    def load(self):
+        """读取设置文件，文件中没有的键使用默认值；只在首次访问时读取"""
+        self._loaded = True
+        try:
+            with open(self.path, 'r', encoding='utf-8') as json_file:
+                settings = json.load(json_file)
+        except FileNotFoundError:
+            print(f"Settings file '{self.path}' does not exist.", file=sys.stderr)
+            return self._settings
+        except (OSError, ValueError) as e:
+            print(f"Error loading settings: {e}", file=sys.stderr)
+            return self._settings
+        self._settings.update({key: coerce(key, value) for key, value in settings.items()})
+        return self._settings
+
+    def _ensure(self):
+        if not self._loaded:
+            self.load()
+
+    def get(self, key, default=None):
+        self._ensure()
+        return self._settings.get(key, default)
+
+    def __getitem__(self, key):
+        self._ensure()
+        return self._settings[key]
+
+    def all(self):
+        """全部设置的副本"""
+        self._ensure()
+        return dict(self._settings)
+
+    def set(self, key, value):
+        """修改一个键，值没有变化时不通知也不保存"""
+        self._ensure()
+        value = coerce(key, value)
+        if key in self._settings and self._settings[key] == value:
+            return
+        self._settings[key] = value
+        self._version += 1
+        self._timer.start()
+        self.changed.emit(key, value)
+
+    def update(self, settings):
+        for key, value in settings.items():
+            self.set(key, value)
+
+    def save(self, wait=False):
+        """在后台写文件；wait为真时在当前线程写（退出程序前调用）"""
+        self._timer.stop()
+        if self._version == self._written:
+            return
+        job = _SaveJob(self, dict(self._settings), self._version)
+        if wait:
+            job.run()
+        else:
+            QThreadPool.globalInstance().start(job)
+
+    def _write(self, settings, version):
+        with self._write_lock:
+            # 较新的版本已经写入
+            if version <= self._written:
+                return
+            directory = os.path.dirname(os.path.abspath(self.path))
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.settings', suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as json_file:
+                        json.dump(settings, json_file, indent=4)
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
+            except OSError as e:
+                print(f"Error saving settings: {e}", file=sys.stderr)
+                self.saveFailed.emit(str(e))
+                return
+            self._written = version
+
+
+settingsStore = SettingsStore()
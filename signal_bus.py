@@ -4,6 +4,24 @@ from PySide6.QtCore import QObject, Signal
 class SignalBus(QObject):
     # 全局InforBar信息
     showInfoBar = Signal(object)
+    # 2025-01-08 OCR识别任务，第一个参数均为任务id
+    ocrStarted = Signal(int)
+    ocrProgress = Signal(int, int, int)  # 任务id, 已完成数, 总数
+    ocrPartialResult = Signal(int, object)
+    ocrFinished = Signal(int, object)
+    ocrFailed = Signal(int, str)
+    ocrCancelled = Signal(int)
+    # 2025-02-05 阅读页图片金字塔生成完成/失败，参数为原图路径
+    pyramidReady = Signal(str)
+    pyramidFailed = Signal(str, str)
+    # 2025-02-12 装订完成，参数为书的目录；全文索引更新完成，参数为书架根目录
+    bookBound = Signal(str)
+    searchIndexUpdated = Signal(str)
+    # 2025-02-13 取书/还书完成，参数为书的路径和是否取书；失败时另附错误信息
+    bookBorrowed = Signal(str, bool)
+    bookBorrowFailed = Signal(str, bool, str)
+    # 2025-02-14 已监视的目录发生变化（fs_watcher.py），参数为library_index.DirChanges
+    dirChanged = Signal(object)
 
 
 signalBus = SignalBus()
\ No newline at end of file
@@ -0,0 +1,40 @@
+# coding:utf-8
+import pytest
+
+from book_pager import BookPager
+
+
+@pytest.fixture
+def book(tmp_path):
+    files = []
+    for name, text in (('001.txt', '天地玄\n黄'), ('002.txt', ''), ('003.txt', '宇宙\n洪荒日月')):
+        path = tmp_path / name
+        path.write_text(text, encoding='utf-8')
+        files.append((str(path), len(text) - text.count('\n')))
+    return files
+
+
+def test_pages_cross_file_boundaries(book):
+    pager = BookPager(book)
+    assert pager.total == 10
+    assert pager.page_count(3) == 4
+    assert [pager.page(page, 3) for page in range(4)] == ["天地玄", "黄宇宙", "洪荒日", "月"]
+    assert pager.text(2, 7) == "玄黄宇宙洪"
+    assert pager.page_of(9, 3) == 3
+    # 超出最后一页的字归到最后一页
+    assert pager.page_of(20, 3) == 3
+
+
+def test_empty_book_has_one_page():
+    pager = BookPager([])
+    assert pager.page_count(100) == 1
+    assert pager.page(0, 100) == ""
+
+
+def test_cache_is_bounded(book):
+    pager = BookPager(book, cache_chars=4)
+    pager.page(0, 3)
+    pager.page(3, 3)
+    # 只保留最近用过的txt
+    assert list(pager._texts) == [2]
+    assert pager.page(0, 3) == "天地玄"
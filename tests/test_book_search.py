@@ -0,0 +1,80 @@
+# coding:utf-8
+import pytest
+
+from book_search import BookSearch, grams, match_expr, title_matches
+from library_index import LibraryIndex
+
+
+def test_grams_keep_last_char_of_each_run():
+    assert grams("天地玄, AB") == "天地 地玄 玄 ab b"
+
+
+def test_match_expr():
+    assert match_expr("天地玄") == '"天地 地玄"'
+    # 单字为前缀查询
+    assert match_expr("天") == '"天"*'
+    assert match_expr("天地 玄") == '"天地" AND "玄"*'
+    assert match_expr(" ,。") == ""
+
+
+def test_title_matches():
+    paths = ["/shelf/傷寒論", "/shelf/Ming Shi", "/shelf/溫病條辨"]
+    assert title_matches("寒", paths) == ["/shelf/傷寒論"]
+    assert title_matches(" ming ", paths) == ["/shelf/Ming Shi"]
+
+
+@pytest.fixture
+def shelf(tmp_path):
+    root = tmp_path / 'shelf'
+    root.mkdir()
+    books = {'傷寒論': '太陽之為病，脈浮，頭項強痛而惡寒。', '溫病條辨': '溫病者，有風溫、有溫熱。',
+             '金匱要略': '問曰：上工治未病，何也？'}
+    for name, text in books.items():
+        (root / name).mkdir()
+        (root / name / '001.txt').write_text(text, encoding='utf-8')
+    library = LibraryIndex(str(tmp_path / 'library.db'))
+    search = BookSearch(str(tmp_path / 'search.db'), library)
+    yield root, search
+    search.close()
+    library.close()
+
+
+def test_search_ready_only_after_full_sync(shelf):
+    root, search = shelf
+    assert not search.ready(str(root))
+    search.sync(str(root), [str(root / '傷寒論')])
+    assert not search.ready(str(root))
+    # 中途停止的同步也不算建好
+    search.sync(str(root), stop=lambda: True)
+    assert not search.ready(str(root))
+    assert len(search.sync(str(root))) == 2
+    assert search.ready(str(root))
+
+
+def test_search_ranks_and_limit(shelf):
+    root, search = shelf
+    search.sync(str(root))
+    hits = [path for path, _ in search.search("病", str(root))]
+    assert sorted(hits) == sorted(str(root / name) for name in ('傷寒論', '溫病條辨', '金匱要略'))
+    # 书名命中排在前面
+    assert hits[0] == str(root / '溫病條辨')
+    assert len(search.search("病", str(root), limit=2)) == 2
+    assert [path for path, _ in search.search("溫熱")] == [str(root / '溫病條辨')]
+    assert search.search("溫熱", str(root / 'other')) == []
+
+
+def test_matches_per_shelf(shelf, tmp_path):
+    root, search = shelf
+    # 第二个书架（如binding）还没建好索引：只按书名匹配，已建好的书架按全文
+    other = tmp_path / 'binding'
+    (other / '病源論').mkdir(parents=True)
+    (other / '千金方').mkdir()
+    (other / '千金方' / '001.txt').write_text('治未病', encoding='utf-8')
+    search.sync(str(root))
+    paths = [str(root / name) for name in ('傷寒論', '溫病條辨', '金匱要略')] + [str(other / '病源論'), str(other / '千金方')]
+    hits = search.matches("病", paths)
+    assert hits[0] == str(root / '溫病條辨')
+    assert set(hits[:3]) == set(paths[:3])
+    assert hits[3:] == [str(other / '病源論')]
+    search.sync(str(other))
+    assert set(search.matches("病", paths)) == set(paths)
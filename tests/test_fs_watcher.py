@@ -0,0 +1,63 @@
+# coding:utf-8
+import time
+
+import pytest
+
+pytest.importorskip("watchdog")
+from PySide6.QtCore import QCoreApplication
+
+from fs_watcher import FsWatcher
+from library_index import LibraryIndex
+from signal_bus import signalBus
+
+
+@pytest.fixture
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def wait(app, condition, timeout=3.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end and not condition():
+        app.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    library = LibraryIndex(str(tmp_path / 'library.db'))
+    watcher = FsWatcher(library, debounce=50)
+    changes = []
+    signalBus.dirChanged.connect(changes.append)
+    yield watcher, library, changes
+    signalBus.dirChanged.disconnect(changes.append)
+    watcher.stop()
+    library.close()
+
+
+def test_stop_drops_pending_flush(app, tmp_path, watcher):
+    watcher, library, changes = watcher
+    shelf = tmp_path / 'shelf'
+    shelf.mkdir()
+    library.refresh_dir(str(shelf))
+    watcher.watch(str(shelf))
+    (shelf / 'book').mkdir()
+    assert wait(app, lambda: watcher._timer.isActive())
+    # 退出时还在等待的扫描不再发布
+    watcher.stop()
+    assert not watcher._timer.isActive()
+    wait(app, lambda: bool(changes), timeout=0.3)
+    assert changes == []
+
+
+def test_watch_again_after_stop(app, tmp_path, watcher):
+    watcher, library, changes = watcher
+    shelf = tmp_path / 'shelf'
+    shelf.mkdir()
+    library.refresh_dir(str(shelf))
+    watcher.watch(str(shelf))
+    watcher.stop()
+    watcher.watch(str(shelf))
+    (shelf / 'book').mkdir()
+    assert wait(app, lambda: bool(changes))
@@ -0,0 +1,65 @@
+# coding:utf-8
+import os
+
+import pytest
+
+from library_index import LibraryIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LibraryIndex(str(tmp_path / 'library.db'))
+    yield index
+    index.close()
+
+
+def make_book(root, name, pages=2, texts=None):
+    book = root / name
+    book.mkdir()
+    for i in range(pages):
+        (book / f'{i + 1:03d}.png').write_bytes(b'')
+    for file_name, text in (texts or {}).items():
+        (book / file_name).write_text(text, encoding='utf-8')
+    return book
+
+
+def test_refresh_dir_detects_rename_and_removal(tmp_path, index):
+    shelf = tmp_path / 'shelf'
+    shelf.mkdir()
+    make_book(shelf, 'a')
+    make_book(shelf, 'b')
+    changes = index.refresh_dir(str(shelf))
+    assert sorted(changes.added) == [str(shelf / 'a'), str(shelf / 'b')]
+
+    os.rename(shelf / 'a', shelf / 'c')
+    changes = index.refresh_dir(str(shelf))
+    assert changes.removed == [str(shelf / 'a')]
+    assert changes.added == [str(shelf / 'c')]
+
+    index.refresh_dir(str(shelf / 'b'))
+    (shelf / 'b' / '002.png').unlink()
+    changes = index.refresh_dir(str(shelf / 'b'))
+    assert changes.removed == [str(shelf / 'b' / '002.png')]
+    assert not changes.text_changed
+    assert [path for path, is_dir in index.children(str(shelf))] == [str(shelf / 'b'), str(shelf / 'c')]
+
+
+def test_refresh_dir_reports_changed_text(tmp_path, index):
+    book = make_book(tmp_path, 'book', texts={'001.txt': '天地\n'})
+    index.refresh_dir(str(book))
+    assert not index.refresh_dir(str(book))
+    (book / '001.txt').write_text('天地玄黄\n', encoding='utf-8')
+    os.utime(book / '001.txt', (1, 1))
+    changes = index.refresh_dir(str(book))
+    assert changes.changed == [str(book / '001.txt')] and changes.text_changed
+    assert index.book_info(str(book)) == (2, 4)
+
+
+def test_text_offsets_and_undecodable_file(tmp_path, index):
+    book = make_book(tmp_path, 'book', texts={'001.txt': '天地\n', '003.txt': '宇宙\n'})
+    (book / '002.txt').write_bytes('玄黄\n'.encode('gbk'))
+    rows = index.text_files(str(book))
+    assert [(os.path.basename(path), offset, chars) for path, offset, chars, _ in rows] == [
+        ('001.txt', 0, 3), ('002.txt', 3, 0), ('003.txt', 3, 3)]
+    # GBK编码的txt不影响打开这本书
+    assert index.text(str(book)) == '天地\n宇宙\n'
@@ -0,0 +1,51 @@
+# coding:utf-8
+# 整页识别(recognize)与流式识别(iter_recognize)必须给出完全相同的结果，两者共用同一个缓存键
+import os
+
+import pytest
+
+from conftest import ROOT
+
+SAMPLES = [os.path.join(ROOT, 'input', name) for name in ('p_shl.png', 'p_ynsz.png')]
+
+
+def engines():
+    from ocr_backends import RapidOcrEngine
+    from ocr_onnx import OnnxOcrEngine
+    return [pytest.param(cls, id=cls.name, marks=pytest.mark.skipif(not cls.available(), reason="not installed"))
+            for cls in (OnnxOcrEngine, RapidOcrEngine)]
+
+
+@pytest.fixture(scope="module", params=engines())
+def engine(request):
+    try:
+        engine = request.param()
+        engine.get()
+    except Exception as e:
+        pytest.skip(f"model not available: {e}")
+    return engine
+
+
+@pytest.mark.parametrize("img_path", SAMPLES, ids=os.path.basename)
+def test_stream_matches_full_page(engine, img_path):
+    streamed = []
+    for chunk, done, total in engine.iter_recognize(img_path):
+        streamed.extend(chunk)
+    assert done == total
+    assert engine.recognize(img_path) == streamed
+
+
+def test_cache_key_covers_rec_batch(engine):
+    # 用新的实例，不改动其他用例共用的engine
+    fresh = type(engine)()
+    key = fresh.cache_config()
+    fresh.configure(rec_batch_num=key["rec_batch"][0] + 1)
+    assert fresh.cache_config() != key
+
+
+def test_stopped_stream_is_counted(engine):
+    calls = engine.calls
+    stream = engine.iter_recognize(SAMPLES[0])
+    next(stream)
+    stream.close()
+    assert engine.calls == calls + 1
@@ -0,0 +1,43 @@
+# coding:utf-8
+import pytest
+
+import ocr_pipeline
+
+
+@pytest.fixture
+def fake_recognizers(monkeypatch):
+    calls = []
+
+    def pages(engine, img_paths):
+        calls.append("pages")
+        return ((img_path, [], False, 0.1) for img_path in img_paths)
+
+    def folder(img_paths, workers, *args):
+        calls.append(("folder", workers))
+        return ((img_path, [], 0.1) for img_path in img_paths)
+
+    monkeypatch.setattr(ocr_pipeline, "recognize_pages", pages)
+    monkeypatch.setattr(ocr_pipeline, "recognize_folder", folder)
+    return calls
+
+
+class Engine:
+    params, cache, det_tile_size = {}, None, 0
+
+    def record_rec_stats(self, stats):
+        pass
+
+
+@pytest.mark.parametrize("cpus, workers, expected", [
+    (1, 0, "pages"),           # 自动：单核时在本进程识别，不启动进程池
+    (4, 1, "pages"),
+    (4, 0, ("folder", 0)),
+    (4, 2, ("folder", 2)),
+    (4, 8, ("folder", 8)),
+])
+def test_iter_pages_uses_pool_only_for_several_workers(fake_recognizers, monkeypatch, cpus, workers, expected):
+    monkeypatch.setattr("os.cpu_count", lambda: cpus)
+    pages = list(ocr_pipeline.iter_pages(["a.png", "b.png"], workers, Engine()))
+    assert [page.img_path for page in pages] == ["a.png", "b.png"]
+    assert all(page.seconds == 0.1 for page in pages)
+    assert fake_recognizers == [expected]
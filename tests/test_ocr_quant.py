@@ -0,0 +1,57 @@
+# coding:utf-8
+import os
+import shutil
+
+import pytest
+
+from conftest import ROOT
+
+INPUT = os.path.join(ROOT, 'input')
+
+
+@pytest.fixture
+def model_path():
+    from ocr_onnx import OnnxOcrEngine
+    if not OnnxOcrEngine.available():
+        pytest.skip("onnx model not available")
+    return OnnxOcrEngine().model_path("det_model")
+
+
+def test_record_covers_calibration(model_path, tmp_path):
+    from ocr_quant import calibration_images, quantization_record
+    images = calibration_images(INPUT)
+    record = quantization_record(model_path, "int8-static", images)
+    assert quantization_record(model_path, "int8-static", images) == record
+    # 校准图片数量、内容和检测参数变化都要重新生成
+    assert quantization_record(model_path, "int8-static", images[:1]) != record
+    copy = str(tmp_path / os.path.basename(images[0]))
+    shutil.copy(images[0], copy)
+    assert quantization_record(model_path, "int8-static", [copy] + images[1:]) != record
+    assert quantization_record(model_path, "int8-static", images, {"det_limit_side_len": 1280}) != record
+    assert "calibration" not in quantization_record(model_path, "int8-dynamic")
+
+
+def test_ensure_quantized_reuses_until_inputs_change(model_path, tmp_path, monkeypatch):
+    import ocr_quant
+    pytest.importorskip("onnx")
+    calls = []
+    real = ocr_quant.quantize_model
+    monkeypatch.setattr(ocr_quant, "quantize_model", lambda *args: calls.append(args) or real(*args))
+    path = ocr_quant.ensure_quantized(model_path, "int8-dynamic", "det", quant_dir=str(tmp_path))
+    assert ocr_quant.ensure_quantized(model_path, "int8-dynamic", "det", quant_dir=str(tmp_path)) == path
+    assert len(calls) == 1
+    # 记录与当前输入不一致（如旧版本生成、没有记录）时重新生成
+    os.remove(ocr_quant.record_path(path))
+    ocr_quant.ensure_quantized(model_path, "int8-dynamic", "det", quant_dir=str(tmp_path))
+    assert len(calls) == 2
+
+
+def test_static_without_calibration_falls_back(model_path, tmp_path):
+    from ocr_onnx import OnnxOcrEngine
+    engine = OnnxOcrEngine(precision="int8-static", calibration_dir=str(tmp_path))
+    assert engine.params["precision"] == "int8-dynamic"
+    engine = OnnxOcrEngine(calibration_dir=str(tmp_path))
+    engine.configure(precision="int8-static")
+    assert engine.params["precision"] == "int8-dynamic"
+    engine.configure(precision="int8-static", calibration_dir=INPUT)
+    assert engine.params["precision"] == "int8-static"
@@ -0,0 +1,100 @@
+# coding:utf-8
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from rec_scheduler import MIN_RATIO, RecScheduler, class_ratio, crop_ratios, plan_batches, ratio_classes, recognize_pages
+
+
+def test_crop_ratios_min_width():
+    # 窄切图按模型最小宽度计，高为0的切图不除零
+    crops = [np.zeros((48, 100, 3)), np.zeros((10, 200, 3)), np.zeros((0, 5, 3))]
+    assert crop_ratios(crops).tolist() == [MIN_RATIO, 20.0, MIN_RATIO]
+
+
+def test_ratio_classes_boundaries():
+    # 档的上界属于本档，超过一点就进入下一档；不足MIN_RATIO的都在第0档
+    bounds = class_ratio([0, 1, 2], 1.5)
+    ratios = [1.0, MIN_RATIO, bounds[1], bounds[1] + 1e-6, bounds[2]]
+    assert ratio_classes(ratios, 1.5).tolist() == [0, 0, 1, 2, 2]
+
+
+def test_plan_batches_class_boundary():
+    # MIN_RATIO×1.5=10为第1档的上界，10.01起为第2档；同一档内不再切分
+    ratios = np.array([9.0, 10.0, 10.01, 15.0, 6.0])
+    batches = plan_batches(ratios, 8, 1.5)
+    assert [b.tolist() for b in batches] == [[4], [0, 1], [2, 3]]
+
+
+def test_plan_batches_batch_size_cut():
+    ratios = np.full(7, 10.0)
+    batches = plan_batches(ratios, 3)
+    assert [b.tolist() for b in batches] == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_plan_batches_sorted_and_stable():
+    ratios = np.array([30.0, 10.0, 30.0, 10.0, 20.0])
+    batches = plan_batches(ratios, 2, None)
+    # 按宽高比排序，相同宽高比保持输入顺序
+    assert [b.tolist() for b in batches] == [[1, 3], [4, 0], [2]]
+    assert sorted(np.concatenate(batches).tolist()) == list(range(5))
+
+
+def test_plan_batches_empty():
+    assert plan_batches(np.array([]), 4) == []
+
+
+class FakeEngine:
+    params = {"rec_batch_num": 2}
+
+    def __init__(self):
+        self.batches = []
+
+    def recognize_crops(self, crops, cls=True):
+        self.batches.append(len(crops))
+        return [(str(crop.shape[1]), 1.0) for crop in crops]
+
+    def record_rec_stats(self, stats):
+        pass
+
+    def cache_config(self, cls):
+        return {"model": "fake", "cls": cls}
+
+
+def test_scheduler_keeps_input_order():
+    engine = FakeEngine()
+    scheduler = RecScheduler(engine, max_spread=None)
+    widths = [400, 100, 300, 200, 500]
+    result = scheduler.run([np.zeros((10, w, 3)) for w in widths])
+    assert [text for text, _ in result] == [str(w) for w in widths]
+    assert engine.batches == [2, 2, 1]
+    assert scheduler.stats.lines == 5 and scheduler.stats.batches == 3
+
+
+@pytest.fixture
+def onnx_engine():
+    from ocr_onnx import OnnxOcrEngine
+    if not OnnxOcrEngine.available():
+        pytest.skip("onnx model not available")
+    return OnnxOcrEngine
+
+
+def test_pooled_pages_match_single_pages(onnx_engine, tmp_path):
+    from ocr_cache import OcrCache
+    pages = sorted(glob.glob(os.path.join(ROOT, 'input', '*.png')))
+    engine = onnx_engine(OcrCache(str(tmp_path)))
+    pooled = {}
+    for img_path, lines, cached, seconds in recognize_pages(engine, pages, max_lines=1000):
+        assert not cached and seconds > 0
+        pooled[img_path] = lines
+    # 合批识别写入的缓存，逐页识别（界面中打开图片）直接命中，结果相同
+    hits = engine.cache.hits
+    assert {p: engine.recognize(p) for p in pages} == pooled
+    assert engine.cache.hits - hits == len(pages)
+    # 不用缓存：换一种顺序和合批大小，结果仍与逐页识别相同
+    engine = onnx_engine()
+    reordered = {p: lines for p, lines, _, _ in recognize_pages(engine, pages[::-1], max_lines=7)}
+    assert reordered == {p: engine.recognize(p) for p in pages} == pooled
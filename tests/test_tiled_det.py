@@ -0,0 +1,70 @@
+# coding:utf-8
+import numpy as np
+import pytest
+
+from tiled_det import merge_tile_boxes, tile_grid, tile_length, tile_starts
+
+
+def rect(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+@pytest.mark.parametrize("length", [100, 960, 961, 1792, 1793, 2229, 2927, 5000])
+def test_tile_starts_cover_with_overlap(length):
+    size = tile_length(length, 960, 128)
+    starts = tile_starts(length, 960, 128)
+    assert size <= 960
+    assert starts[0] == 0 and starts[-1] + size == length
+    assert all(a + size - b >= 128 for a, b in zip(starts, starts[1:]))
+
+
+def test_tile_length_equal_tiles():
+    # 2927按960切需要4块；等长的块只需832（32的倍数），重复检测的面积更少
+    assert tile_length(2927, 960, 128) == 832
+    assert len(tile_starts(2927, 960, 128)) == 4
+
+
+def test_tile_grid_rows_then_columns():
+    tiles = tile_grid(1500, 2000, 960)
+    assert tiles[0][:2] == (0, 0)
+    assert tiles[1][1] == 0 and tiles[1][0] > 0
+    assert max(t[2] for t in tiles) == 2000 and max(t[3] for t in tiles) == 1500
+
+
+def test_box_crossing_seam_merged():
+    tiles = [(0, 0, 600, 400), (500, 0, 1100, 400)]
+    # 一行文字从450到650，被左块切在600，右块从500开始
+    left = np.array([rect(450, 100, 600, 130)], dtype=np.float32)
+    right = np.array([rect(500, 100, 650, 130)], dtype=np.float32)
+    merged = merge_tile_boxes(tiles, [left, right])
+    assert len(merged) == 1
+    assert merged[0].tolist() == rect(450, 100, 650, 130)
+
+
+def test_duplicate_in_overlap_merged_and_neighbours_kept():
+    tiles = [(0, 0, 600, 400), (500, 0, 1100, 400)]
+    # 完全在重叠区内的一行两块都检出；上下相邻的另一行和重叠区外的行保持独立
+    left = np.array([rect(520, 100, 580, 130), rect(520, 140, 580, 170), rect(100, 100, 300, 130)], dtype=np.float32)
+    right = np.array([rect(521, 101, 580, 130), rect(800, 100, 900, 130)], dtype=np.float32)
+    merged = merge_tile_boxes(tiles, [left, right])
+    assert len(merged) == 4
+    tops = sorted((box[0][0], box[0][1]) for box in merged.tolist())
+    assert tops == [(100, 100), (520, 100), (520, 140), (800, 100)]
+
+
+def test_merge_empty():
+    assert merge_tile_boxes([], []).shape == (0, 4, 2)
+    assert merge_tile_boxes([(0, 0, 10, 10)], [np.zeros((0, 4, 2), dtype=np.float32)]).shape == (0, 4, 2)
+
+
+def test_det_workers_capped(monkeypatch):
+    from ocr_onnx import OnnxOcrEngine
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    # 推理线程数未限定时推理已用满全部核，分块串行
+    assert OnnxOcrEngine(intra_threads=0).det_workers() == 1
+    assert OnnxOcrEngine(intra_threads=2).det_workers() == 4
+    assert OnnxOcrEngine(intra_threads=16).det_workers() == 1
+    # 多进程批量识别时每个进程只用自己那一份核
+    engine = OnnxOcrEngine(intra_threads=2)
+    engine.cpu_share = 2
+    assert engine.det_workers() == 1
@@ -0,0 +1,46 @@
+# coding:utf-8
+from vertical_layout import VerticalLayout
+
+
+def layout(text, rows=3, columns=2):
+    layout = VerticalLayout()
+    layout.set_geometry(0, 0, columns * 50, rows * 20, 50, 20)
+    layout.set_text(text)
+    return layout
+
+
+def test_geometry():
+    lay = layout("", rows=3, columns=2)
+    assert (lay.rows, lay.columns) == (3, 2)
+    assert not lay.set_geometry(0, 0, 100, 60, 50, 20)
+    # 不足一行高度也至少排一行
+    assert lay.set_geometry(0, 0, 100, 10, 50, 20) and lay.rows == 1
+
+
+def test_newlines_take_no_cell_and_columns_run_right_to_left():
+    lay = layout("天地\n玄黄\n宇宙洪荒")
+    assert lay.glyphs == "天地玄黄宇宙"
+    assert lay.overflow
+    assert list(lay.positions) == [0, 1, 3, 4, 6, 7]
+    assert lay.used_columns == 2
+    assert lay.cell(0) == (50, 0)
+    assert lay.cell(2) == (50, 40)
+    assert lay.cell(3) == (0, 0)
+
+
+def test_glyphs_outside_bmp_count_twice_in_positions():
+    # 𠀀(U+20000) 在QTextDocument中占两个位置
+    lay = layout("天\U00020000地\n玄")
+    assert lay.glyphs == "天\U00020000地玄"
+    assert list(lay.positions) == [0, 1, 3, 5]
+    assert lay.cursor_glyph(3) == 1
+    assert lay.cursor_glyph(4) == 2
+    assert lay.cursor_glyph(0) is None
+
+
+def test_glyphs_in_region():
+    lay = layout("一二三四五六")
+    # 右边一列（x 50-100）的第二、三行
+    assert sorted(lay.glyphs_in(60, 25, 90, 55)) == [1, 2]
+    # 整个区域
+    assert sorted(lay.glyphs_in(0, 0, 100, 60)) == list(range(6))
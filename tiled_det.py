@@ -0,0 +1,185 @@
+# coding:utf-8
+# 2025-02-22 大图分块检测：高分辨率扫描页整页检测时要么被缩小到det_limit_side_len（小字漏检），要么很慢且占内存
+# 分块检测把整页切成互相重叠的块，每块按原分辨率检测（支持的后端限定了推理线程数时多块并行，总线程数不超过CPU核数），再把框换算回整页坐标，
+# 接缝处被切断的行和重叠区内重复检出的行合并为一个框；检测的显存/内存峰值只与块大小有关
+# settings中的det_tile_size为块的边长，0为不分块；块边长不超过检测模型的det_limit_side_len（默认960）时不会被缩小
+# 本模块不依赖PySide6
+#   python tiled_det.py scan.png --tile 960        对比缩小后整页检测、分块检测和原分辨率整页检测的框数、耗时和峰值内存
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from ocr_crop import order_points
+
+DEFAULT_OVERLAP = 128
+# 两个块重叠区内的框，交集占较小框（在重叠区内部分）的比例达到此值时视为同一行
+MERGE_RATIO = 0.5
+
+
+def _tile_count(length, tile_size, overlap):
+    """块长tile_size、相邻块至少重叠overlap时一个方向上最少的块数"""
+    if length <= tile_size:
+        return 1
+    return -(-(length - overlap) // (tile_size - overlap))
+
+
+def tile_length(length, tile_size, overlap):
+    """
+    一个方向上的块长：块数取最少，各块等长，长度刚好使相邻块重叠overlap，向上对齐到32（检测模型的输入步长），不超过tile_size
+    2025-02-25 原先每块都取tile_size，块数向上取整后多出的部分全落在重叠区，重复检测的面积多出约三成
+    """
+    count = _tile_count(length, tile_size, overlap)
+    if count == 1:
+        return length
+    size = -(-(length + (count - 1) * overlap) // count)
+    return min(-(-size // 32) * 32, tile_size)
+
+
+def tile_starts(length, tile_size, overlap):
+    """一个方向上各块的起点：各块长tile_length，相邻块至少重叠overlap，最后一块与边缘对齐"""
+    size = tile_length(length, tile_size, overlap)
+    # 块长不超过tile_size且不小于等分所需的长度，块数与按tile_size切时相同
+    count = _tile_count(length, size, overlap)
+    return np.round(np.linspace(0, length - size, count)).astype(int).tolist()
+
+
+def tile_grid(height, width, tile_size, overlap=DEFAULT_OVERLAP):
+    """整页切块，返回 [(x0, y0, x1, y1), ...]，按先行后列排列"""
+    overlap = min(overlap, tile_size // 4)
+    tile_h, tile_w = tile_length(height, tile_size, overlap), tile_length(width, tile_size, overlap)
+    return [(x, y, x + tile_w, y + tile_h)
+            for y in tile_starts(height, tile_size, overlap)
+            for x in tile_starts(width, tile_size, overlap)]
+
+
+def detect_tiles(img, detect_fn, tiles, workers=1):
+    """
+    逐块检测，返回与tiles对应的整页坐标 (N, 4, 2) 框列表
+    :param detect_fn: 对一块图像做检测，返回块内坐标的四点框
+    :param workers: 并行检测的线程数，不超过块数（detect_fn需可多线程调用）
+    """
+    def run(tile):
+        x0, y0, x1, y1 = tile
+        # 切块是整页图像的视图，不复制像素
+        boxes = np.asarray(detect_fn(img[y0:y1, x0:x1]), dtype=np.float32).reshape(-1, 4, 2)
+        return boxes + np.array([x0, y0], dtype=np.float32)
+
+    if workers <= 1 or len(tiles) <= 1:
+        return [run(tile) for tile in tiles]
+    with ThreadPoolExecutor(min(workers, len(tiles)), thread_name_prefix="TiledDet") as pool:
+        return list(pool.map(run, tiles))
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _clip_area(lo, hi, region):
+    """(N, 2) 的外接矩形左上/右下与区域 (x0, y0, x1, y1) 相交的面积"""
+    w = np.minimum(hi[:, 0], region[2]) - np.maximum(lo[:, 0], region[0])
+    h = np.minimum(hi[:, 1], region[3]) - np.maximum(lo[:, 1], region[1])
+    return np.clip(w, 0, None) * np.clip(h, 0, None)
+
+
+def merge_tile_boxes(tiles, tile_boxes, ratio=MERGE_RATIO):
+    """
+    合并各块的检测结果：相邻两块重叠区内的框两两比较（按外接矩形），
+    交集占两框在重叠区内较小部分的比例不低于ratio的归为同一行，同一行的框取全部顶点的最小外接矩形
+    返回整页坐标的 (N, 4, 2) 框（未排序）
+    """
+    # 空白页各块都没有检出框
+    if not sum(len(b) for b in tile_boxes):
+        return np.zeros((0, 4, 2), dtype=np.float32)
+    boxes = np.concatenate(tile_boxes)
+    offsets = np.cumsum([0] + [len(b) for b in tile_boxes])
+    lo, hi = boxes.min(axis=1), boxes.max(axis=1)
+    parent = list(range(len(boxes)))
+    for a in range(len(tiles)):
+        for b in range(a + 1, len(tiles)):
+            region = (max(tiles[a][0], tiles[b][0]), max(tiles[a][1], tiles[b][1]),
+                      min(tiles[a][2], tiles[b][2]), min(tiles[a][3], tiles[b][3]))
+            if region[0] >= region[2] or region[1] >= region[3]:
+                continue
+            ia = np.arange(offsets[a], offsets[a + 1])
+            ib = np.arange(offsets[b], offsets[b + 1])
+            area_a, area_b = _clip_area(lo[ia], hi[ia], region), _clip_area(lo[ib], hi[ib], region)
+            ia, area_a = ia[area_a > 0], area_a[area_a > 0]
+            ib, area_b = ib[area_b > 0], area_b[area_b > 0]
+            if not len(ia) or not len(ib):
+                continue
+            # 两组框两两相交的面积（限制在重叠区内）
+            inter_lo = np.maximum(lo[ia, None], lo[None, ib])
+            inter_hi = np.minimum(hi[ia, None], hi[None, ib])
+            inter_lo = np.maximum(inter_lo, region[:2])
+            inter_hi = np.minimum(inter_hi, region[2:])
+            inter = np.prod(np.clip(inter_hi - inter_lo, 0, None), axis=2)
+            same = inter >= ratio * np.minimum(area_a[:, None], area_b[None, :])
+            for i, j in zip(*np.nonzero(same)):
+                parent[_find(parent, ia[i])] = _find(parent, ib[j])
+    groups = {}
+    for i in range(len(boxes)):
+        groups.setdefault(_find(parent, i), []).append(i)
+    merged = []
+    for members in groups.values():
+        if len(members) == 1:
+            merged.append(boxes[members[0]])
+        else:
+            merged.append(cv2.boxPoints(cv2.minAreaRect(boxes[members].reshape(-1, 2))))
+    merged = order_points(np.round(np.asarray(merged, dtype=np.float64)))
+    return merged.astype(np.float32)
+
+
+def detect_tiled(img, detect_fn, tile_size, overlap=DEFAULT_OVERLAP, workers=1):
+    """分块检测整页图像，返回整页坐标的 (N, 4, 2) 框（未排序）"""
+    tiles = tile_grid(img.shape[0], img.shape[1], tile_size, overlap)
+    return merge_tile_boxes(tiles, detect_tiles(img, detect_fn, tiles, workers))
+
+
+# ---- 整页/分块对比 ----
+def main(argv=None):
+    from ocr_backends import DEFAULT_BACKEND, ocrBackends
+    from ocr_crop import load_image, to_bgr
+    from ocr_quant import peak_rss
+    parser = argparse.ArgumentParser(description="对比整页检测和分块检测")
+    parser.add_argument("image", help="图片文件")
+    parser.add_argument("--tile", type=int, default=960, help="块边长（像素）")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, help="识别后端（python ocr_backends.py list）")
+    parser.add_argument("--full-side", type=int, default=0,
+                        help="整页检测时的det_limit_side_len，默认为图片长边（不缩小）；仅PaddleOCR/ONNX(PP-OCRv4)后端")
+    args = parser.parse_args(argv)
+    engine = ocrBackends.engine(args.backend)
+    engine.set_cache(False)
+    img = to_bgr(load_image(args.image))
+    tiles = tile_grid(img.shape[0], img.shape[1], args.tile)
+    x0, y0, x1, y1 = tiles[0]
+    print(f"{args.image}: {img.shape[1]}x{img.shape[0]}, {len(tiles)} tiles of {x1 - x0}x{y1 - y0}, "
+          f"{engine.det_workers()} det workers, backend {args.backend}")
+    print(f"{'mode':>10}{'boxes':>8}{'seconds':>9}{'peak MB':>9}")
+    engine.get()
+
+    def run(mode):
+        start = time.perf_counter()
+        boxes = engine.detect(img)
+        print(f"{mode:>10}{len(boxes):>8}{time.perf_counter() - start:>9.2f}{peak_rss() / (1 << 20):>9.0f}")
+
+    # 峰值内存只增不减，按占用从少到多的顺序：缩小后整页检测、分块检测、原分辨率整页检测
+    run("scaled")
+    engine.det_tile_size = args.tile
+    run("tiled")
+    engine.det_tile_size = 0
+    if "det_limit_side_len" in engine.params or engine.name == "paddleocr":
+        engine.configure(det_limit_side_len=args.full_side or max(img.shape[:2]))
+        engine.get()
+        run("full")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# coding:utf-8
+# 2025-01-29 古典阅读模式的竖排版式：文本、字体或窗口大小变化时才重新排版，绘制时按区域取出需要画的字
+import math
+
+import numpy as np
+
+
+class VerticalLayout:
+    """
+    竖排版式，列从右向左、每列从上向下排字，换行符不占位置
+    每列行数相同，第i个字在第 i // rows 列、第 i % rows 行，不需要逐字保存坐标
+    """
+
+    def __init__(self):
+        self.left = self.top = self.right = self.bottom = 0
+        self.column_width = 50
+        self.line_height = 20
+        self.rows = 1
+        self.columns = 0
+        # 可见的字（已去掉换行符，超出一屏的部分截断）
+        self.glyphs = ""
+        # 每个字在原文中的位置（按QTextDocument的UTF-16计数），用于定位光标
+        self.positions = np.zeros(0, dtype=np.int32)
+        # 原文去掉换行符后是否超出一屏
+        self.overflow = False
+        self._text = ""
+
+    def set_geometry(self, left, top, right, bottom, column_width, line_height):
+        """排版区域和行列尺寸，返回是否发生变化（变化时重新排版）"""
+        geometry = (left, top, right, bottom, column_width, line_height)
+        if geometry == (self.left, self.top, self.right, self.bottom, self.column_width, self.line_height):
+            return False
+        self.left, self.top, self.right, self.bottom, self.column_width, self.line_height = geometry
+        # 与原先逐字累加的判断一致：y + line_height 超出 bottom 时换列，x 小于 left 时停止
+        self.rows = max(int((bottom - top) // line_height), 1)
+        self.columns = max(int((right - left) // column_width), 0)
+        self.set_text(self._text)
+        return True
+
+    def set_text(self, text):
+        self._text = text
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        # 超出BMP的字（如CJK扩展B）在QTextDocument中占两个位置
+        widths = 1 + (codes > 0xFFFF)
+        starts = (np.cumsum(widths) - widths).astype(np.int32)
+        keep = np.flatnonzero(codes != 10)
+        capacity = self.rows * self.columns
+        self.overflow = len(keep) > capacity
+        keep = keep[:capacity]
+        self.positions = starts[keep]
+        self.glyphs = "".join(text[i] for i in keep) if len(keep) < len(codes) else text[:capacity]
+
+    def __len__(self):
+        return len(self.glyphs)
+
+    @property
+    def used_columns(self):
+        return -(-len(self.glyphs) // self.rows)
+
+    def cell(self, i):
+        """第i个字所在格子的左上角坐标"""
+        column, row = divmod(i, self.rows)
+        return self.right - (column + 1) * self.column_width, self.top + row * self.line_height
+
+    def glyphs_in(self, x0, y0, x1, y1):
+        """与矩形 (x0, y0)-(x1, y1) 相交的格子中的字的下标"""
+        first_col = max(math.floor((self.right - x1) / self.column_width) - 1, 0)
+        last_col = min(math.ceil((self.right - x0) / self.column_width), self.used_columns) - 1
+        first_row = max(math.floor((y0 - self.top) / self.line_height), 0)
+        last_row = min(math.floor((y1 - self.top) / self.line_height), self.rows - 1)
+        for column in range(first_col, last_col + 1):
+            start = column * self.rows
+            for i in range(start + first_row, min(start + last_row + 1, len(self.glyphs))):
+                yield i
+
+    def cursor_glyph(self, position):
+        """光标在原文位置position时，光标前最后一个可见字的下标，没有则为None"""
+        i = int(np.searchsorted(self.positions, position)) - 1
+        return i if 0 <= i < len(self.glyphs) else None